@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+# Compares the buffered (BytesIO + single read_csv) and streaming .hcs parsers
+# on a synthetic height file. Each parser runs in its own process so peak RSS
+# is measured independently.
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+SENSOR_TYPES = ["WL", "WL", "RN", "TA", "WS"]
+BLOCK_SIZE = 8192  # ftplib retrbinary default
+
+
+def write_synthetic_hcs(path, rows, sensors=5000):
+    rng = random.Random(42)
+    site_ids = [f"{i:06d}-{i % 3}" for i in range(sensors)]
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(8):
+            f.write(f"# synthetic header line {i}\n")
+        for i in range(rows):
+            f.write(
+                f"{i},{rng.choice(SENSOR_TYPES)},1,SSR,{rng.choice(site_ids)},"
+                f"2025-06-17T03:{i % 60:02d}:46Z,{rng.uniform(-1, 10):.3f},metres,LGH,,1,\n"
+            )
+    return site_ids
+
+
+def run_buffered(path, sensor_ids):
+    import io
+    import pandas as pd
+    import bom_stream_data_process as bom
+
+    with io.BytesIO() as file_in_memory:
+        with open(path, "rb") as f:
+            while block := f.read(BLOCK_SIZE):
+                file_in_memory.write(block)
+        file_in_memory.seek(0)
+        df = pd.read_csv(file_in_memory, skiprows=8, header=None)
+    df.columns = bom.height_file_header
+    df["SiteId"] = df["SiteId"].astype(str)
+    return df[(df["SensorType"] == "WL") & df["SiteId"].isin(sensor_ids)]
+
+
+def run_streaming(path, sensor_ids, chunk_bytes=None):
+    import bom_stream_data_process as bom
+
+    parser = bom.HeightStreamParser(sensor_ids, chunk_bytes or bom.height_chunk_bytes)
+    with open(path, "rb") as f:
+        while block := f.read(BLOCK_SIZE):
+            parser.feed(block)
+    return parser.close()
+
+
+def child(mode, path, sensors):
+    sys.path.insert(0, SCRIPTS_DIR)
+    import bom_stream_data_process  # noqa: F401  keep import cost out of the timing
+    sensor_ids = {f"{i:06d}-{i % 3}" for i in range(0, sensors, 2)}
+    baseline_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    start = time.perf_counter()
+    df = run_buffered(path, sensor_ids) if mode == "buffered" else run_streaming(path, sensor_ids)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(
+        f"{mode:<10} rows={len(df):>8} time={elapsed:7.2f}s "
+        f"peak_rss={peak_mb:8.1f} MB (after imports {baseline_mb:.1f} MB)"
+    )
+
+
+def check_equivalence(path, sensors):
+    sys.path.insert(0, SCRIPTS_DIR)
+    sensor_ids = {f"{i:06d}-{i % 3}" for i in range(0, sensors, 2)}
+    buffered = run_buffered(path, sensor_ids)
+    streamed = run_streaming(path, sensor_ids, chunk_bytes=64 * 1024)
+    assert list(buffered["IndexNo"]) == list(streamed["IndexNo"]), "streaming parser dropped or reordered rows"
+    print(f"equivalence ok: {len(streamed)} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BOM .hcs height file parsing")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--sensors", type=int, default=5000)
+    parser.add_argument("--child", choices=["buffered", "streaming"])
+    parser.add_argument("--path")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OUTPUT_DIR", tempfile.mkdtemp())
+    if args.child:
+        child(args.child, args.path, args.sensors)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "IDZ65910_synthetic.hcs")
+        write_synthetic_hcs(path, args.rows, args.sensors)
+        print(f"synthetic file: {args.rows} rows, {os.path.getsize(path) / 1e6:.1f} MB")
+        # Children run before anything large is loaded here, as peak RSS is inherited across fork
+        for mode in ("buffered", "streaming"):
+            subprocess.run(
+                [sys.executable, __file__, "--child", mode, "--path", path, "--sensors", str(args.sensors)],
+                check=True
+            )
+        check_equivalence(path, args.sensors)
+
+
+if __name__ == "__main__":
+    main()
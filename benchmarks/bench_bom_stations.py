@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Measures station table startup and the station/height join, comparing the
+# original CSV + untyped merge with the compiled, SENSORID-indexed cache.
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+DATASETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "datasets")
+
+
+def timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BOM station loading and joining")
+    parser.add_argument("--readings", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["OUTPUT_DIR"] = tmp
+    os.environ["INPUT_DIR"] = tmp
+    os.symlink(
+        os.path.abspath(os.path.join(DATASETS_DIR, "bom_rain_river_station_list.csv")),
+        os.path.join(tmp, "rain_river_station_list.csv")
+    )
+    sys.path.insert(0, SCRIPTS_DIR)
+    import numpy as np
+    import pandas as pd
+    import bom_stream_data_process as bom
+
+    def load_before():
+        station_info = pd.read_csv(bom.station_file_path)
+        return station_info[station_info['SENSOR_TYPE'] == 'water level gauge']
+
+    def join_before(stream_height_data, station_info):
+        stream_height_data['SiteId'] = stream_height_data['SiteId'].astype(str)
+        station_info['SENSORID'] = station_info['SENSORID'].astype(str)
+        return pd.merge(stream_height_data, station_info, left_on="SiteId", right_on="SENSORID")
+
+    compile_time, _ = timed(bom.load_stations, 1)  # first call builds the cache
+    load_old, stations_old = timed(load_before, args.repeat)
+    load_new, stations_new = timed(bom.load_stations, args.repeat)
+
+    rng = np.random.default_rng(42)
+    site_ids = rng.choice(stations_new.index.to_numpy(), args.readings)
+    height = pd.DataFrame({"SiteId": site_ids, "RealValue": rng.random(args.readings).astype("float32")})
+
+    join_old, merged_old = timed(lambda: join_before(height.copy(), stations_old.copy()), args.repeat)
+    join_new, merged_new = timed(lambda: bom.join_stations_with_height(height.copy(), stations_new), args.repeat)
+    assert list(merged_old.columns) == list(merged_new.columns)
+    assert merged_old["SENSORID"].tolist() == merged_new["SENSORID"].astype(str).tolist()
+
+    print(f"cache compile (first run): {compile_time * 1000:8.2f} ms")
+    print(f"load_stations  before: {load_old * 1000:8.2f} ms  after: {load_new * 1000:8.2f} ms")
+    print(f"join ({args.readings} rows) before: {join_old * 1000:8.2f} ms  after: {join_new * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# Times the canyon enrichment joins on synthetic canyons and burns at increasing
+# scales (1x is 2000 canyons and 400 burns, about the live sizes) against the old
+# approach of measuring every canyon against every burn, which is only run on a
+# sample and extrapolated. Gauges are the committed GeoPackages in datasets/.
+# The joins are checked against the pairwise results on that sample.
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SCRIPTS_DIR = os.path.join(ROOT, "scripts")
+GEOPACKAGES = {"bom": "bom_au_stream_gauges.gpkg", "wnsw": "wnsw_stream_height_data.gpkg"}
+CANYONS = 2000
+BURNS = 400
+SAMPLE = 200
+
+
+def synthetic_layers(scale, seed=42):
+    """Canyon points and burn polygons (lon/lat) spread over NSW, QLD and VIC."""
+    import geopandas as gpd
+    import shapely
+
+    rng = random.Random(seed)
+    canyons = gpd.GeoSeries(
+        [shapely.Point(rng.uniform(141, 153.5), rng.uniform(-39, -24)) for _ in range(CANYONS * scale)], crs="EPSG:4326"
+    )
+    burns = gpd.GeoDataFrame(
+        {"guarReference": [f"BA{i:08d}" for i in range(BURNS * scale)]},
+        geometry=[shapely.Point(rng.uniform(141, 153.5), rng.uniform(-39, -24)).buffer(rng.uniform(0.005, 0.05), 8)
+                  for _ in range(BURNS * scale)],
+        crs="EPSG:4326"
+    )
+    return canyons, burns
+
+
+def pairwise_nearby(points, burns, distance_km):
+    """The old approach: measure every canyon against every burn."""
+    found = []
+    burn_geometries = list(zip(burns["guarReference"], burns.geometry))
+    for point in points:
+        near = sorted((point.distance(geometry), reference) for reference, geometry in burn_geometries)
+        found.append([reference for distance, reference in near if distance <= distance_km * 1000])
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the canyon enrichment spatial joins as inputs grow")
+    parser.add_argument("--scales", default="1,10", help="comma separated input size multiples")
+    args = parser.parse_args()
+
+    sys.path.insert(0, SCRIPTS_DIR)
+    with tempfile.TemporaryDirectory() as tmp:
+        for source, name in GEOPACKAGES.items():
+            if os.path.exists(os.path.join(ROOT, "datasets", name)):
+                os.environ[f"{source.upper()}_GPKG"] = shutil.copy(os.path.join(ROOT, "datasets", name), tmp)
+        import canyon_enrichment
+
+        gauges = canyon_enrichment.load_gauge_frame()
+        print(f"{len(gauges)} gauges; burns within {canyon_enrichment.NEARBY_BURN_KM:g} km, "
+              f"gauges within {canyon_enrichment.GAUGE_MAX_KM:g} km")
+        print(f"{'scale':>6}{'canyons':>9}{'burns':>8}{'burn join':>12}{'gauge join':>12}{'pairwise':>12}")
+        for scale in [int(value) for value in args.scales.split(",")]:
+            canyons, burns = synthetic_layers(scale)
+            points = canyons.to_crs(canyon_enrichment.METRIC_CRS)
+            burns = burns.to_crs(canyon_enrichment.METRIC_CRS)
+
+            start = time.perf_counter()
+            nearby = canyon_enrichment.nearby(points, burns, "guarReference", canyon_enrichment.NEARBY_BURN_KM)
+            join_s = time.perf_counter() - start
+            start = time.perf_counter()
+            canyon_enrichment.nearest_gauges(points, gauges)
+            gauge_s = time.perf_counter() - start
+
+            sample = points.iloc[:SAMPLE]
+            start = time.perf_counter()
+            expected = pairwise_nearby(sample, burns, canyon_enrichment.NEARBY_BURN_KM)
+            pairwise_s = (time.perf_counter() - start) * len(points) / len(sample)
+            assert nearby[:SAMPLE] == expected, "spatial join disagrees with the pairwise distances"
+
+            print(f"{scale:>5}x{len(points):>9}{len(burns):>8}{join_s:>11.2f}s{gauge_s:>11.2f}s{pairwise_s:>11.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# Compares loading the committed GeoJSON and GeoPackage files in datasets/ with
+# loading Arrow snapshots of them (written to a temporary directory): load time and
+# RSS growth, both measured in a fresh process per load after the imports. The
+# snapshot is read whole as Arrow (memory-mapped, so pages are only read when a
+# column is used), as two columns converted to pandas and as a GeoDataFrame.
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SCRIPTS_DIR = os.path.join(ROOT, "scripts")
+DATASETS = {
+    # file: (layer for GeoPackages, the two columns a consumer selects)
+    "bom_au_stream_gauges.geojson": (None, ["SENSORID", "RealValue"]),
+    "bom_au_stream_gauges.gpkg": ("stream_heights", ["SENSORID", "RealValue"]),
+    "wnsw_stream_height_data.gpkg": ("site_data", ["site_station", "height"]),
+    "getlostmaps_ruins.geojson": (None, None),
+    "rfs_hr_burns.geojson": (None, ["guarReference", "startDate"]),
+}
+
+LOADERS = {
+    "json.load": "with open(path, encoding='utf-8') as f: data = json.load(f)",
+    "geopandas": "data = gpd.read_file(path, layer=layer)",
+    "snapshot": "data = columnar_snapshot.read_snapshot(snapshot)",
+    "snapshot, 2 columns": "data = columnar_snapshot.read_snapshot(snapshot, columns).to_pandas()",
+    "snapshot frame": "data = columnar_snapshot.read_frame(snapshot)",
+}
+
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {scripts!r})
+import geopandas as gpd
+import columnar_snapshot
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+
+path, layer, snapshot, columns = {path!r}, {layer!r}, {snapshot!r}, {columns!r}
+before = rss_kb()
+start = time.perf_counter()
+{load}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "rss_mb": (rss_kb() - before) / 1024}}))
+"""
+
+
+def measure(path, layer, snapshot, columns, load, repeat):
+    """Best load time and the RSS growth of that run, each in a fresh interpreter."""
+    code = CHILD.format(scripts=SCRIPTS_DIR, path=path, layer=layer, snapshot=snapshot, columns=columns, load=load)
+    runs = [
+        json.loads(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout)
+        for _ in range(repeat)
+    ]
+    return min(runs, key=lambda run: run["seconds"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark loading Arrow snapshots against GeoJSON and GeoPackage")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sys.path.insert(0, SCRIPTS_DIR)
+    import geopandas as gpd
+    import columnar_snapshot
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'file':<32}{'loader':<22}{'size MB':>9}{'load ms':>10}{'RSS MB':>9}")
+        for name, (layer, columns) in DATASETS.items():
+            path = os.path.join(ROOT, "datasets", name)
+            if not os.path.exists(path):
+                continue
+            snapshot = os.path.join(tmp, name.replace(".", "_") + ".arrow")
+            if layer:
+                columnar_snapshot.write_snapshot(snapshot, columnar_snapshot.frame_table(gpd.read_file(path, layer=layer)))
+            else:
+                with open(path, encoding="utf-8") as f:
+                    features = json.load(f)["features"]
+                columnar_snapshot.write_snapshot(snapshot, columnar_snapshot.features_table(features))
+            loaders = ["geopandas"] if layer else ["json.load", "geopandas"]
+            loaders += ["snapshot"] + (["snapshot, 2 columns"] if columns else []) + ["snapshot frame"]
+            for loader in loaders:
+                result = measure(path, layer, snapshot, columns, LOADERS[loader], args.repeat)
+                size = os.path.getsize(snapshot if loader.startswith("snapshot") else path) / 1e6
+                print(f"{name:<32}{loader:<22}{size:>9.2f}{result['seconds'] * 1000:>10.1f}{result['rss_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
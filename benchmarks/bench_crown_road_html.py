@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+# Compares the original per-row HTML extraction in crown_road_sales_process
+# with the vectorised extract_fields_from_html on a synthetic TSV.
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+
+HTML_TEMPLATES = [
+    "<p>Sale of Crown road (Cluster No. {cluster}, file {a}/{b})</p><ul><li>Lot {a} DP{b}&nbsp;</li>"
+    "<li class=\"x\">Road adjoining <b>Lot {cluster}</b></li></ul><p>Contact roads{a}@crownland.nsw.gov.au</p>",
+    "<p>Proposal (File ref {a}/{b}) near {cluster} Creek</p><ul></ul><ul><li>ignored</li></ul>",
+    "<p>No brackets here, email sales@example.com.au</p>",
+    "<p>(cluster_number: {cluster} with file) <UL><LI>Upper case item</LI></UL></p>",
+    "",
+]
+
+
+def legacy_extract_fields_from_html(html):
+    import pandas as pd
+    if pd.isna(html):
+        return None, None, None
+    bracket_match = re.search(r"\(([^)]*file[^)]*)\)", html, re.IGNORECASE)
+    bracket_text = bracket_match.group(1) if bracket_match else ""
+    file_ref_match = re.search(r"\b\d+/\d+\b", bracket_text)
+    file_ref = file_ref_match.group(0) if file_ref_match else None
+    cluster_match = re.search(r"(?:cluster|cluster_no|cluster_number)[^\d]*(\d+)", bracket_text, re.IGNORECASE)
+    cluster = cluster_match.group(1) if cluster_match else None
+    email_match = re.search(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}", html)
+    email = email_match.group(0) if email_match else None
+    return cluster, file_ref, email
+
+
+def legacy_extract_description_from_html(html):
+    import pandas as pd
+    if pd.isna(html):
+        return None
+    list_match = re.search(r"<ul>(.*?)</ul>", html, re.DOTALL | re.IGNORECASE)
+    if not list_match:
+        return None
+    items = re.findall(r"<li.*?>(.*?)</li>", list_match.group(1), re.DOTALL | re.IGNORECASE)
+    clean_items = [re.sub(r"<.*?>", "", item).replace("&nbsp;", "").strip() for item in items]
+    return "; ".join(clean_items)
+
+
+def legacy_extract(df):
+    import pandas as pd
+    df = df.copy()
+    df[["cluster", "file_ref", "contact_email"]] = df["html"].apply(
+        lambda html: pd.Series(legacy_extract_fields_from_html(html))
+    )
+    df["description"] = df["html"].apply(legacy_extract_description_from_html)
+    return df[["cluster", "file_ref", "contact_email", "description"]]
+
+
+def write_synthetic_tsv(path, rows):
+    rng = random.Random(42)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Longtitude\tLatitiude\tExpiry Date\tHTML\n")
+        for i in range(rows):
+            template = rng.choice(HTML_TEMPLATES)
+            html = template.format(cluster=rng.randint(1, 99), a=rng.randint(10, 9999), b=rng.randint(10, 9999))
+            f.write(f"{rng.uniform(141, 153):.5f}\t{rng.uniform(-37, -28):.5f}\t2030-01-01\t{html}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crown road sales HTML field extraction")
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("OUTPUT_DIR", tempfile.mkdtemp())
+    sys.path.insert(0, SCRIPTS_DIR)
+    import pandas as pd
+    import crown_road_sales_process as crown
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sales.tsv")
+        write_synthetic_tsv(path, args.rows)
+        df = pd.read_csv(path, sep="\t")
+        df.columns = ["longitude", "latitude", "expiry_date", "html"]
+
+        start = time.perf_counter()
+        before = legacy_extract(df)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        after = crown.extract_fields_from_html(df["html"])
+        vectorised_time = time.perf_counter() - start
+
+    for column in before.columns:
+        expected = before[column].astype(object).where(before[column].notna(), None).tolist()
+        assert expected == after[column].tolist(), f"column {column} differs"
+
+    print(f"rows={args.rows}")
+    print(f"per-row apply: {legacy_time:7.2f}s")
+    print(f"vectorised:    {vectorised_time:7.2f}s  ({legacy_time / vectorised_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Exercises the shared fetch layer against in-process stand-ins injecting faults:
+# retries through 503s and dropped connections, read timeouts on a stalled
+# server, per-host concurrency and rate limits, downloads to disk (restarted when
+# the body is cut off) and FTP logins refused with 421. Each check prints its time and the retries it took, and the
+# script exits non-zero if any check fails.
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(BENCH_DIR, "..", "scripts")
+BODY_BYTES = 1024 * 1024
+
+
+def total_retries(fetch):
+    return sum(counts["retries"] for counts in fetch.stats().values())
+
+
+def check_retries(fetch, session, requests):
+    """Every request succeeds although a third are answered 503 and a fifth dropped."""
+    responses = [fetch.get("https://faulty.test/data.bin", session) for _ in range(requests)]
+    assert all(response.status_code == 200 and len(response.content) == BODY_BYTES for response in responses)
+
+
+def check_timeout(fetch, session):
+    """A server slower than the read timeout fails after its retries rather than hanging."""
+    import requests
+
+    start = time.perf_counter()
+    try:
+        fetch.get("https://stalled.test/data.bin", session, timeout=(1, 0.2), retries=1)
+    except requests.Timeout:
+        assert time.perf_counter() - start < 2
+        return
+    raise AssertionError("no timeout")
+
+
+def check_concurrency(fetch, session, requests, latency):
+    """With 2 slots for the host, requests from 8 threads take at least requests / 2 latencies."""
+    fetch.HOST_LIMITS["narrow.test"] = (2,)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: fetch.get("https://narrow.test/data.bin", session), range(requests)))
+    assert time.perf_counter() - start >= requests / 2 * latency * 0.9
+
+
+def check_rate(fetch, session, requests, rate):
+    """Request starts to the host are spaced to its rate, even from 8 threads."""
+    fetch.HOST_LIMITS["paced.test"] = (8, rate)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: fetch.get("https://paced.test/data.bin", session), range(requests)))
+    assert time.perf_counter() - start >= (requests - 1) / rate * 0.9
+
+
+def check_download(fetch, session, root, tmp):
+    """Downloads whose bodies are cut off are restarted and land on disk whole, with their digest."""
+    path = os.path.join(tmp, "download.bin")
+    for _ in range(4):
+        response, md5 = fetch.download("https://truncated.test/data.bin", path, session, digest="md5")
+        assert response.status_code == 200
+        with open(os.path.join(root, "http", "truncated.test", "data.bin"), "rb") as f:
+            assert md5 == hashlib.md5(f.read()).hexdigest()
+        assert os.path.getsize(path) == BODY_BYTES and not os.path.exists(f"{path}.part")
+
+
+def check_ftp(fetch, port):
+    """FTP connections refused with 421 on every second login are retried."""
+    for _ in range(4):
+        with fetch.ftp_connection("127.0.0.1", port) as ftp:
+            received = []
+            fetch.ftp_retrieve(ftp, "data.bin", received.append)
+            assert sum(len(block) for block in received) == BODY_BYTES
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the fetch layer's retries, timeouts and limits against faulty stand-ins")
+    parser.add_argument("--requests", type=int, default=24)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--rate", type=float, default=40, help="requests per second allowed to the paced host")
+    args = parser.parse_args()
+
+    os.environ.setdefault("FETCH_BACKOFF", "0.05")  # keep the retry waits short
+    sys.path[:0] = [SCRIPTS_DIR, BENCH_DIR]
+    import fetch
+    import stand_ins
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "root")
+        body = os.urandom(BODY_BYTES)
+        for host in ("faulty.test", "truncated.test", "stalled.test", "narrow.test", "paced.test"):
+            os.makedirs(os.path.join(root, "http", host))
+            with open(os.path.join(root, "http", host, "data.bin"), "wb") as f:
+                f.write(body)
+        os.makedirs(os.path.join(root, "ftp"))
+        with open(os.path.join(root, "ftp", "data.bin"), "wb") as f:
+            f.write(body)
+
+        servers = {
+            "faulty": stand_ins.serve_http(root, stand_ins.Faults(fail_every=3, drop_every=5)),
+            "truncated": stand_ins.serve_http(root, stand_ins.Faults(truncate_every=2)),
+            "stalled": stand_ins.serve_http(root, stand_ins.Faults(latency=1.0)),
+            "slow": stand_ins.serve_http(root, stand_ins.Faults(latency=args.latency)),
+            "plain": stand_ins.serve_http(root)
+        }
+        sessions = {name: stand_ins.stand_in_session(server.server_address[1]) for name, server in servers.items()}
+        ftp_server = stand_ins.serve_ftp(root, stand_ins.Faults(fail_every=2))
+
+        checks = [
+            ("retries through 503/drops", lambda: check_retries(fetch, sessions["faulty"], args.requests)),
+            ("read timeout", lambda: check_timeout(fetch, sessions["stalled"])),
+            ("host concurrency 2", lambda: check_concurrency(fetch, sessions["slow"], args.requests, args.latency)),
+            (f"host rate {args.rate:g}/s", lambda: check_rate(fetch, sessions["plain"], args.requests, args.rate)),
+            ("download, cut off bodies", lambda: check_download(fetch, sessions["truncated"], root, tmp)),
+        ]
+        if ftp_server:
+            checks.append(("ftp 421 on login", lambda: check_ftp(fetch, ftp_server.address[1])))
+        else:
+            print("pyftpdlib is not installed; skipping the FTP check")
+
+        failed = 0
+        print(f"{'check':<28}{'result':>8}{'seconds':>10}{'retries':>9}")
+        for label, check in checks:
+            start, retries_before = time.perf_counter(), total_retries(fetch)
+            try:
+                check()
+                result = "ok"
+            except AssertionError:
+                result, failed = "FAILED", failed + 1
+            print(f"{label:<28}{result:>8}{time.perf_counter() - start:>10.2f}{total_retries(fetch) - retries_before:>9}")
+        for host, counts in sorted(fetch.stats().items()):
+            print(f"{host:<16} {counts['requests']:>4} requests {counts['errors']:>3} errors {counts['bytes'] / 1e6:>7.1f} MB  "
+                  f"latency {counts['latency_s']:.2f}s total, {counts['max_latency_s']:.2f}s worst")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Simulates hourly runs over synthetic gauges (a WaterNSW style frame with colour
+# bands and per gauge thresholds for a tenth of them) and times the alert
+# evaluation against the old way of finding gauges that crossed a level: loading
+# the previous and current GeoJSON outputs and comparing them feature by feature.
+# Each run's alerts are checked against that comparison.
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+COLOURS = ["blue", "green", "gray", "orange", "red", ""]
+
+
+def synthetic_frame(site_ids, lon, lat, heights, observed_at, colours):
+    import geopandas as gpd
+
+    return gpd.GeoDataFrame({
+        "site_station": site_ids,
+        "stname": [f"Gauge {site_id}" for site_id in site_ids],
+        "height": heights,
+        "height_datetime": observed_at,
+        "colour": colours
+    }, geometry=gpd.points_from_xy(lon, lat), crs="EPSG:4326")
+
+
+def expected_changes(gauge_alerts, previous, current, thresholds):
+    """The gauges a by-hand diff of two GeoJSON outputs finds changing level or rising flag."""
+    changed = set()
+    for site_id, feature in current.items():
+        properties = feature["properties"]
+        before = previous[site_id]["properties"]
+        levels = []
+        for props in (before, properties):
+            level = sum(1 for threshold in thresholds.get(site_id, ()) if props["height"] >= threshold)
+            levels.append(max(level, gauge_alerts.COLOUR_LEVELS.get(props["colour"], 0)))
+        hours = (pd.Timestamp(properties["height_datetime"]) - pd.Timestamp(before["height_datetime"])).total_seconds() / 3600
+        rising = (properties["height"] - before["height"]) / hours >= gauge_alerts.RISE_M_PER_HOUR
+        if levels[0] != levels[1] or rising != previous[site_id].get("rising", False):
+            changed.add(site_id)
+        feature["rising"] = rising
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gauge alert evaluation against diffing GeoJSON outputs")
+    parser.add_argument("--gauges", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=6)
+    args = parser.parse_args()
+
+    sys.path.insert(0, SCRIPTS_DIR)
+    import gauge_alerts
+
+    rng = np.random.default_rng(42)
+    site_ids = np.array([f"{400000 + i:06d}" for i in range(args.gauges)])
+    lon, lat = rng.uniform(141, 153.5, args.gauges), rng.uniform(-37.5, -28.5, args.gauges)
+    heights = rng.uniform(0, 5, args.gauges)
+    colours = rng.choice(COLOURS, args.gauges)
+    ruled = rng.choice(args.gauges, args.gauges // 10, replace=False)
+    thresholds = {site_ids[i]: sorted(rng.uniform(1, 6, 3).round(2).tolist()) for i in ruled}
+    start_time = pd.Timestamp("2025-06-17T00:00:00Z")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "alert_rules.json"), "w", encoding="utf-8") as f:
+            json.dump({f"wnsw:{site_id}": dict(zip(gauge_alerts.LEVELS[1:], levels)) for site_id, levels in thresholds.items()}, f)
+        previous_geojson = None
+        evaluate_ms, update_ms, diff_ms = [], [], []
+        print(f"{'run':>4}{'alerts':>8}{'evaluate ms':>13}{'update ms':>11}{'geojson diff ms':>17}")
+        for run in range(args.runs):
+            observed_at = (start_time + pd.Timedelta(hours=run)).strftime("%Y-%m-%dT%H:%M:%SZ")
+            gdf = synthetic_frame(site_ids, lon, lat, heights.round(3), [observed_at] * args.gauges, colours)
+            geojson_path = os.path.join(tmp, "sites.geojson")
+            gdf.to_file(geojson_path, driver="GeoJSON")
+
+            # Evaluation alone, against the state the previous run left
+            previous = gauge_alerts.load_state(tmp).get("wnsw", {}).get("gauges")
+            gauges = gauge_alerts.gauge_arrays("wnsw", gdf)
+            limits = gauge_alerts.rule_arrays(gauge_alerts.load_rules(os.path.join(tmp, "alert_rules.json")), "wnsw", gauges["site_id"])
+            start = time.perf_counter()
+            gauge_alerts.evaluate(previous, gauges["site_id"], gauges["value"], gauges["observed_at"], gauges["band"], *limits)
+            evaluate_ms.append((time.perf_counter() - start) * 1000)
+
+            # The whole update: state, rules, evaluation and writing alerts.geojson
+            start = time.perf_counter()
+            count = gauge_alerts.update_alerts("wnsw", gdf, tmp)
+            update_ms.append((time.perf_counter() - start) * 1000)
+
+            # The old way: load the previous and current outputs and compare every gauge
+            start = time.perf_counter()
+            with open(geojson_path, encoding="utf-8") as f:
+                current = {feature["properties"]["site_station"]: feature for feature in json.load(f)["features"]}
+            expected = expected_changes(gauge_alerts, previous_geojson, current, thresholds) if previous_geojson else set()
+            diff_ms.append((time.perf_counter() - start) * 1000)
+            previous_geojson = current
+
+            with open(gauge_alerts.alerts_path(tmp), encoding="utf-8") as f:
+                alerted = {feature["properties"]["site_id"] for feature in json.load(f)["features"]}
+            assert alerted == expected and count == len(expected), f"run {run}: alerts differ from the GeoJSON diff"
+            print(f"{run:>4}{count:>8}{evaluate_ms[-1]:>13.2f}{update_ms[-1]:>11.1f}{diff_ms[-1]:>17.1f}")
+
+            # The next hour: heights drift, some gauges rise sharply and a few colour bands change
+            heights = heights + rng.normal(0, 0.05, args.gauges)
+            surge = rng.choice(args.gauges, args.gauges // 100, replace=False)
+            heights[surge] += rng.uniform(0.3, 1.5, len(surge))
+            flipped = rng.choice(args.gauges, args.gauges // 200, replace=False)
+            colours = colours.copy()
+            colours[flipped] = rng.choice(COLOURS, len(flipped))
+
+    print(f"{args.gauges} gauges, median of {args.runs} runs: evaluate {statistics.median(evaluate_ms):.2f} ms, "
+          f"update {statistics.median(update_ms):.1f} ms, GeoJSON diff {statistics.median(diff_ms):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
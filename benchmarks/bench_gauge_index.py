@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# Compares gauge lookups with the grid index against a linear scan of the AU
+# GeoJSON, using the committed GeoPackages in datasets/ (copied, so the index
+# is built in a temporary directory). Query points are random within NSW/VIC/QLD.
+# Each index result is checked against the scan.
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SCRIPTS_DIR = os.path.join(ROOT, "scripts")
+GEOPACKAGES = {"bom": "bom_au_stream_gauges.gpkg", "wnsw": "wnsw_stream_height_data.gpkg"}
+EARTH_RADIUS_KM = 6371.0088
+
+
+def scan_within(gauges, lon, lat, radius_km):
+    """The old approach: measure every gauge in the GeoJSON."""
+    lon, lat = math.radians(lon), math.radians(lat)
+    found = []
+    for gauge_lon, gauge_lat in gauges:
+        a = (math.sin((gauge_lat - lat) / 2) ** 2
+             + math.cos(lat) * math.cos(gauge_lat) * math.sin((gauge_lon - lon) / 2) ** 2)
+        distance = 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+        if distance <= radius_km:
+            found.append(distance)
+    return sorted(found)
+
+
+def rate(func, points):
+    start = time.perf_counter()
+    for lon, lat in points:
+        func(lon, lat)
+    return len(points) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gauge index queries against a linear scan")
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--radius-km", type=float, default=20)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    sys.path.insert(0, SCRIPTS_DIR)
+    import gauge_index
+
+    rng = random.Random(42)
+    points = [(rng.uniform(141, 153.5), rng.uniform(-39, -24)) for _ in range(args.queries)]
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {}
+        for source, name in GEOPACKAGES.items():
+            if os.path.exists(os.path.join(ROOT, "datasets", name)):
+                paths[source] = shutil.copy(os.path.join(ROOT, "datasets", name), tmp)
+
+        start = time.perf_counter()
+        gauge_index.load_gauges(paths)
+        build_s = time.perf_counter() - start
+        start = time.perf_counter()
+        index = gauge_index.load_gauges(paths)
+        load_s = time.perf_counter() - start
+
+    geojson_path = os.path.join(ROOT, "datasets", "bom_au_stream_gauges.geojson")
+    start = time.perf_counter()
+    with open(geojson_path, encoding="utf-8") as f:
+        features = json.load(f)["features"]
+    geojson_s = time.perf_counter() - start
+    gauges = [(math.radians(record[3]), math.radians(record[4])) for record in index.records]
+
+    for lon, lat in points[:200]:
+        expected = [round(distance, 3) for distance in scan_within(gauges, lon, lat, args.radius_km)]
+        assert [result["distance_km"] for result in index.within(lon, lat, args.radius_km)] == expected
+        nearest = [round(distance, 3) for distance in scan_within(gauges, lon, lat, math.pi * EARTH_RADIUS_KM)[:args.k]]
+        assert [result["distance_km"] for result in index.nearest(lon, lat, args.k)] == nearest
+
+    print(f"{len(index)} gauges; index built in {build_s:.2f}s, loaded in {load_s * 1000:.1f}ms "
+          f"(GeoJSON of {len(features)} gauges loads in {geojson_s * 1000:.1f}ms)")
+    scan_points = points[:max(len(points) // 20, 1)]
+    print(f"{'query':<28}{'queries/s':>12}")
+    print(f"{'linear scan, radius':<28}{rate(lambda lon, lat: scan_within(gauges, lon, lat, args.radius_km), scan_points):>12.0f}")
+    print(f"{f'index, within {args.radius_km:g} km':<28}{rate(lambda lon, lat: index.within(lon, lat, args.radius_km), points):>12.0f}")
+    print(f"{f'index, nearest {args.k}':<28}{rate(lambda lon, lat: index.nearest(lon, lat, args.k), points):>12.0f}")
+    print(f"{'index, 0.5 degree bbox':<28}{rate(lambda lon, lat: index.bbox(lon - 0.25, lat - 0.25, lon + 0.25, lat + 0.25), points):>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Compares the old build-a-list + json.dump(indent) output with the shared
+# streaming writer, using the committed GeoJSON files in datasets/ (scaled up
+# by repeating their features) as input.
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SCRIPTS_DIR = os.path.join(ROOT, "scripts")
+DATASETS = [
+    "rfs_hr_burns.geojson",
+    "gnb_naming_proposals.geojson",
+    "getlostmaps_huts.geojson",
+    "getlostmaps_ruins.geojson",
+    "getlostmaps_repeaters.geojson",
+]
+
+
+def iter_features(encoded_features, scale):
+    # Decoding per feature stands in for the scripts building each feature from API data
+    for _ in range(scale):
+        for encoded in encoded_features:
+            yield json.loads(encoded)
+
+
+def write_legacy(path, features, indent):
+    geojson = {"type": "FeatureCollection", "features": list(features)}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(geojson, f, indent=indent)
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark GeoJSON output size, time and memory")
+    parser.add_argument("--scale", type=int, default=10, help="times each dataset's features are repeated")
+    parser.add_argument("--indent", type=int, default=2, help="indent used by the old json.dump output")
+    args = parser.parse_args()
+
+    sys.path.insert(0, SCRIPTS_DIR)
+    import geojson_writer
+
+    print(f"encoder: {'orjson' if geojson_writer.orjson else 'json'}, scale x{args.scale}")
+    print(f"{'dataset':<32}{'features':>9}{'old size':>12}{'new size':>12}{'old time':>10}{'new time':>10}{'old peak':>11}{'new peak':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in DATASETS:
+            path = os.path.join(ROOT, "datasets", name)
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding="utf-8") as f:
+                source = json.load(f)
+            encoded = [json.dumps(feature) for feature in source["features"]]
+            old_path = os.path.join(tmp, "old.geojson")
+            new_path = os.path.join(tmp, "new.geojson")
+
+            old_time, old_peak = measure(lambda: write_legacy(old_path, iter_features(encoded, args.scale), args.indent))
+            new_time, new_peak = measure(lambda: geojson_writer.write_feature_collection(new_path, iter_features(encoded, args.scale)))
+            with open(new_path, encoding="utf-8") as f:
+                assert len(json.load(f)["features"]) == len(encoded) * args.scale
+
+            print(
+                f"{name:<32}{len(encoded) * args.scale:>9}"
+                f"{os.path.getsize(old_path) / 1e3:>10.1f}kB{os.path.getsize(new_path) / 1e3:>10.1f}kB"
+                f"{old_time:>9.3f}s{new_time:>9.3f}s"
+                f"{old_peak / 1e6:>9.1f}MB{new_peak / 1e6:>9.1f}MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Fills a height history store with synthetic 15 minute readings, one append per
+# simulated hourly run, then times compaction and last-N-hours gauge queries.
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+READING_INTERVAL = "15min"
+
+
+def synthetic_run(site_ids, run_end, rng):
+    """Readings of every gauge for the three hours before run_end, as one scrape would see them."""
+    times = pd.date_range(run_end - pd.Timedelta(hours=3), run_end, freq=READING_INTERVAL)
+    return pd.DataFrame({
+        "site_id": np.repeat(site_ids, len(times)),
+        "observed_at": np.tile(times, len(site_ids)),
+        "value": rng.uniform(-1, 10, len(site_ids) * len(times)),
+        "quality": 1
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the stream height history store")
+    parser.add_argument("--gauges", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    sys.path.insert(0, SCRIPTS_DIR)
+    from height_history import HeightHistory
+
+    rng = np.random.default_rng(42)
+    site_ids = [f"{i:06d}" for i in range(args.gauges)]
+    now = pd.Timestamp("2026-01-31 23:00", tz="UTC")
+    runs = pd.date_range(now - pd.Timedelta(days=args.days), now, freq="1h")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        history = HeightHistory(tmp)
+        start = time.perf_counter()
+        inserted = 0
+        for run_end in runs:
+            inserted += history.append("bom", synthetic_run(site_ids, run_end, rng), now=run_end)
+        elapsed = time.perf_counter() - start
+        print(f"append     {len(runs)} runs, {inserted} readings in {elapsed:.1f}s ({elapsed / len(runs) * 1000:.0f} ms/run)")
+
+        start = time.perf_counter()
+        merged = history.compact(now=now)
+        size_mb = sum(entry.stat().st_size for entry in os.scandir(tmp)) / 1e6
+        print(f"compact    {merged} daily partitions in {time.perf_counter() - start:.1f}s, store {size_mb:.1f} MB")
+
+        assert history.append("bom", synthetic_run(site_ids, now, rng), now=now) == 0, "re-append stored duplicates"
+        for hours in (6, 24, 72, 24 * 14):
+            timings = []
+            for site_id in rng.choice(site_ids, args.queries):
+                start = time.perf_counter()
+                df = history.query(site_id, hours, end=now)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            print(
+                f"query {hours:>4}h rows={len(df):>5} p50={statistics.median(timings):6.2f} ms "
+                f"p95={timings[int(len(timings) * 0.95)]:6.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
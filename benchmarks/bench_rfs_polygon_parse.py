@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Compares the pure Python and NumPy polygon string parsers in
+# rfs_hr_burns_data_process on synthetic large-burn polygons.
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+
+
+def synthetic_polygon(vertices, bad_every=0, seed=42):
+    rng = random.Random(seed)
+    points = []
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices
+        radius = 0.05 + rng.uniform(-0.002, 0.002)
+        points.append(f"{-33.7 + radius * math.sin(angle):.10f};{150.3 + radius * math.cos(angle):.10f}")
+        if bad_every and i % bad_every == 0:
+            points.append(rng.choice(["", "abc", "1;2;3", "-33.7", ";150.3"]))
+    return "|".join(points) + "|"
+
+
+def legacy_ring(rfs, polygon_str):
+    coords = rfs.parse_polygon_python(polygon_str)
+    if coords and coords[0] != coords[-1]:
+        coords.append(coords[0])
+    return coords
+
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RFS polygon string parsing")
+    parser.add_argument("--vertices", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.0001)
+    args = parser.parse_args()
+
+    os.environ.setdefault("OUTPUT_DIR", tempfile.mkdtemp())
+    sys.path.insert(0, SCRIPTS_DIR)
+    import rfs_hr_burns_data_process as rfs
+    rfs.load_numpy()
+
+    for label, polygon_str in [
+        ("clean", synthetic_polygon(args.vertices)),
+        ("with bad tokens", synthetic_polygon(args.vertices, bad_every=1000)),
+    ]:
+        legacy_time, expected = best_of(lambda: legacy_ring(rfs, polygon_str), args.repeat)
+        numpy_time, ring = best_of(lambda: rfs.build_ring(polygon_str), args.repeat)
+        list_time, ring_list = best_of(lambda: rfs.build_ring(polygon_str).tolist(), args.repeat)
+        assert ring_list == expected, f"{label}: NumPy parser output differs"
+        simplify_time, simplified = best_of(lambda: rfs.build_ring(polygon_str, args.tolerance), args.repeat)
+        print(f"{label} ({len(expected)} vertices)")
+        print(f"  python lists:           {legacy_time * 1000:8.1f} ms")
+        print(f"  numpy array:            {numpy_time * 1000:8.1f} ms ({legacy_time / numpy_time:.1f}x)")
+        print(f"  numpy array + tolist(): {list_time * 1000:8.1f} ms ({legacy_time / list_time:.1f}x)")
+        print(f"  numpy + simplify({args.tolerance}): {simplify_time * 1000:8.1f} ms -> {len(simplified)} vertices")
+
+
+if __name__ == "__main__":
+    main()
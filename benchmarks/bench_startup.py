@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+# Measures how long each script takes to import using python -X importtime and
+# checks it against a per-script budget. The cumulative time of the script's own
+# module is used, which excludes interpreter startup. Each measurement runs in a
+# fresh process; the best of --repeat runs is reported to smooth out noise.
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+
+# Import budgets in milliseconds. The json scripts and crown roads defer requests,
+# numpy, pandas and geopandas to the stages that need them; the stream scripts
+# use pandas on every run that has work to do, so they import it up front.
+BUDGETS_MS = {
+    "gnb_proposals_data_process": 100,
+    "rfs_hr_burns_data_process": 100,
+    "ropewiki_canyons_data_process": 100,
+    "crown_road_sales_process": 100,
+    "run_all": 250,
+    "bom_stream_data_process": 1200,
+    "wnsw_stream_data_process": 1200,
+}
+
+
+def import_time_ms(module, env):
+    """Cumulative import time of module in a fresh interpreter, in milliseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SCRIPTS_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    for line in reversed(result.stderr.splitlines()):
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000
+    raise RuntimeError(f"no importtime line for {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check script import times against their budgets")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", help="comma separated script modules to measure")
+    args = parser.parse_args()
+
+    modules = args.only.split(",") if args.only else list(BUDGETS_MS)
+    over_budget = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "OUTPUT_DIR": tmp, "INPUT_DIR": tmp}
+        for module in modules:
+            best = min(import_time_ms(module, env) for _ in range(args.repeat))
+            budget = BUDGETS_MS[module]
+            status = "ok" if best <= budget else "OVER"
+            print(f"{module:<32} {best:8.1f} ms  budget {budget:>5} ms  {status}")
+            if best > budget:
+                over_budget.append(module)
+
+    if over_budget:
+        print(f"Over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
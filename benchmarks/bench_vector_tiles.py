@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Times vector tile export of the committed GeoJSON files in datasets/: a full
+# build into a new archive, an unchanged re-export (hashing only) and a re-export
+# after one feature per layer changed, which rebuilds only the tiles it touches.
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SCRIPTS_DIR = os.path.join(ROOT, "scripts")
+DATASETS = [
+    "bom_au_stream_gauges.geojson",
+    "getlostmaps_huts.geojson",
+    "getlostmaps_ruins.geojson",
+    "getlostmaps_repeaters.geojson",
+    "rfs_hr_burns.geojson",
+    "wnsw_schedule_1.geojson",
+    "wnsw_schedule_2.geojson",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full and incremental vector tile export")
+    parser.add_argument("--max-zoom", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    sys.path.insert(0, SCRIPTS_DIR)
+    import vector_tiles
+
+    layers = {}
+    for name in DATASETS:
+        path = os.path.join(ROOT, "datasets", name)
+        if os.path.exists(path):
+            layers[os.path.splitext(name)[0]] = vector_tiles.read_features(path)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = os.path.join(tmp, "bench.mbtiles")
+        runs = [("full build", layers), ("unchanged", layers)]
+        edited = {name: [json.loads(json.dumps(feature)) for feature in features] for name, features in layers.items()}
+        for features in edited.values():
+            if features:
+                features[0].setdefault("properties", {})["bench_edit"] = 1
+        runs.append(("one edit per layer", edited))
+
+        print(f"{sum(len(f) for f in layers.values())} features in {len(layers)} layers, zoom {vector_tiles.MIN_ZOOM}-{args.max_zoom}, {args.workers} workers")
+        for label, run_layers in runs:
+            start = time.perf_counter()
+            stats = vector_tiles.export_tiles(archive, run_layers, max_zoom=args.max_zoom, workers=args.workers)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{label:<20}{elapsed:>8.2f}s  {stats['rebuilt']:>6} of {stats['tiles']} tiles rebuilt"
+                f"  archive {os.path.getsize(archive) / 1e6:.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+import argparse
+import gzip
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Compares the original WaterNSW ingestion (curl into memory, ET.fromstring,
+# per-site dicts, per-row strptime and shapely Points) with the streaming path
+# (pooled HTTP, iterparse, column arrays, vectorised datetime parsing,
+# points_from_xy) on a synthetic sites XML file
+# served gzip-encoded from a local HTTP server. Each path runs in its own
+# process so peak RSS is measured independently.
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+
+
+def write_synthetic_xml(path, sites):
+    rng = random.Random(42)
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<sites>\n')
+        for i in range(sites):
+            f.write(
+                f'<site station="{210000 + i}" grpvals="100" grpvalsdesc="Stream Water Level" '
+                f'latdec="{rng.uniform(-37, -28):.6f}" lngdec="{rng.uniform(141, 153):.6f}" '
+                f'shortname="SITE {i}" stname="RIVER AT SITE {i}" var_100x00_100="{rng.uniform(0, 5):.3f}" '
+                f'var_100x00_100_dt="202506170{rng.randint(0, 9)}3000" colour="{rng.choice(["green", "amber", "red"])}"/>\n'
+            )
+        f.write("</sites>\n")
+
+
+def serve(path):
+    with open(path, "rb") as f:
+        body = f.read()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/xml")
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def legacy_format_datetime(raw_datetime):
+    from datetime import datetime
+    if raw_datetime:
+        try:
+            return datetime.strptime(raw_datetime, "%Y%m%d%H%M%S").isoformat() + "Z"
+        except ValueError:
+            return None
+    return None
+
+
+def run_legacy(url):
+    import xml.etree.ElementTree as ET
+    import geopandas as gpd
+    from shapely.geometry import Point
+
+    xml_data = subprocess.run(["curl", "--fail", "--silent", "--compressed", url], check=True, capture_output=True).stdout
+    root = ET.fromstring(xml_data)
+    data = []
+    for site in root.findall(".//site"):
+        data.append({
+            "site_station": site.get("station"),
+            "grpvals": site.get("grpvals"),
+            "grpvalsdesc": site.get("grpvalsdesc"),
+            "latdec": float(site.get("latdec")) if site.get("latdec") else None,
+            "lngdec": float(site.get("lngdec")) if site.get("lngdec") else None,
+            "shortname": site.get("shortname"),
+            "stname": site.get("stname"),
+            "height": float(site.get("var_100x00_100")) if site.get("var_100x00_100") else None,
+            "height_datetime": legacy_format_datetime(site.get("var_100x00_100_dt")),
+            "colour": site.get("colour")
+        })
+    geometry = [Point(d["lngdec"], d["latdec"]) if d["lngdec"] and d["latdec"] else None for d in data]
+    return gpd.GeoDataFrame(data, geometry=geometry, crs="EPSG:4326")
+
+
+def run_streaming(url):
+    import wnsw_stream_data_process as wnsw
+
+    with wnsw.download_xml(url) as stream:
+        columns = wnsw.parse_sites(stream)
+    return wnsw.build_site_frame(columns)
+
+
+def child(mode, url):
+    sys.path.insert(0, SCRIPTS_DIR)
+    import wnsw_stream_data_process  # noqa: F401  keep import cost out of the timing
+    baseline_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    start = time.perf_counter()
+    gdf = run_legacy(url) if mode == "legacy" else run_streaming(url)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:<10} sites={len(gdf):>7} time={elapsed:6.2f}s peak_rss={peak_mb:7.1f} MB (after imports {baseline_mb:.1f} MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark WaterNSW XML ingestion")
+    parser.add_argument("--sites", type=int, default=50_000)
+    parser.add_argument("--child", choices=["legacy", "streaming"])
+    parser.add_argument("--url")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.url)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sites.xml.gz")
+        write_synthetic_xml(path, args.sites)
+        server = serve(path)
+        url = f"http://127.0.0.1:{server.server_port}/sites.rs.anon.xml"
+        print(f"synthetic file: {args.sites} sites, {os.path.getsize(path) / 1e6:.1f} MB gzipped")
+        for mode in ("legacy", "streaming"):
+            subprocess.run([sys.executable, __file__, "--child", mode, "--url", url], check=True)
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import tempfile
+from urllib.parse import urlencode, urlsplit
+from xml.sax.saxutils import quoteattr
+
+from stand_ins import fixture_path
+
+# builds the fixtures served by stand_ins.py for every dataset script at a given scale
+# 1x is a typical live response. BOM, WaterNSW and RFS replay the snapshots recorded
+# in datasets/ in their source formats (the BOM station list is the real input);
+# crown roads, GNB and Ropewiki have no usable snapshot and are synthetic.
+# Larger scales replicate the 1x records under new ids.
+#
+#   python benchmarks/fixtures.py --root /tmp/fixtures/10x --scale 10
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SCRIPTS_DIR = os.path.join(REPO_DIR, "scripts")
+SNAPSHOT_DIR = os.path.join(REPO_DIR, "datasets")
+BOM_FTP_DIRECTORY = "/anon/gen/fwo/"
+BOM_HEIGHT_FILE = "IDZ65910_20250617040000.hcs"
+
+# records in a 1x fixture for the synthetic datasets
+BASE_COUNTS = {"rfs": 100, "gnb": 50, "ropewiki": 2000, "crown_roads": 500}
+
+
+def url_fixture_path(root, url):
+    """Fixture file path for a live URL."""
+    parts = urlsplit(url)
+    return fixture_path(root, parts.netloc, parts.path, parts.query)
+
+
+def write_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    mode = "wb" if isinstance(data, bytes) else "w"
+    with open(path, mode, **({} if mode == "wb" else {"encoding": "utf-8"})) as f:
+        f.write(data)
+    return len(data)
+
+
+def copy_id(value, copy):
+    """Id of a replicated record; the first copy keeps the recorded id."""
+    return value if copy == 0 else f"{value}.{copy}"
+
+
+def build_rfs(root, scale, rng):
+    import rfs_hr_burns_data_process as rfs
+
+    with open(os.path.join(SNAPSHOT_DIR, "rfs_hr_burns.geojson"), encoding="utf-8") as f:
+        recorded = json.load(f)["features"]
+    templates = []
+    for feature in recorded:
+        polygons = [
+            {"polygon": "|".join(f"{lat};{lon}" for lon, lat in polygon[0])}
+            for polygon in feature["geometry"]["coordinates"]
+        ]
+        templates.append({**feature["properties"], "geometryType": "MultiPolygon", "polygons": polygons})
+
+    results = []
+    for i in range(BASE_COUNTS["rfs"] * scale):
+        template = templates[i % len(templates)]
+        results.append({**template, "guarReference": f"{template['guarReference']}-{i}"})
+    size = write_file(url_fixture_path(root, rfs.HR_MAP_URL), json.dumps({"results": results}))
+    return len(results), size
+
+
+def build_gnb(root, scale, rng):
+    import gnb_proposals_data_process as gnb
+
+    designations = ["Locality", "Reserve", "Park", "Road", "Bridge", "Bay"]
+    records = []
+    size = 0
+    for i in range(BASE_COUNTS["gnb"] * scale):
+        geoname_id = str(90000 + i)
+        records.append({
+            "advertisement_identifier": 1000 + i,
+            "geoname_identifier": geoname_id,
+            "date_start": "2025-06-01",
+            "date_end": "2025-07-01",
+            "designation": rng.choice(designations)
+        })
+        geoname = {
+            "geoname_identifier": geoname_id,
+            "geographical_name": f"Proposed Name {i}",
+            "designation": records[-1]["designation"],
+            "longitude": round(rng.uniform(141, 153.6), 6),
+            "latitude": round(rng.uniform(-37.5, -28.2), 6)
+        }
+        size += write_file(url_fixture_path(root, gnb.GEONAME_URL_TEMPLATE.format(geoname_id)), json.dumps(geoname))
+    size += write_file(url_fixture_path(root, gnb.NAMING_URL), json.dumps({"naming": {"current": records}}))
+    return len(records), size
+
+
+def build_ropewiki(root, scale, rng):
+    import ropewiki_canyons_data_process as ropewiki
+
+    regions = ["Blue Mountains", "Kanangra-Boyd", "Wollemi", "Grampians", "Tasmania", "Carnarvon"]
+    canyons = {}
+    for i in range(BASE_COUNTS["ropewiki"] * scale):
+        name = f"Canyon {i:07d}"
+        region = rng.choice(regions)
+        canyons[name] = {
+            "printouts": {
+                "Has coordinates": [{"lat": round(rng.uniform(-43, -24), 6), "lon": round(rng.uniform(144, 153), 6)}],
+                "Has summary": [f"{rng.randint(2, 4)}A{rng.randint(1, 3)} II ({rng.randint(2, 9)}h)"],
+                "Has info regions": [region, "Australia"],
+                "Has info major region": [region],
+                "Has info rappels": [f"{rng.randint(0, 8)}r"],
+                "Has longest rappel": [{"value": rng.randint(10, 200), "unit": "ft"}],
+                "Has pageid": [str(20000 + i)]
+            },
+            "fulltext": name,
+            "fullurl": f"https://ropewiki.com/{name.replace(' ', '_')}",
+            "namespace": 0,
+            "exists": "1"
+        }
+
+    names = list(canyons)
+    limit = ropewiki.PAGE_LIMIT
+    pages = range(0, len(names), limit)
+    size = 0
+    for offset in pages:
+        page = {"query": {"results": {name: canyons[name] for name in names[offset:offset + limit]}}}
+        if offset + limit < len(names):
+            page["query-continue-offset"] = offset + limit
+        query = urlencode({"query": ropewiki.build_query(offset)})
+        size += write_file(url_fixture_path(root, f"{ropewiki.ROPEWIKI_URL}?{query}"), json.dumps(page))
+    # Concurrent batches may ask for a few pages past the end, which come back empty
+    for offset in range(len(pages) * limit, (len(pages) + ropewiki.FETCH_WORKERS) * limit, limit):
+        query = urlencode({"query": ropewiki.build_query(offset)})
+        size += write_file(url_fixture_path(root, f"{ropewiki.ROPEWIKI_URL}?{query}"), json.dumps({"query": {"results": []}}))
+    return len(names), size
+
+
+def build_crown_roads(root, scale, rng):
+    import crown_road_sales_process as crown
+
+    lines = ["Date\tTitle\tHtml\tLongtitude\tLatitiude\tExpiry Date\tComments"]
+    for i in range(BASE_COUNTS["crown_roads"] * scale):
+        items = "".join(f"<li>Lot {rng.randint(1, 99)} DP {rng.randint(100000, 999999)}&nbsp;</li>" for _ in range(rng.randint(1, 4)))
+        html = (
+            f"<p>Proposed sale of Crown road at Locality {i} "
+            f"(Cluster {rng.randint(1, 40)}, file ref {rng.randint(10, 99)}/{rng.randint(1000, 9999)})</p>"
+            f"<ul>{items}</ul><p>Submissions to <a href='mailto:roads{i % 7}@crownland.nsw.gov.au'>"
+            f"roads{i % 7}@crownland.nsw.gov.au</a></p>"
+        )
+        expiry = f"20{rng.randint(24, 27)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        lines.append(
+            f"2025-0{rng.randint(1, 6)}-01\tCrown road sale {i}\t{html}\t"
+            f"{rng.uniform(141, 153.6):.6f}\t{rng.uniform(-37.5, -28.2):.6f}\t{expiry}\t"
+        )
+    size = write_file(url_fixture_path(root, crown.SOURCE_URL), "\n".join(lines) + "\n")
+    return len(lines) - 1, size
+
+
+def build_wnsw(root, scale, rng):
+    import geopandas as gpd
+    import wnsw_stream_data_process as wnsw
+
+    sites = gpd.read_file(os.path.join(SNAPSHOT_DIR, "wnsw_stream_height_data.gpkg")).drop(columns="geometry")
+    # the snapshot stores ISO timestamps; the feed uses YYYYMMDDHHMMSS
+    sites["height_datetime"] = sites["height_datetime"].str.replace(r"[-:TZ]", "", regex=True)
+    sites = sites.astype(object).where(sites.notna(), None)
+    records = sites.to_dict("records")
+
+    path = url_fixture_path(root, wnsw.SITES_URL) + ".gz"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    count = 0
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<sites>\n')
+        for copy in range(scale):
+            for record in records:
+                record = {**record, "site_station": copy_id(record["site_station"], copy)}
+                attributes = " ".join(
+                    f"{attribute}={quoteattr(str(record[column]))}"
+                    for column, attribute in wnsw.SITE_ATTRIBUTES.items()
+                    if record[column] is not None
+                )
+                f.write(f"<site {attributes}/>\n")
+                count += 1
+        f.write("</sites>\n")
+    return count, os.path.getsize(path)
+
+
+def build_bom(root, scale, rng):
+    import pandas as pd
+
+    stations = pd.read_csv(os.path.join(SNAPSHOT_DIR, "bom_rain_river_station_list.csv"), dtype={"SENSORID": str})
+    with open(os.path.join(SNAPSHOT_DIR, "bom_au_stream_gauges.geojson"), encoding="utf-8") as f:
+        readings = {
+            feature["properties"]["SiteId"]: feature["properties"]
+            for feature in json.load(f)["features"]
+        }
+
+    copies = [stations.assign(SENSORID=stations["SENSORID"].map(lambda sensor_id: copy_id(sensor_id, copy))) for copy in range(scale)]
+    station_path = os.path.join(root, "input", "rain_river_station_list.csv")
+    os.makedirs(os.path.dirname(station_path), exist_ok=True)
+    pd.concat(copies, ignore_index=True).to_csv(station_path, index=False)
+
+    sensor_types = {"water level gauge": ("WL", "metres", "LGH"), "rain gauge": ("RN", "mm", "TIPPING_BUCKET")}
+    height_path = os.path.join(root, "ftp", BOM_FTP_DIRECTORY.strip("/"), BOM_HEIGHT_FILE)
+    os.makedirs(os.path.dirname(height_path), exist_ok=True)
+    index = 0
+    with open(height_path, "w", encoding="utf-8") as f:
+        for i in range(8):
+            f.write(f"# IDZ65910 stand-in header line {i}\n")
+        for copy in range(scale):
+            for sensor_id, sensor_type in zip(stations["SENSORID"], stations["SENSOR_TYPE"]):
+                code, unit, param = sensor_types.get(sensor_type, ("TL", "metres", "AHD"))
+                recorded = readings.get(sensor_id, {})
+                timestamp = recorded.get("ObservationTimestamp") or "2025-06-17T03:30:00Z"
+                value = recorded.get("RealValue")
+                value = rng.uniform(-1, 10) if value is None else value
+                index += 1
+                f.write(f"{index},{code},1,SSR,{copy_id(sensor_id, copy)},{timestamp},{value:.3f},{unit},{param},,1,\n")
+    # other products in the directory, so listing has something to filter out
+    write_file(os.path.join(os.path.dirname(height_path), "IDN60903.html"), "<html></html>\n")
+    return index, os.path.getsize(height_path) + os.path.getsize(station_path)
+
+
+BUILDERS = {
+    "gnb": build_gnb,
+    "rfs": build_rfs,
+    "ropewiki": build_ropewiki,
+    "crown_roads": build_crown_roads,
+    "bom": build_bom,
+    "wnsw": build_wnsw,
+}
+
+
+def build_fixtures(root, scale, datasets=None):
+    """Write the fixtures for each dataset under root and a manifest of their sizes."""
+    manifest = {}
+    for dataset in datasets or BUILDERS:
+        records, size = BUILDERS[dataset](root, scale, random.Random(42))
+        manifest[dataset] = {"records": records, "fixture_bytes": size}
+    with open(os.path.join(root, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build benchmark fixtures for the dataset scripts")
+    parser.add_argument("--root", required=True)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--datasets", help=f"comma separated datasets ({', '.join(BUILDERS)})")
+    args = parser.parse_args()
+
+    # the scripts are imported for their URLs and settings; keep their outputs out of the repo
+    os.environ["OUTPUT_DIR"] = tempfile.mkdtemp()
+    sys.path.insert(0, SCRIPTS_DIR)
+    manifest = build_fixtures(args.root, args.scale, args.datasets.split(",") if args.datasets else None)
+    for dataset, info in manifest.items():
+        print(f"{dataset:<12} {info['records']:>9} records {info['fixture_bytes'] / 1e6:9.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
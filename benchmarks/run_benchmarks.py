@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+import argparse
+import importlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# runs every dataset script offline against local stand-ins (stand_ins.py) serving
+# fixtures built by fixtures.py at each scale, timing each stage (fetch, parse,
+# transform, write) and recording peak RSS. Each dataset and scale runs in its own
+# process so peak RSS is measured independently. Results are saved as JSON under
+# benchmarks/results/ and can be compared with an earlier run to spot regressions.
+#
+#   python benchmarks/run_benchmarks.py [--datasets rfs,bom] [--scales 1,10,100]
+#   python benchmarks/run_benchmarks.py --compare benchmarks/results/<earlier>.json
+#   python benchmarks/run_benchmarks.py --compare <earlier>.json --results <later>.json
+#   python benchmarks/run_benchmarks.py --scales 1 --latency 0.05 --fail-every 4 --drop-every 7
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(BENCH_DIR, "..", "scripts")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+NOISE_FLOOR_S = 0.005  # stage time differences below this are not reported as regressions
+
+
+class StageTimer:
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = round(time.perf_counter() - start, 4)
+
+
+# Each bench runs one script's stages with its own functions. Streaming stages
+# that fetch and parse together are timed as one "fetch+parse" stage; features
+# are materialised between stages so each stage is timed on its own.
+
+def bench_gnb(gnb, session, timer):
+    with timer.stage("fetch+parse"):
+        data = gnb.fetch_json(gnb.NAMING_URL, session)
+        records = [record for record in data["naming"]["current"] if record.get("geoname_identifier")]
+        cache = gnb.GeonameCache()
+        geonames = gnb.fetch_geonames([record["geoname_identifier"] for record in records], session, cache)
+        cache.close()
+    with timer.stage("transform"):
+        features = list(gnb.iter_naming_features(records, geonames))
+    with timer.stage("write"):
+        gnb.write_features_if_changed(gnb.OUTPUT_FILE, features, "geoname_identifier")
+    return len(features)
+
+
+def bench_rfs(rfs, session, timer):
+    with timer.stage("fetch"):
+        content = rfs.fetch.get(rfs.HR_MAP_URL, session, timeout=rfs.FETCH_TIMEOUT).content
+    with timer.stage("parse"):
+        results = json.loads(content)["results"]
+    with timer.stage("transform"):
+        features = list(rfs.iter_burn_features(results))
+    with timer.stage("write"):
+        rfs.write_features_if_changed(rfs.output_path, features, "guarReference")
+    return len(features)
+
+
+def bench_ropewiki(ropewiki, session, timer):
+    with timer.stage("fetch+parse"):
+        pages = list(ropewiki.fetch_canyons(session=session))
+    with timer.stage("transform"):
+        features = list(ropewiki.process_canyons(pages))
+    with timer.stage("write"):
+        ropewiki.write_features_if_changed(ropewiki.output_path, features, "pageid")
+    return len(features)
+
+
+def bench_crown_roads(crown, session, timer):
+    with timer.stage("fetch"):
+        crown.download_tsv(crown.SOURCE_URL, crown.LOCAL_FILE, {}, session)
+    with timer.stage("parse"):
+        gdf = crown.parse_tsv(crown.LOCAL_FILE)
+    with timer.stage("write"):
+        crown.write_active_split(gdf)
+    return len(gdf)
+
+
+def bench_bom(bom, session, timer):
+    with timer.stage("stations"):
+        station_info = bom.load_stations()
+    with timer.stage("fetch+parse"):
+        height = bom.get_height(set(station_info.index))
+    with timer.stage("transform"):
+        merged = bom.join_stations_with_height(height, station_info)
+    with timer.stage("write"):
+        bom.create_spatial_files(merged)
+    with timer.stage("history"):
+        bom.record_readings("bom", bom.height_readings(height), os.path.join(bom.output_dir, "height_history"))
+    return len(merged)
+
+
+def bench_wnsw(wnsw, session, timer):
+    with timer.stage("fetch+parse"):
+        with wnsw.download_xml(wnsw.SITES_URL, session) as stream:
+            columns = wnsw.parse_sites(stream)
+    with timer.stage("transform"):
+        gdf = wnsw.build_site_frame(columns)
+    with timer.stage("write"):
+        wnsw.write_sites(gdf, wnsw.OUTPUT_FILE)
+    with timer.stage("history"):
+        wnsw.record_readings("wnsw", wnsw.height_readings(gdf), os.path.join(wnsw.OUTPUT_DIR, "height_history"))
+    return len(gdf)
+
+
+BENCHES = {
+    "gnb": ("gnb_proposals_data_process", bench_gnb),
+    "rfs": ("rfs_hr_burns_data_process", bench_rfs),
+    "ropewiki": ("ropewiki_canyons_data_process", bench_ropewiki),
+    "crown_roads": ("crown_road_sales_process", bench_crown_roads),
+    "bom": ("bom_stream_data_process", bench_bom),
+    "wnsw": ("wnsw_stream_data_process", bench_wnsw),
+}
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(dataset, root, http_port, ftp_port, result_path):
+    """Run one dataset's stages against the stand-ins and write the result as JSON."""
+    sys.path.insert(0, SCRIPTS_DIR)
+    import fixtures
+    import stand_ins
+
+    output_dir = tempfile.mkdtemp()
+    os.environ.update({
+        "OUTPUT_DIR": output_dir,
+        "INPUT_DIR": os.path.join(root, "input"),
+        "FTP_HOST": "127.0.0.1",
+        "FTP_PORT": str(ftp_port or 21),
+        "FTP_DIRECTORY": fixtures.BOM_FTP_DIRECTORY
+    })
+    module_name, bench = BENCHES[dataset]
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    import_s = time.perf_counter() - start
+    session = stand_ins.stand_in_session(http_port)
+    import_rss = peak_rss_mb()
+
+    timer = StageTimer()
+    start = time.perf_counter()
+    features = bench(module, session, timer)
+    total_s = time.perf_counter() - start
+    session.close()
+    shutil.rmtree(output_dir, ignore_errors=True)
+
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "features": features,
+            "fetch": module.fetch.stats(),
+            "import_s": round(import_s, 4),
+            "stages": timer.stages,
+            "total_s": round(total_s, 4),
+            "import_rss_mb": round(import_rss, 1),
+            "peak_rss_mb": round(peak_rss_mb(), 1)
+        }, f)
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD"], cwd=BENCH_DIR).returncode != 0
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+def run_scale(scale, datasets, tmp, verbose=False, faults=()):
+    """Build the fixtures for one scale, start the stand-ins (with faults, as their options) and run each dataset."""
+    root = os.path.join(tmp, f"{scale}x")
+    subprocess.run(
+        [sys.executable, os.path.join(BENCH_DIR, "fixtures.py"), "--root", root, "--scale", str(scale), "--datasets", ",".join(datasets)],
+        check=True, capture_output=not verbose
+    )
+    with open(os.path.join(root, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    stand_in = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "stand_ins.py"), "--root", root, *faults], stdout=subprocess.PIPE, text=True
+    )
+    results = []
+    try:
+        ports = json.loads(stand_in.stdout.readline())
+        for dataset in datasets:
+            if dataset == "bom" and ports["ftp_port"] is None:
+                print(f"{dataset:<12} {scale:>4}x skipped: pyftpdlib is not installed")
+                continue
+            result_path = os.path.join(tmp, f"{dataset}-{scale}x.json")
+            process = subprocess.run(
+                [
+                    sys.executable, __file__, "--child", dataset, "--root", root, "--result-path", result_path,
+                    "--http-port", str(ports["http_port"]), "--ftp-port", str(ports["ftp_port"] or 0)
+                ],
+                capture_output=not verbose, text=True
+            )
+            result = {"dataset": dataset, "scale": scale, **manifest[dataset]}
+            if process.returncode != 0:
+                print(f"{dataset:<12} {scale:>4}x FAILED\n{(process.stderr or '')[-2000:]}")
+                result["error"] = (process.stderr or "").strip().splitlines()[-1:] or ["failed"]
+            else:
+                with open(result_path, encoding="utf-8") as f:
+                    result.update(json.load(f))
+                print_result(result)
+            results.append(result)
+    finally:
+        stand_in.terminate()
+        stand_in.wait()
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def print_result(result):
+    stages = "  ".join(f"{name} {seconds:.3f}s" for name, seconds in result["stages"].items())
+    retries = sum(host["retries"] for host in result.get("fetch", {}).values())
+    print(
+        f"{result['dataset']:<12} {result['scale']:>4}x {result['records']:>9} records  "
+        f"total {result['total_s']:7.3f}s  peak {result['peak_rss_mb']:7.1f} MB  {stages}"
+        + (f"  ({retries} retries)" if retries else "")
+    )
+
+
+def compare(baseline, current, threshold):
+    """Print stage time and peak RSS changes between two result files; returns the regressions."""
+    previous = {(result["dataset"], result["scale"]): result for result in baseline["results"] if "error" not in result}
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('created_at')}):")
+    for result in current["results"]:
+        old = previous.get((result["dataset"], result["scale"]))
+        if old is None or "error" in result:
+            continue
+        metrics = [(stage, old["stages"].get(stage), seconds, "s") for stage, seconds in result["stages"].items()]
+        metrics.append(("peak_rss", old["peak_rss_mb"], result["peak_rss_mb"], " MB"))
+        for name, before, after, unit in metrics:
+            if before is None:
+                continue
+            change = (after - before) / before if before else 0
+            noise = NOISE_FLOOR_S if unit == "s" else 1
+            flag = ""
+            if change > threshold and after - before > noise:
+                flag = "  REGRESSION"
+                regressions.append((result["dataset"], result["scale"], name))
+            print(f"  {result['dataset']:<12} {result['scale']:>4}x {name:<12} {before:9.3f} -> {after:9.3f}{unit} ({change:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every dataset script offline against local stand-ins")
+    parser.add_argument("--datasets", help=f"comma separated datasets ({', '.join(BENCHES)})")
+    parser.add_argument("--scales", default="1,10,100", help="comma separated fixture scale factors")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    parser.add_argument("--results", help="with --compare, compare this result file instead of running")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown reported as a regression")
+    parser.add_argument("--verbose", action="store_true", help="show the scripts' own output")
+    parser.add_argument("--latency", type=float, default=0.0, help="stand-in delay before every response, seconds")
+    parser.add_argument("--fail-every", type=int, default=0, help="stand-ins answer every Nth request with an error")
+    parser.add_argument("--drop-every", type=int, default=0, help="stand-in drops every Nth HTTP connection")
+    parser.add_argument("--truncate-every", type=int, default=0, help="stand-in cuts off every Nth HTTP response body")
+    parser.add_argument("--child", choices=list(BENCHES))
+    parser.add_argument("--root")
+    parser.add_argument("--result-path")
+    parser.add_argument("--http-port", type=int)
+    parser.add_argument("--ftp-port", type=int)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.root, args.http_port, args.ftp_port, args.result_path)
+        return
+
+    if args.results:
+        with open(args.results, encoding="utf-8") as f:
+            current = json.load(f)
+    else:
+        datasets = args.datasets.split(",") if args.datasets else list(BENCHES)
+        scales = [int(scale) for scale in args.scales.split(",")]
+        created_at = datetime.now(timezone.utc)
+        commit = git_commit()
+        with tempfile.TemporaryDirectory() as tmp:
+            faults = [
+                "--latency", str(args.latency), "--fail-every", str(args.fail_every),
+                "--drop-every", str(args.drop_every), "--truncate-every", str(args.truncate_every)
+            ]
+            results = [result for scale in scales for result in run_scale(scale, datasets, tmp, args.verbose, faults)]
+        current = {
+            "created_at": created_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "faults": {
+                "latency": args.latency, "fail_every": args.fail_every,
+                "drop_every": args.drop_every, "truncate_every": args.truncate_every
+            },
+            "results": results
+        }
+        output = args.output or os.path.join(RESULTS_DIR, f"{created_at:%Y%m%dT%H%M%SZ}-{commit or 'unknown'}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions over {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# local stand-ins for the live services the dataset scripts talk to
+# fixtures live under a root directory written by fixtures.py:
+#   http/<host>/<path>          response body for https://<host>/<path>
+#   http/<host>/<path>.gz       served instead, gzip encoded, when present
+#   http/<host>/<path>/offset-N ask query pages, keyed by the offset in the query
+#   ftp/...                     anonymous read-only FTP root
+# faults can be injected to exercise the fetch layer: a delay before every
+# response, a 503 for every Nth request, a dropped connection for every Nth
+# request, a body cut off half way for every Nth request and, over FTP, a
+# refused login for every Nth connection
+# run as a process to serve a fixture root; prints the ports as one JSON line
+#
+#   python benchmarks/stand_ins.py --root /tmp/fixtures/1x [--latency 0.2 --fail-every 3 --drop-every 5]
+
+ASK_OFFSET_PATTERN = re.compile(r"\|offset=(\d+)")
+
+
+def fixture_path(root, host, path, query=""):
+    """File under root holding the response to a request for host/path?query."""
+    file_path = os.path.join(root, "http", host, path.lstrip("/"))
+    ask_query = parse_qs(query).get("query")
+    if ask_query:
+        offset = ASK_OFFSET_PATTERN.search(ask_query[0])
+        file_path = os.path.join(file_path, f"offset-{offset.group(1) if offset else 0}")
+    return file_path
+
+
+class Faults:
+    """Counts requests and decides which to fail; every=0 disables a fault."""
+
+    def __init__(self, latency=0.0, fail_every=0, drop_every=0, truncate_every=0):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.drop_every = drop_every
+        self.truncate_every = truncate_every
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def next(self):
+        """Number the next request (from 1), after the injected latency."""
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.count += 1
+            return self.count
+
+    @staticmethod
+    def hits(number, every):
+        return every > 0 and number % every == 0
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):  # clients that gave up, e.g. on a timeout
+            super().handle_error(request, client_address)
+
+
+def serve_http(root, faults=None):
+    """Serve fixture files over HTTP on a free local port, in a background thread."""
+    faults = faults or Faults()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, as the live services allow
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            number = faults.next()
+            if faults.hits(number, faults.drop_every):
+                self.close_connection = True  # no response at all
+                return
+            if faults.hits(number, faults.fail_every):
+                self.send_error(503)
+                return
+            url = urlsplit(self.path)
+            host, _, path = url.path.lstrip("/").partition("/")
+            file_path = fixture_path(root, host, path, url.query)
+            headers = {"Content-Type": "application/octet-stream"}
+            if os.path.isfile(f"{file_path}.gz") and "gzip" in self.headers.get("Accept-Encoding", ""):
+                file_path = f"{file_path}.gz"
+                headers["Content-Encoding"] = "gzip"
+            if not os.path.isfile(file_path):
+                self.send_error(404)
+                return
+            self.send_response(200)
+            headers["Content-Length"] = str(os.path.getsize(file_path))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            with open(file_path, "rb") as f:
+                if faults.hits(number, faults.truncate_every):
+                    self.wfile.write(f.read(os.path.getsize(file_path) // 2))
+                    self.close_connection = True
+                    return
+                shutil.copyfileobj(f, self.wfile, 65536)
+
+    server = QuietHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def serve_ftp(root, faults=None):
+    """Serve root/ftp read-only to anonymous users on a free local port; None without pyftpdlib."""
+    try:
+        from pyftpdlib.authorizers import DummyAuthorizer
+        from pyftpdlib.handlers import FTPHandler
+        from pyftpdlib.servers import ThreadedFTPServer
+    except ImportError:
+        return None
+    # pyftpdlib logs every command at INFO unless logging is already configured
+    logging.basicConfig(level=logging.WARNING)
+    ftp_root = os.path.join(root, "ftp")
+    os.makedirs(ftp_root, exist_ok=True)
+    authorizer = DummyAuthorizer()
+    authorizer.add_anonymous(ftp_root)
+    faults = faults or Faults()
+
+    class StandInFTPHandler(FTPHandler):
+        banner = "stand-in"
+
+        def ftp_USER(self, line):
+            if faults.hits(faults.next(), faults.fail_every):
+                self.respond("421 Service not available, closing control connection.")
+                self.close_when_done()
+                return
+            return super().ftp_USER(line)
+
+    handler = StandInFTPHandler
+    handler.authorizer = authorizer
+    server = ThreadedFTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def stand_in_session(http_port, pool_size=16):
+    """A requests session sending every http(s) request to the local HTTP stand-in."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    class StandInAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            url = urlsplit(request.url)
+            request.url = f"http://127.0.0.1:{http_port}/{url.netloc}{url.path}" + (f"?{url.query}" if url.query else "")
+            return super().send(request, **kwargs)
+
+    adapter = StandInAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve benchmark fixtures over local HTTP and FTP")
+    parser.add_argument("--root", required=True)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before every response")
+    parser.add_argument("--fail-every", type=int, default=0, help="answer every Nth request with 503 (FTP: 421)")
+    parser.add_argument("--drop-every", type=int, default=0, help="close the connection on every Nth HTTP request")
+    parser.add_argument("--truncate-every", type=int, default=0, help="cut off the body of every Nth HTTP response")
+    args = parser.parse_args()
+
+    http_server = serve_http(args.root, Faults(args.latency, args.fail_every, args.drop_every, args.truncate_every))
+    ftp_server = serve_ftp(args.root, Faults(args.latency, args.fail_every))
+    ports = {
+        "http_port": http_server.server_address[1],
+        "ftp_port": ftp_server.address[1] if ftp_server else None
+    }
+    print(json.dumps(ports), flush=True)
+    threading.Event().wait()  # serve until terminated
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,25 @@
 import pandas as pd
 import geopandas as gpd
 import os
-from ftplib import FTP
+from ftplib import error_perm
 import re
 import io
+import json
+import hashlib
+import time
+
+import fetch
+from feature_diff import diff_frame, has_changes, save_delta, summarise
+from height_history import record_readings
+from instrumentation import instrumented, stage
+from vector_tiles import EXPORT_TILES, export_layer, tiles_path
+from gauge_index import index_path, save_index
+from columnar_snapshot import EXPORT_SNAPSHOTS, snapshot_frame, snapshot_path
+from gauge_alerts import update_alerts
 
 # takes bom watergauage data and produces steam height spatial files
 # all au - geojson and geopackage
-# nsw only - geojson
+# per state - geojson (nsw by default, see PUBLISH_STATES)
 
 # Directory configuration from environment variables
 output_dir = os.environ.get("OUTPUT_DIR", "datasets")
@@ -17,20 +29,53 @@ os.makedirs(output_dir, exist_ok=True)
 # FTP details and environment variables
 ftp_host = os.getenv("FTP_HOST")
 ftp_directory = os.getenv("FTP_DIRECTORY")
+ftp_port = int(os.getenv("FTP_PORT", "21"))
 height_file_pattern = r"IDZ65910_\d+\.hcs"
+height_file_glob = "IDZ65910_*.hcs"
 height_file_header = [
     "IndexNo", "SensorType", "SensorDataType", "SiteIdType", "SiteId",
     "ObservationTimestamp", "RealValue", "Unit", "SensorParam1",
     "SensorParam2", "Quality", "Comment"
 ]
+height_file_skiprows = 8
+# Types used while parsing; integer codes are parsed as floats (which tolerate
+# blanks) and narrowed once the rows have been filtered
+height_file_dtypes = {
+    "IndexNo": "int64", "SensorType": "category", "SensorDataType": "float32",
+    "SiteIdType": "category", "SiteId": "category", "ObservationTimestamp": "category",
+    "RealValue": "float32", "Unit": "category", "SensorParam1": "category",
+    "SensorParam2": "category", "Quality": "float32", "Comment": "category"
+}
+height_file_int_columns = ["SensorDataType", "Quality"]
+height_file_str_columns = ["SiteId", "SensorParam1", "SensorParam2", "Comment"]
+height_file_categoricals = ["SensorType", "SiteIdType", "Unit"]
+height_value_decimals = 3  # RealValue precision in the .hcs files; float32 is only used while parsing
+height_sensor_type = "WL"
+height_chunk_bytes = 4 * 1024 * 1024
 
 # Station file path (read from input dir)
 station_file_path = os.path.join(input_dir, 'rain_river_station_list.csv')
+# Compiled water level gauge table, rebuilt whenever the station CSV changes; a
+# parquet file with the CSV's hash in its metadata, since it sits with the outputs
+station_cache_path = os.path.join(output_dir, 'bom_station_cache.parquet')
+station_sensor_type = 'water level gauge'
+station_categoricals = ['STATE', 'SENSOR_TYPE', 'P_REPORT_TIMESTEP', 'DATA_OWNER', 'REGULATIONS_DATA_OWNER_CODE']
 
 # Output filenames
 geojson_file_path = os.path.join(output_dir, 'au_stream_gauges.geojson')
-nsw_geojson_file_path = os.path.join(output_dir, 'nsw_stream_gauges.geojson')
 gpkg_file_path = os.path.join(output_dir, 'au_stream_gauges.gpkg')
+gpkg_layer = "stream_heights"
+gpkg_options = {"SPATIAL_INDEX": "YES"}  # R-tree, so GIS clients read by extent without a full scan
+
+# States published as separate GeoJSON files: comma separated codes, or "ALL"
+publish_states = [state.strip().upper() for state in os.getenv("PUBLISH_STATES", "NSW").split(",") if state.strip()]
+
+def state_geojson_file_path(state):
+    return os.path.join(output_dir, f'{state.lower()}_stream_gauges.geojson')
+
+# Last processed height file (name, size, MDTM), used to skip unchanged files
+state_file_path = os.path.join(output_dir, 'bom_height_state.json')
+force_reprocess = os.getenv("BOM_FORCE_REPROCESS", "").lower() in ("1", "true", "yes")
 
 def get_stations():
     if os.path.isfile(station_file_path):
@@ -38,73 +83,287 @@ def get_stations():
     else:
         print(f"File not found: {station_file_path}. Please ensure it is stored in the input directory.")
 
-def get_height():
-    # Connect to FTP
-    with FTP(ftp_host) as ftp:
-        ftp.login()
-        ftp.cwd(ftp_directory)
+def load_state():
+    if os.path.isfile(state_file_path):
+        with open(state_file_path, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+def save_state(file_info):
+    with open(state_file_path, "w", encoding="utf-8") as f:
+        json.dump(file_info, f, indent=2)
+
+def list_height_files(ftp):
+    # Ask the server to glob the listing; fall back to the full listing if unsupported
+    try:
+        files = ftp.nlst(height_file_glob)
+    except error_perm:
+        files = []
+    if not files:
         files = ftp.nlst()
+    files = [os.path.basename(file_name) for file_name in files]
+    return [file_name for file_name in files if re.match(height_file_pattern, file_name)]
+
+def get_file_info(ftp, file_name):
+    ftp.voidcmd("TYPE I")  # SIZE is only reliable in binary mode
+    info = {"file": file_name, "size": None, "mdtm": None}
+    try:
+        info["size"] = ftp.size(file_name)
+    except error_perm:
+        pass
+    try:
+        info["mdtm"] = ftp.voidcmd(f"MDTM {file_name}").split()[-1]
+    except error_perm:
+        pass
+    return info
+
+def parse_height_chunk(data, sensor_ids=None):
+    """Parse complete .hcs lines into a typed frame of water level rows."""
+    df = pd.read_csv(io.BytesIO(data), header=None, names=height_file_header, dtype=height_file_dtypes)
+    keep = df["SensorType"] == height_sensor_type
+    if sensor_ids is not None:
+        keep &= df["SiteId"].isin(sensor_ids)
+    return df[keep]
+
+class HeightStreamParser:
+    """
+    Parses a .hcs file as it is delivered in blocks (e.g. by retrbinary),
+    keeping only water level rows for the given sensors. Memory is bounded by
+    chunk_bytes plus the rows kept.
+    """
+
+    def __init__(self, sensor_ids=None, chunk_bytes=height_chunk_bytes):
+        self.sensor_ids = set(sensor_ids) if sensor_ids is not None else None
+        self.chunk_bytes = chunk_bytes
+        self.header_lines_left = height_file_skiprows
+        self.pending = bytearray()
+        self.frames = []
+
+    def feed(self, block):
+        self.pending += block
+        if self.header_lines_left:
+            self._skip_header()
+        if len(self.pending) >= self.chunk_bytes:
+            end = self.pending.rfind(b"\n") + 1
+            if end:
+                self._parse(bytes(self.pending[:end]))
+                del self.pending[:end]
+
+    def _skip_header(self):
+        while self.header_lines_left:
+            end = self.pending.find(b"\n")
+            if end < 0:
+                return
+            del self.pending[:end + 1]
+            self.header_lines_left -= 1
+
+    def _parse(self, data):
+        if data.strip():
+            self.frames.append(parse_height_chunk(data, self.sensor_ids))
+
+    def close(self):
+        """Parse any remaining data and return the combined DataFrame."""
+        if not self.header_lines_left:
+            self._parse(bytes(self.pending))
+        self.pending = bytearray()
+        if self.frames:
+            df = pd.concat(self.frames, ignore_index=True)
+        else:
+            df = pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in height_file_dtypes.items()})
+        self.frames = []
+        # Chunks carry their own categories, so the combined columns are retyped here
+        for column in height_file_int_columns:
+            df[column] = df[column].astype("Int16")
+        for column in height_file_str_columns:
+            df[column] = df[column].astype(object).astype(str).where(df[column].notna(), None)
+        for column in height_file_categoricals:
+            df[column] = df[column].astype(object).astype("category")
+        # Widening float32 gives 1.2300000190734863 for 1.23, so round back to the file's precision
+        df["RealValue"] = df["RealValue"].astype("float64").round(height_value_decimals)
+        df["ObservationTimestamp"] = pd.to_datetime(df["ObservationTimestamp"].astype(object), utc=True, errors="coerce")
+        return df
 
+@instrumented("bom")
+def get_height(sensor_ids=None):
+    # Connect to FTP, retrying refused or dropped connections
+    with fetch.ftp_connection(ftp_host, ftp_port, ftp_directory) as ftp:
         # Match the latest file by pattern
-        matching_files = [file_name for file_name in files if re.match(height_file_pattern, file_name)]
+        matching_files = list_height_files(ftp)
         latest_file = sorted(matching_files)[-1] if matching_files else None
 
         if latest_file:
+            file_info = get_file_info(ftp, latest_file)
+            if not force_reprocess and file_info == load_state():
+                print(f"Latest height file {latest_file} has already been processed.")
+                return None
+
             print(f"Downloading latest height file: {latest_file}")
-            # Retrieve the file content into memory
-            with io.BytesIO() as file_in_memory:
-                ftp.retrbinary(f"RETR {latest_file}", file_in_memory.write)
-                file_in_memory.seek(0)  # Reset pointer to the beginning of the file
-                # Load directly into a DataFrame, skipping the first 8 rows
-                df = pd.read_csv(file_in_memory, skiprows=8, header=None)
-                df.columns = height_file_header
-                print("Height data loaded into memory.")
-                return df
+            # Parse the file as it streams in rather than buffering it
+            parser = HeightStreamParser(sensor_ids)
+            fetch.ftp_retrieve(ftp, latest_file, parser.feed)
+            df = parser.close()
+            df.attrs["source_file"] = file_info
+            print(f"Height data loaded: {len(df)} water level readings.")
+            return df
         else:
             print("No matching files found on FTP server.")
             return None  # Return None if no file was found
 
-def load_height():
+def load_height(sensor_ids=None):
     # Call get_height and return the data if available
-    height_data = get_height()
+    height_data = get_height(sensor_ids)
     if height_data is None:
-        print("Height data could not be loaded. Please check the FTP server and file pattern.")
+        print("No new height data to process.")
     return height_data
 
-def load_stations():
-    station_info = pd.read_csv(station_file_path)
+def hash_file(file_path):
+    hasher = hashlib.md5()
+    with open(file_path, "rb") as file:
+        while chunk := file.read(65536):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def compile_stations():
+    """Read the station CSV and keep only water level gauges, indexed by SENSORID."""
+    station_info = pd.read_csv(station_file_path, dtype={'SENSORID': str})
     if 'SENSOR_TYPE' in station_info.columns:
-        return station_info[station_info['SENSOR_TYPE'] == 'water level gauge']
+        station_info = station_info[station_info['SENSOR_TYPE'] == station_sensor_type].copy()
     else:
         print("Error: 'SENSOR_TYPE' column not found.")
-        return station_info  # Adjust as needed based on actual structure
+    for column in station_categoricals:
+        if column in station_info.columns:
+            station_info[column] = station_info[column].astype('category')
+    station_info.index = pd.Index(station_info['SENSORID'])
+    station_info.index.name = None
+    return station_info
+
+@instrumented("bom")
+def load_stations():
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    csv_hash = hash_file(station_file_path)
+    if os.path.isfile(station_cache_path):
+        try:
+            metadata = pq.read_schema(station_cache_path).metadata or {}
+            if metadata.get(b"csv_hash") == csv_hash.encode():
+                return pq.read_table(station_cache_path).to_pandas()
+        except Exception as e:
+            print(f"Ignoring unreadable station cache: {e}")
+
+    print("Compiling station table from CSV...")
+    station_info = compile_stations()
+    table = pa.Table.from_pandas(station_info)
+    table = table.replace_schema_metadata({**table.schema.metadata, b"csv_hash": csv_hash.encode()})
+    pq.write_table(table, station_cache_path)
+    return station_info
+
+def height_readings(stream_height_data):
+    """Select the history columns (site_id, observed_at, value, quality) from the height data."""
+    return pd.DataFrame({
+        "site_id": stream_height_data["SiteId"],
+        "observed_at": stream_height_data["ObservationTimestamp"],
+        "value": stream_height_data["RealValue"],
+        "quality": stream_height_data["Quality"]
+    })
 
+@instrumented("bom")
 def join_stations_with_height(stream_height_data, station_info):
-    # Convert both columns to string to avoid type mismatch
+    # station_info is indexed by SENSORID (see load_stations), so this is an index lookup
     stream_height_data['SiteId'] = stream_height_data['SiteId'].astype(str)
-    station_info['SENSORID'] = station_info['SENSORID'].astype(str)
+    merged_data = stream_height_data.join(station_info, on="SiteId", how="inner")
+    return merged_data.reset_index(drop=True)
 
-    merged_data = pd.merge(
-        stream_height_data,
-        station_info,
-        left_on="SiteId",
-        right_on="SENSORID"
-    )
-    return merged_data
+def get_spatial_outputs(gdf):
+    """
+    List every output as (path, driver, layer, row positions or None for all rows).
+    State subsets come from a single group-by over STATE.
+    """
+    outputs = [
+        (geojson_file_path, "GeoJSON", None, None),
+        (gpkg_file_path, "GPKG", gpkg_layer, None)
+    ]
+    state_rows = gdf.groupby('STATE', observed=True, sort=True).indices
+    states = sorted(state_rows) if "ALL" in publish_states else publish_states
+    for state in states:
+        rows = state_rows.get(state)
+        if rows is None:
+            print(f"No gauges found for state {state}; writing an empty file.")
+            rows = []
+        outputs.append((state_geojson_file_path(state), "GeoJSON", None, rows))
+    return outputs
+
+def write_spatial_outputs(gdf, outputs):
+    """
+    Encode the frame once and write it to every output. Uses pyogrio with Arrow
+    when available, otherwise falls back to GeoDataFrame.to_file per output.
+    """
+    try:
+        import pyarrow as pa
+        from pyogrio.raw import write_arrow
+    except ImportError:
+        for path, driver, layer, rows in outputs:
+            subset = gdf if rows is None else gdf.iloc[rows]
+            subset.to_file(path, driver=driver, layer=layer, **(gpkg_options if driver == "GPKG" else {}))
+        return
 
+    # Arrow cannot carry categoricals through OGR, so write them as plain strings
+    categoricals = [column for column in gdf.columns if isinstance(gdf[column].dtype, pd.CategoricalDtype)]
+    table = pa.table(gdf.astype({column: object for column in categoricals}).to_arrow(index=False, geometry_encoding="WKB"))
+    for path, driver, layer, rows in outputs:
+        subset = table if rows is None else table.take(pa.array(rows, type=pa.int64()))
+        if os.path.exists(path):
+            os.remove(path)
+        write_arrow(
+            subset, path, layer=layer, driver=driver,
+            geometry_name="geometry", geometry_type="Point", crs=gdf.crs.to_string(),
+            layer_options=gpkg_options if driver == "GPKG" else None
+        )
+
+@instrumented("bom")
 def create_spatial_files(merged_data):
+    start = time.perf_counter()
     gdf = gpd.GeoDataFrame(
         merged_data,
         geometry=gpd.points_from_xy(merged_data['LONG'], merged_data['LAT'])
     )
     gdf = gdf.set_crs("EPSG:4326")
-    gdf.to_file(geojson_file_path, driver="GeoJSON")
-    gdf[gdf['STATE'] == 'NSW'].to_file(nsw_geojson_file_path, driver="GeoJSON")
-    gdf.to_file(gpkg_file_path, driver="GPKG", layer="stream_heights")
+    outputs = get_spatial_outputs(gdf)
 
-if __name__ == "__main__":
+    # Skip every write when no gauge reading changed since the last run
+    delta = diff_frame(gdf, 'SENSORID', geojson_file_path, ignore_columns=['IndexNo'])
+    paths = [path for path, _, _, _ in outputs] + [index_path(gpkg_file_path)]
+    if EXPORT_TILES:
+        paths.append(tiles_path(geojson_file_path))
+    if EXPORT_SNAPSHOTS:
+        paths.append(snapshot_path(geojson_file_path))
+    if not has_changes(delta) and all(os.path.exists(path) for path in paths):
+        print("No gauge readings changed; spatial files left untouched.")
+        return gdf
+    write_spatial_outputs(gdf, outputs)
+    save_delta(delta, geojson_file_path, 'SENSORID')
+    save_index(gdf, gpkg_file_path, "bom")
+    if EXPORT_TILES:
+        export_layer(geojson_file_path, gdf.iterfeatures(na="drop", drop_id=True))
+    snapshot_frame(geojson_file_path, gdf)
+    print(f"Wrote {len(outputs)} spatial files in {time.perf_counter() - start:.2f}s ({summarise(delta)})")
+    return gdf
+
+def main():
     get_stations()  # Check and print the status of the local file
     station_info = load_stations()
-    stream_height_data = load_height()
+    stream_height_data = load_height(set(station_info.index))
+    if stream_height_data is None:
+        return
+    source_file = stream_height_data.attrs.get("source_file")
     merged_data = join_stations_with_height(stream_height_data, station_info)
-    create_spatial_files(merged_data)
+    gdf = create_spatial_files(merged_data)
+    with stage("bom", "alerts") as alerts:
+        alerts.count(update_alerts("bom", gdf, output_dir))
+    with stage("bom", "record_readings") as history:
+        history.count(record_readings("bom", height_readings(stream_height_data), os.path.join(output_dir, "height_history")))
+    # Only record the file once its outputs have been written
+    save_state(source_file)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import json
+import os
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from columnar_snapshot import snapshot_geojson
+from feature_diff import has_changes, write_features_if_changed
+from gauge_index import haversine_km, load_gauges
+from instrumentation import instrumented, stage
+
+# joins the Ropewiki canyons against the RFS hazard reduction burns, the GNB naming
+# proposals and the stream gauges, adding the burns and proposals near each canyon
+# and its nearest gauge reading
+# joins are vectorised spatial joins over an STRtree in a metric CRS, so the cost
+# grows with the number of canyons and features rather than their product
+# run after the rfs, gnb, ropewiki, bom and wnsw jobs, pointing at their outputs
+
+# Inputs, from the other datasets' outputs
+OUTPUT_DIR = os.environ.get("OUTPUT_DIR", "datasets")
+CANYONS_FILE = os.environ.get("CANYONS_FILE", os.path.join(OUTPUT_DIR, "canyons.geojson"))
+BURNS_FILE = os.environ.get("BURNS_FILE", os.path.join(OUTPUT_DIR, "hr_burns.geojson"))
+PROPOSALS_FILE = os.environ.get("PROPOSALS_FILE", os.path.join(OUTPUT_DIR, "naming_proposals.geojson"))
+# gauges come from the GeoPackages named by BOM_GPKG and WNSW_GPKG (see gauge_index)
+
+OUTPUT_FILE = os.path.join(OUTPUT_DIR, "canyons_enriched.geojson")
+
+# Join configuration
+NEARBY_BURN_KM = float(os.environ.get("NEARBY_BURN_KM", "10"))
+NEARBY_PROPOSAL_KM = float(os.environ.get("NEARBY_PROPOSAL_KM", "5"))
+GAUGE_MAX_KM = float(os.environ.get("GAUGE_MAX_KM", "50"))  # canyons further from every gauge get none
+METRIC_CRS = "EPSG:3577"  # GDA94 / Australian Albers, in metres
+
+
+def read_features(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("features", [])
+
+
+def canyon_points(features):
+    """Canyon points as a GeoSeries in METRIC_CRS, aligned with features."""
+    coordinates = np.array([feature["geometry"]["coordinates"][:2] for feature in features], dtype=np.float64).reshape(-1, 2)
+    points = gpd.GeoSeries(shapely.points(coordinates), crs="EPSG:4326")
+    return points.to_crs(METRIC_CRS)
+
+
+def load_layer(path, key):
+    """A layer's geometries and key column in METRIC_CRS; empty when the file does not exist."""
+    if not os.path.exists(path):
+        print(f"No file at {path}; canyons will have nothing near them from it.")
+        return gpd.GeoDataFrame({key: []}, geometry=gpd.GeoSeries([], crs="EPSG:4326")).to_crs(METRIC_CRS)
+    layer = gpd.read_file(path, columns=[key])
+    if layer.crs is None:
+        layer = layer.set_crs("EPSG:4326")
+    return layer[layer.geometry.notna() & ~layer.geometry.is_empty].to_crs(METRIC_CRS)
+
+
+def load_gauge_frame():
+    """Every gauge with its latest reading as a GeoDataFrame in METRIC_CRS; empty if no gauges are available."""
+    columns = ["source", "site_id", "name", "lon", "lat", "value", "observed_at"]
+    try:
+        records = load_gauges().records
+    except FileNotFoundError as e:
+        print(f"{e}; canyons will have no nearest gauge.")
+        records = []
+    gauges = pd.DataFrame.from_records(records, columns=columns)
+    geometry = gpd.GeoSeries(shapely.points(gauges[["lon", "lat"]].to_numpy(dtype=np.float64).reshape(-1, 2)), crs="EPSG:4326")
+    return gpd.GeoDataFrame(gauges, geometry=geometry).to_crs(METRIC_CRS)
+
+
+def nearby(points, layer, key, distance_km):
+    """For each canyon point, the key of every layer feature within distance_km, nearest first."""
+    found = [[] for _ in range(len(points))]
+    if layer.empty or points.empty:
+        return found
+    canyons = gpd.GeoDataFrame(geometry=points.reset_index(drop=True))
+    pairs = gpd.sjoin(canyons, layer[[key, "geometry"]].reset_index(drop=True), predicate="dwithin", distance=distance_km * 1000)
+    if pairs.empty:
+        return found
+    pairs["distance"] = shapely.distance(
+        canyons.geometry.values[pairs.index.to_numpy()], layer.geometry.values[pairs["index_right"].to_numpy()]
+    )
+    pairs = pairs.rename_axis("canyon").sort_values(["canyon", "distance", key])
+    for canyon, value in zip(pairs.index.tolist(), pairs[key].tolist()):
+        found[canyon].append(value)
+    return found
+
+
+@instrumented("canyon_enrichment")
+def nearest_gauges(points, gauges, max_km=GAUGE_MAX_KM):
+    """For each canyon point, its nearest gauge within max_km as a row of gauges plus distance_km (NaN if none)."""
+    canyons = gpd.GeoDataFrame(geometry=points.reset_index(drop=True))
+    if gauges.empty or canyons.empty:
+        return pd.DataFrame(index=canyons.index, columns=list(gauges.columns.drop("geometry")) + ["distance_km"])
+    joined = gpd.sjoin_nearest(canyons, gauges.drop(columns="geometry").set_geometry(gauges.geometry), how="left", max_distance=max_km * 1000)
+    joined = joined[~joined.index.duplicated(keep="first")]  # equidistant gauges
+    # Report great circle distances rather than distances on the projection
+    canyon_lonlat = canyons.geometry.to_crs("EPSG:4326")
+    joined["distance_km"] = haversine_km(
+        np.radians(canyon_lonlat.x.to_numpy()), np.radians(canyon_lonlat.y.to_numpy()),
+        np.radians(joined["lon"].to_numpy(dtype=np.float64)), np.radians(joined["lat"].to_numpy(dtype=np.float64))
+    )
+    return joined.drop(columns=["geometry", "index_right"])
+
+
+def optional(value):
+    """None for missing values, so they are written as null."""
+    return None if value is None or (isinstance(value, float) and np.isnan(value)) else value
+
+
+def enrich_features(features, burns_per_canyon, proposals_per_canyon, gauges):
+    """Yield each canyon feature with its nearby burns and proposals and its nearest gauge added to its properties."""
+    rows = zip(
+        gauges["source"].tolist(), gauges["site_id"].tolist(), gauges["name"].tolist(),
+        gauges["value"].tolist(), gauges["observed_at"].tolist(), gauges["distance_km"].tolist()
+    )
+    for feature, burns, proposals, (source, site_id, name, value, observed_at, distance_km) in zip(
+        features, burns_per_canyon, proposals_per_canyon, rows
+    ):
+        distance_km = optional(distance_km)
+        yield {
+            **feature,
+            "properties": {
+                **feature.get("properties", {}),
+                "nearby_burns": burns,
+                "nearby_proposals": proposals,
+                "nearest_gauge_id": optional(site_id),
+                "nearest_gauge_source": optional(source),
+                "nearest_gauge_name": optional(name),
+                "nearest_gauge_height": optional(value),
+                "nearest_gauge_observed_at": optional(observed_at),
+                "nearest_gauge_km": None if distance_km is None else round(distance_km, 2)
+            }
+        }
+
+
+def main():
+    features = [feature for feature in read_features(CANYONS_FILE) if feature.get("geometry")]
+    print(f"Enriching {len(features)} canyons...")
+    points = canyon_points(features)
+    with stage("canyon_enrichment", "nearby_burns") as join:
+        burns_per_canyon = nearby(points, load_layer(BURNS_FILE, "guarReference"), "guarReference", NEARBY_BURN_KM)
+        join.count(len(burns_per_canyon))
+    with stage("canyon_enrichment", "nearby_proposals") as join:
+        proposals_per_canyon = nearby(
+            points, load_layer(PROPOSALS_FILE, "geoname_identifier"), "geoname_identifier", NEARBY_PROPOSAL_KM
+        )
+        join.count(len(proposals_per_canyon))
+    gauges = nearest_gauges(points, load_gauge_frame())
+
+    with stage("canyon_enrichment", "write") as write:
+        delta = write_features_if_changed(OUTPUT_FILE, enrich_features(features, burns_per_canyon, proposals_per_canyon, gauges), "pageid")
+        write.count(delta["count"])
+    snapshot_geojson(OUTPUT_FILE, has_changes(delta))
+    near_burns = sum(1 for burns in burns_per_canyon if burns)
+    near_proposals = sum(1 for proposals in proposals_per_canyon if proposals)
+    print(f"Enriched canyons written to {OUTPUT_FILE}: {near_burns} near a planned burn, {near_proposals} near a naming proposal, "
+          f"{int(gauges['site_id'].notna().sum())} with a gauge within {GAUGE_MAX_KM:g} km")
+
+
+if __name__ == "__main__":
+    main()
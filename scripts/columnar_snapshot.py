@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+import argparse
+import importlib.util
+import json
+import math
+import os
+import struct
+
+# writes each output as an Arrow IPC (Feather v2) snapshot beside it, for consumers
+# that would otherwise parse the whole GeoJSON text or GeoPackage
+# strings are dictionary encoded, floats narrowed to float32 (coordinates keep full
+# precision in the geometry) and geometry stored as WKB with GeoParquet style "geo"
+# metadata; the file is uncompressed so it can be memory-mapped and columns read
+# without copying (see read_snapshot)
+# pyarrow is optional and only imported when a snapshot is written; an unchanged
+# snapshot is left untouched
+#
+#   python scripts/columnar_snapshot.py datasets/rfs_hr_burns.geojson ...
+
+EXPORT_SNAPSHOTS = (
+    os.environ.get("COLUMNAR_SNAPSHOTS", "1").lower() in ("1", "true", "yes")
+    and importlib.util.find_spec("pyarrow") is not None
+)
+GEOMETRY_COLUMN = "geometry"
+WKB_TYPES = {
+    "Point": 1, "LineString": 2, "Polygon": 3,
+    "MultiPoint": 4, "MultiLineString": 5, "MultiPolygon": 6, "GeometryCollection": 7
+}
+
+
+def snapshot_path(output_path):
+    """Snapshot path for an output file: the same name with an .arrow extension."""
+    return os.path.splitext(output_path)[0] + ".arrow"
+
+
+def _points_wkb(coords):
+    return struct.pack(f"<I{2 * len(coords)}d", len(coords), *(value for point in coords for value in point[:2]))
+
+
+def geometry_wkb(geometry):
+    """Encode a GeoJSON geometry as 2D little endian WKB, None for a missing geometry."""
+    if not geometry:
+        return None
+    kind = geometry["type"]
+    header = struct.pack("<BI", 1, WKB_TYPES[kind])
+    if kind == "GeometryCollection":
+        parts = geometry.get("geometries", [])
+        return header + struct.pack("<I", len(parts)) + b"".join(geometry_wkb(part) for part in parts)
+    coords = geometry.get("coordinates") or []
+    if kind == "Point":
+        return header + struct.pack("<2d", *(coords[:2] if coords else (math.nan, math.nan)))
+    if kind == "LineString":
+        return header + _points_wkb(coords)
+    if kind == "Polygon":
+        return header + struct.pack("<I", len(coords)) + b"".join(_points_wkb(ring) for ring in coords)
+    part_type = kind[len("Multi"):]
+    return header + struct.pack("<I", len(coords)) + b"".join(
+        geometry_wkb({"type": part_type, "coordinates": part}) for part in coords
+    )
+
+
+def _extend_bounds(bounds, coords):
+    if coords and isinstance(coords[0], (int, float)):
+        bounds[0], bounds[1] = min(bounds[0], coords[0]), min(bounds[1], coords[1])
+        bounds[2], bounds[3] = max(bounds[2], coords[0]), max(bounds[3], coords[1])
+        return
+    for part in coords:
+        _extend_bounds(bounds, part)
+
+
+def geojson_bounds(geometries):
+    """[minx, miny, maxx, maxy] of GeoJSON geometries, None if there are no coordinates."""
+    bounds = [math.inf, math.inf, -math.inf, -math.inf]
+    for geometry in geometries:
+        if geometry:
+            for part in geometry.get("geometries", [geometry]):
+                _extend_bounds(bounds, part.get("coordinates") or [])
+    return None if math.isinf(bounds[0]) else bounds
+
+
+def narrow(array):
+    """Narrow an Arrow array for the snapshot: floats to float32 and strings to dictionaries."""
+    import pyarrow as pa
+
+    if pa.types.is_floating(array.type) and array.type != pa.float32():
+        return array.cast(pa.float32(), safe=False)
+    if pa.types.is_large_string(array.type):
+        array = array.cast(pa.string())
+    if pa.types.is_string(array.type):
+        return array.dictionary_encode()
+    if pa.types.is_dictionary(array.type) and pa.types.is_large_string(array.type.value_type):
+        return array.cast(pa.dictionary(array.type.index_type, pa.string()))
+    return array
+
+
+def encode_column(values):
+    """Arrow array for a column of Python values; columns of mixed types are stored as JSON text."""
+    import pyarrow as pa
+
+    try:
+        array = pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        array = pa.array([value if value is None or isinstance(value, str) else json.dumps(value, sort_keys=True)
+                          for value in values])
+    return narrow(array)
+
+
+def build_table(columns, wkb, geometry_types, bbox, crs="OGC:CRS84"):
+    """Snapshot table of named Arrow arrays plus a WKB geometry column with its "geo" metadata."""
+    import pyarrow as pa
+
+    geometry_field = pa.field(GEOMETRY_COLUMN, pa.binary(), metadata={
+        "ARROW:extension:name": "geoarrow.wkb",
+        "ARROW:extension:metadata": json.dumps({"crs": crs})
+    })
+    geo = {
+        "version": "1.1.0",
+        "primary_column": GEOMETRY_COLUMN,
+        "columns": {GEOMETRY_COLUMN: {"encoding": "WKB", "geometry_types": sorted(geometry_types), "bbox": bbox, "crs": crs}}
+    }
+    fields = [pa.field(name, array.type) for name, array in columns.items()] + [geometry_field]
+    schema = pa.schema(fields, metadata={"geo": json.dumps(geo)})
+    return pa.Table.from_arrays([*columns.values(), pa.array(wkb, type=pa.binary())], schema=schema)
+
+
+def write_snapshot(path, table):
+    """Write the table as an uncompressed Arrow IPC file, leaving an identical existing file untouched."""
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    data = sink.getvalue().to_pybytes()
+    if os.path.exists(path) and os.path.getsize(path) == len(data):
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+    return True
+
+
+def features_table(features):
+    """Snapshot table of GeoJSON features, with a column for every property any feature has."""
+    features = list(features)
+    names = {}
+    for feature in features:
+        names.update(dict.fromkeys(feature.get("properties") or {}))
+    columns = {name: encode_column([(feature.get("properties") or {}).get(name) for feature in features]) for name in names}
+    geometries = [feature.get("geometry") for feature in features]
+    types = {geometry["type"] for geometry in geometries if geometry}
+    return build_table(columns, [geometry_wkb(geometry) for geometry in geometries], types, geojson_bounds(geometries))
+
+
+def frame_table(gdf):
+    """Snapshot table of a GeoDataFrame; categorical columns keep their dictionaries."""
+    import pyarrow as pa
+
+    columns = {}
+    for name in gdf.columns:
+        if name == gdf.geometry.name:
+            continue
+        try:
+            array = pa.Array.from_pandas(gdf[name])
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            array = encode_column(gdf[name].tolist())
+        columns[str(name)] = narrow(array)
+    geometry = gdf.geometry
+    has_geometry = geometry.notna() & ~geometry.is_empty
+    bbox = [float(value) for value in geometry[has_geometry].total_bounds] if has_geometry.any() else None
+    crs = "OGC:CRS84" if geometry.crs is None or geometry.crs.to_epsg() == 4326 else geometry.crs.to_string()
+    return build_table(columns, geometry.to_wkb().tolist(), set(geometry[has_geometry].geom_type), bbox, crs)
+
+
+def report(path, written, rows):
+    print(f"Columnar snapshot {'written to' if written else 'unchanged:'} {path} ({rows} rows)")
+
+
+def snapshot_frame(output_path, gdf):
+    """With snapshots enabled, write a GeoDataFrame output's snapshot beside it."""
+    if not EXPORT_SNAPSHOTS:
+        return None
+    path = snapshot_path(output_path)
+    written = write_snapshot(path, frame_table(gdf))
+    report(path, written, len(gdf))
+    return written
+
+
+def snapshot_geojson(geojson_path, changed=True):
+    """With snapshots enabled, snapshot a GeoJSON output when it changed or has no snapshot yet."""
+    path = snapshot_path(geojson_path)
+    if not EXPORT_SNAPSHOTS or not (changed or not os.path.exists(path)):
+        return None
+    with open(geojson_path, encoding="utf-8") as f:
+        features = json.load(f).get("features", [])
+    written = write_snapshot(path, features_table(features))
+    report(path, written, len(features))
+    return written
+
+
+def read_snapshot(path, columns=None):
+    """
+    Memory-map a snapshot and return its columns (all, or the named ones) as a pyarrow
+    Table. The buffers point into the mapped file, so nothing is copied and only the
+    pages of the columns used are read.
+    """
+    import pyarrow as pa
+
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.select(columns) if columns else table
+
+
+def read_frame(path, columns=None):
+    """Read a snapshot (all, or the named columns plus geometry) as a GeoDataFrame."""
+    import geopandas as gpd
+
+    table = read_snapshot(path, columns and [*columns, GEOMETRY_COLUMN])
+    return gpd.GeoDataFrame.from_arrow(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write Arrow IPC snapshots of GeoJSON files beside them")
+    parser.add_argument("inputs", nargs="+", help="GeoJSON files")
+    args = parser.parse_args()
+
+    if importlib.util.find_spec("pyarrow") is None:
+        parser.error("pyarrow is required to write snapshots")
+    for path in args.inputs:
+        with open(path, encoding="utf-8") as f:
+            features = json.load(f).get("features", [])
+        report(snapshot_path(path), write_snapshot(snapshot_path(path), features_table(features)), len(features))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
-import pandas as pd
-import geopandas as gpd
-import requests
 import re
 import hashlib
+import json
 import os
+from datetime import datetime
+
+import fetch
+from instrumentation import instrumented
+from vector_tiles import export_geojson
+from columnar_snapshot import snapshot_frame
+
+# pandas, geopandas and requests are imported by the stages that use them, so a
+# run that finds nothing to do exits without loading them
 
 # Define constants
 SOURCE_URL = "https://docs.google.com/spreadsheets/d/e/2PACX-1vSDtRpJ1P87dHdP1l8H-veKEAKs-aUeSgagdlkaLlZVWNa3RApbo0sWrPNqOd1L4cJvqSS9_LTBylRN/pub?gid=0&single=true&output=tsv"
@@ -16,6 +23,18 @@ OUTPUT_ACTIVE_FILE = os.path.join(OUTPUT_DIR, "sales_active.geojson")
 OUTPUT_INACTIVE_FILE = os.path.join(OUTPUT_DIR, "sales_inactive.geojson")
 LOCAL_FILE = os.path.join(OUTPUT_DIR, "sales_new.tsv")
 BACKUP_FILE = os.path.join(OUTPUT_DIR, "sales.tsv")
+SOURCE_STATE_FILE = os.path.join(OUTPUT_DIR, "sales_source.json")  # ETag, Last-Modified, hash of BACKUP_FILE, next expiry
+PARSED_CACHE_FILE = os.path.join(OUTPUT_DIR, "sales_parsed.parquet")  # parsed GeoDataFrame of BACKUP_FILE
+DOWNLOAD_TIMEOUT = (10, 60)  # connect, read (seconds)
+
+# Patterns used to pull fields out of the listing HTML
+BRACKET_PATTERN = re.compile(r"\(([^)]*file[^)]*)\)", re.IGNORECASE)  # text in brackets containing "file"
+FILE_REF_PATTERN = re.compile(r"\b(\d+/\d+)\b")  # Format: "1234/5678"
+CLUSTER_PATTERN = re.compile(r"(?:cluster|cluster_no|cluster_number)[^\d]*(\d+)", re.IGNORECASE)
+EMAIL_PATTERN = re.compile(r"([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})")
+LIST_PATTERN = re.compile(r"<ul>(.*?)</ul>", re.DOTALL | re.IGNORECASE)
+LIST_ITEM_PATTERN = re.compile(r"<li.*?>(.*?)</li>", re.DOTALL | re.IGNORECASE)
+TAG_PATTERN = re.compile(r"<.*?>")
 
 
 def hash_file(file_path):
@@ -27,23 +46,100 @@ def hash_file(file_path):
     return hasher.hexdigest()
 
 
-def download_tsv(url, output_path):
-    """Download the TSV file from the given URL."""
-    response = requests.get(url)
+def load_source_state():
+    """Load the ETag, Last-Modified and hash recorded for the last processed download."""
+    if not os.path.exists(BACKUP_FILE):
+        return {}  # No backup file means new processing is required
+    if os.path.exists(SOURCE_STATE_FILE):
+        with open(SOURCE_STATE_FILE, encoding="utf-8") as file:
+            return json.load(file)
+    return {"md5": hash_file(BACKUP_FILE)}
+
+
+def save_source_state(state):
+    with open(SOURCE_STATE_FILE, "w", encoding="utf-8") as file:
+        json.dump(state, file, indent=2)
+
+
+@instrumented("crown_roads")
+def download_tsv(url, output_path, source_state=None, session=None):
+    """
+    Download the TSV file from the given URL, streaming it to disk and hashing as it writes.
+    Sends conditional headers from source_state and returns None if the server reports
+    the file is unchanged, otherwise a dict with the new md5, etag and last_modified.
+    """
+    source_state = source_state or {}
+    headers = {}
+    if source_state.get("etag"):
+        headers["If-None-Match"] = source_state["etag"]
+    if source_state.get("last_modified"):
+        headers["If-Modified-Since"] = source_state["last_modified"]
+
+    response, md5 = fetch.download(url, output_path, session, timeout=DOWNLOAD_TIMEOUT, digest="md5", headers=headers)
+    if response.status_code == 304:
+        return None
     response.raise_for_status()  # Raise an error for bad responses
-    with open(output_path, "w", encoding="utf-8") as file:
-        file.write(response.text)
-
-
-def is_file_updated(new_file, backup_file):
-    """Check if the newly downloaded file is different from the backup."""
-    if not os.path.exists(backup_file):
-        return True  # No backup file means new processing is required
-    return hash_file(new_file) != hash_file(backup_file)
-
+    return {
+        "md5": md5,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified")
+    }
+
+
+def load_parsed_cache():
+    """Load the parsed GeoDataFrame saved by the last full processing run, if any."""
+    if not os.path.exists(PARSED_CACHE_FILE):
+        return None
+    import geopandas as gpd
+
+    try:
+        return gpd.read_parquet(PARSED_CACHE_FILE)
+    except Exception as e:
+        print(f"Ignoring unreadable parsed cache: {e}")
+        return None
+
+
+def save_parsed_cache(gdf):
+    gdf.to_parquet(PARSED_CACHE_FILE)
+
+
+def extract_fields_from_html(html):
+    """
+    Extract cluster, file_ref, contact_email and description from a Series of
+    listing HTML, using vectorised string operations over the whole column.
+    """
+    import pandas as pd
+
+    html = html.astype(object)
+
+    # cluster and file_ref come from the text in brackets containing "file"
+    bracket_text = html.str.extract(BRACKET_PATTERN, expand=False)
+    file_ref = bracket_text.str.extract(FILE_REF_PATTERN, expand=False)
+    cluster = bracket_text.str.extract(CLUSTER_PATTERN, expand=False)
+    email = html.str.extract(EMAIL_PATTERN, expand=False)
+
+    # description is the first <ul> list as plain text, items joined with semicolons
+    list_content = html.str.extract(LIST_PATTERN, expand=False)
+    items = list_content.str.findall(LIST_ITEM_PATTERN).explode().dropna()
+    items = items.str.replace(TAG_PATTERN, "", regex=True).str.replace("&nbsp;", "", regex=False).str.strip()
+    description = items.groupby(level=0).agg("; ".join).reindex(html.index)
+    description = description.where(list_content.isna() | description.notna(), "")  # a list with no items
+
+    fields = pd.DataFrame({
+        "cluster": cluster,
+        "file_ref": file_ref,
+        "contact_email": email,
+        "description": description
+    }, index=html.index)
+    return fields.astype(object).where(fields.notna(), None)
+
+
+@instrumented("crown_roads")
+def parse_tsv(input_file):
+    """Parse the TSV file into a GeoDataFrame of all sales."""
+    import pandas as pd
+    import geopandas as gpd
 
-def process_tsv_to_geojson(input_file):
-    """Process the TSV file into active and inactive GeoJSON files."""
     # Read TSV into a DataFrame
     df = pd.read_csv(input_file, sep="\t")
 
@@ -67,56 +163,10 @@ def process_tsv_to_geojson(input_file):
     fields_to_drop = ["date", "comments"]
     df = df.drop(columns=fields_to_drop, errors="ignore")
 
-    # Function to extract cluster, file_ref, and contact_email
-    def extract_fields_from_html(html):
-        if pd.isna(html):
-            return None, None, None
-
-        # Find the text in brackets containing "file"
-        bracket_match = re.search(r"\(([^)]*file[^)]*)\)", html, re.IGNORECASE)
-        bracket_text = bracket_match.group(1) if bracket_match else ""
-
-        # Extract file_ref
-        file_ref_match = re.search(r"\b\d+/\d+\b", bracket_text)  # Format: "1234/5678"
-        file_ref = file_ref_match.group(0) if file_ref_match else None
-
-        # Extract cluster
-        cluster_match = re.search(r"(?:cluster|cluster_no|cluster_number)[^\d]*(\d+)", bracket_text, re.IGNORECASE)
-        cluster = cluster_match.group(1) if cluster_match else None
-
-        # Extract email address
-        email_match = re.search(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}", html)
-        email = email_match.group(0) if email_match else None
-
-        return cluster, file_ref, email
-
-    # Apply extraction function to the 'html' column
-    df[["cluster", "file_ref", "contact_email"]] = df["html"].apply(
-        lambda html: pd.Series(extract_fields_from_html(html))
-    )
-
-    # Function to extract the first list from the HTML and return it as plain text
-    def extract_description_from_html(html):
-        if pd.isna(html):
-            return None
-
-        # Find the first <ul>...</ul> block
-        list_match = re.search(r"<ul>(.*?)</ul>", html, re.DOTALL | re.IGNORECASE)
-        if not list_match:
-            return None  # Return None if no list is found
-
-        # Extract all list items (<li>...</li>) within the block
-        list_content = list_match.group(1)
-        items = re.findall(r"<li.*?>(.*?)</li>", list_content, re.DOTALL | re.IGNORECASE)
-
-        # Clean up each list item to remove HTML tags and trailing "&nbsp;"
-        clean_items = [re.sub(r"<.*?>", "", item).replace("&nbsp;", "").strip() for item in items]
-
-        # Join the items with semicolons
-        return "; ".join(clean_items)
-
-    # Apply the function to the 'html' column
-    df["description"] = df["html"].apply(extract_description_from_html)
+    # Extract cluster, file_ref, contact_email and description from the 'html' column
+    html_fields = extract_fields_from_html(df["html"])
+    for column in html_fields.columns:
+        df[column] = html_fields[column]
 
     # Convert to GeoDataFrame
     gdf = gpd.GeoDataFrame(
@@ -125,11 +175,24 @@ def process_tsv_to_geojson(input_file):
         crs="EPSG:4326"
     )
 
-    # Add an 'active' column based on the 'expiry_date' column
-    if "expiry_date" in df.columns:
-        gdf["active"] = pd.to_datetime(gdf["expiry_date"], errors="coerce") > pd.Timestamp.now()
-    else:
+    if "expiry_date" not in df.columns:
         raise ValueError("The TSV file must contain an 'expiry_date' column.")
+    return gdf
+
+
+@instrumented("crown_roads")
+def write_active_split(gdf):
+    """
+    Split sales into active and inactive GeoJSON files by expiry date.
+    Returns the next expiry date among the active sales (ISO format), or None if there is none.
+    """
+    import pandas as pd
+
+    gdf = gdf.copy()
+
+    # Add an 'active' column based on the 'expiry_date' column
+    expiry = pd.to_datetime(gdf["expiry_date"], errors="coerce")
+    gdf["active"] = expiry > pd.Timestamp.now()
 
     # Split into active and inactive sales
     active_gdf = gdf[gdf["active"]]
@@ -139,23 +202,67 @@ def process_tsv_to_geojson(input_file):
     active_gdf.to_file(OUTPUT_ACTIVE_FILE, driver="GeoJSON")
     inactive_gdf.to_file(OUTPUT_INACTIVE_FILE, driver="GeoJSON")
     print(f"GeoJSON files created: {OUTPUT_ACTIVE_FILE}, {OUTPUT_INACTIVE_FILE}")
+    export_geojson(OUTPUT_ACTIVE_FILE)
+    snapshot_frame(OUTPUT_ACTIVE_FILE, active_gdf)
+    snapshot_frame(OUTPUT_INACTIVE_FILE, inactive_gdf)
+    next_expiry = expiry[gdf["active"]].min()
+    return None if pd.isna(next_expiry) else next_expiry.isoformat()
 
 
-# Main script
-if __name__ == "__main__":
-    # Step 1: Download the source file
+def split_is_current(source_state):
+    """Whether the last split is still correct, i.e. no active sale has expired since it was written."""
+    if "next_expiry" not in source_state:
+        return False
+    if not (os.path.exists(OUTPUT_ACTIVE_FILE) and os.path.exists(OUTPUT_INACTIVE_FILE)):
+        return False
+    next_expiry = source_state["next_expiry"]
+    return next_expiry is None or datetime.now() <= datetime.fromisoformat(next_expiry)
+
+
+def process_tsv_to_geojson(input_file):
+    """Process the TSV file into active and inactive GeoJSON files."""
+    gdf = parse_tsv(input_file)
+    write_active_split(gdf)
+    return gdf
+
+
+def main(session=None):
+    # Step 1: Download the source file if it has changed since the last run
     print("Downloading TSV file...")
-    download_tsv(SOURCE_URL, LOCAL_FILE)
+    source_state = load_source_state()
+    download = download_tsv(SOURCE_URL, LOCAL_FILE, source_state, session)
 
     # Step 2: Check if the source file has been updated
-    if is_file_updated(LOCAL_FILE, BACKUP_FILE):
-        print("Source file has been updated. Processing...")
-    else:
+    unchanged = download is None or download["md5"] == source_state.get("md5")
+    if download is None:
+        print("Source has not been updated (not modified).")
+    elif unchanged:
         print("Source has not been updated.")
+        os.remove(LOCAL_FILE)
+        source_state.update(etag=download["etag"], last_modified=download["last_modified"])
+    else:
+        print("Source file has been updated. Processing...")
+        source_state = download
 
-    # Process the file regardless as some listings may have expired
-    process_tsv_to_geojson(LOCAL_FILE)
+    if unchanged and split_is_current(source_state):
+        print("No sales have expired since the last run; GeoJSON files left untouched.")
+        save_source_state(source_state)
+        return
 
-    # Step 3: Save a copy of the new file as backup
-    os.replace(LOCAL_FILE, BACKUP_FILE)
-    
\ No newline at end of file
+    gdf = load_parsed_cache() if unchanged else None
+    if gdf is None:
+        # Parse the source when it changed or there is no cached copy
+        if os.path.exists(LOCAL_FILE):
+            # Step 3: Save a copy of the new file as backup
+            os.replace(LOCAL_FILE, BACKUP_FILE)
+        gdf = parse_tsv(BACKUP_FILE)
+        save_parsed_cache(gdf)
+
+    # Recompute the split as some listings may have expired
+    source_state["next_expiry"] = write_active_split(gdf)
+    save_source_state(source_state)
+
+
+# Main script
+if __name__ == "__main__":
+    main()
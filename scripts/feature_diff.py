@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+from geojson_writer import COORDINATE_PRECISION, encode_feature, round_feature, write_feature_collection
+
+# shared feature level diffing for the dataset scripts
+# each output keeps a small keyed fingerprint file beside it ({name}.fingerprints.json)
+# so a run can tell which features were added, removed or changed without
+# re-reading the previous output, skip the write entirely when nothing changed,
+# and publish only the changes as {name}.delta.geojson
+
+
+def fingerprint_path(output_path):
+    return f"{os.path.splitext(output_path)[0]}.fingerprints.json"
+
+
+def delta_path(output_path):
+    return f"{os.path.splitext(output_path)[0]}.delta.geojson"
+
+
+def load_fingerprints(output_path):
+    """Load the fingerprints recorded for an output; empty if the output itself is missing."""
+    path = fingerprint_path(output_path)
+    if not os.path.exists(output_path) or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def unique_keys(keys):
+    """Make keys unique by suffixing repeated occurrences with #2, #3, ..."""
+    seen = {}
+    result = []
+    for key in keys:
+        key = str(key)
+        seen[key] = seen.get(key, 0) + 1
+        result.append(key if seen[key] == 1 else f"{key}#{seen[key]}")
+    return result
+
+
+def new_delta(previous, fingerprints):
+    """Compare two {key: fingerprint} mappings."""
+    return {
+        "added": [key for key in fingerprints if key not in previous],
+        "changed": [key for key in fingerprints if key in previous and previous[key] != fingerprints[key]],
+        "removed": [key for key in previous if key not in fingerprints],
+        "fingerprints": fingerprints,
+        "features": []
+    }
+
+
+def _json_default(obj):
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat().replace("+00:00", "Z")
+    return str(obj)
+
+
+def has_changes(delta):
+    return bool(delta["added"] or delta["changed"] or delta["removed"])
+
+
+def summarise(delta):
+    return f"{len(delta['added'])} added, {len(delta['changed'])} changed, {len(delta['removed'])} removed"
+
+
+def save_delta(delta, output_path, key_property):
+    """Record the new fingerprints and write the delta file once the output has been written."""
+    with open(fingerprint_path(output_path), "w", encoding="utf-8") as f:
+        json.dump(delta["fingerprints"], f, separators=(",", ":"))
+    with open(delta_path(output_path), "w", encoding="utf-8") as f:
+        json.dump({
+            "type": "FeatureCollection",
+            "generated_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "key": key_property,
+            "removed": delta["removed"],
+            "features": delta["features"]
+        }, f, separators=(",", ":"), default=_json_default)
+
+
+def write_features_if_changed(output_path, features, key_property, precision=COORDINATE_PRECISION):
+    """
+    Stream features to output_path via write_feature_collection, fingerprinting each
+    one keyed by properties[key_property]. If nothing was added, removed or changed
+    the previous file is left untouched. Returns the delta.
+    """
+    previous = load_fingerprints(output_path)
+    fingerprints = {}
+    changed_features = []
+    seen = {}
+
+    def tracked(features):
+        for feature in features:
+            feature = round_feature(feature, precision)
+            key = str(feature.get("properties", {}).get(key_property))
+            seen[key] = seen.get(key, 0) + 1
+            if seen[key] > 1:
+                key = f"{key}#{seen[key]}"
+            fingerprint = hashlib.md5(encode_feature(feature)).hexdigest()
+            fingerprints[key] = fingerprint
+            if previous.get(key) != fingerprint:
+                changed_features.append({**feature, "change": "changed" if key in previous else "added"})
+            yield feature
+
+    new_path = f"{output_path}.new"
+    count = write_feature_collection(new_path, tracked(features), precision=None)
+    delta = new_delta(previous, fingerprints)
+    delta["count"] = count
+    if not has_changes(delta) and os.path.exists(output_path):
+        os.remove(new_path)
+        print(f"No changes to {output_path}; leaving it untouched.")
+        return delta
+
+    os.replace(new_path, output_path)
+    delta["features"] = changed_features
+    save_delta(delta, output_path, key_property)
+    print(f"Updated {output_path}: {summarise(delta)}")
+    return delta
+
+
+def diff_frame(gdf, key_column, output_path, ignore_columns=()):
+    """
+    Fingerprint each row of a GeoDataFrame keyed by key_column and compare with the
+    fingerprints recorded for output_path. ignore_columns are left out of the
+    fingerprint (e.g. row numbers that change every run). Call save_delta after
+    writing the outputs.
+    """
+    import pandas as pd
+
+    values = gdf.drop(columns=[gdf.geometry.name, *ignore_columns], errors="ignore")
+    values["__geometry"] = gdf.geometry.to_wkb()
+    hashes = pd.util.hash_pandas_object(values, index=False)
+    keys = unique_keys(gdf[key_column])
+    delta = new_delta(load_fingerprints(output_path), dict(zip(keys, (f"{value:016x}" for value in hashes))))
+    delta["count"] = len(gdf)
+
+    added = set(delta["added"])
+    updated = added | set(delta["changed"])
+    rows = [position for position, key in enumerate(keys) if key in updated]
+    if rows:
+        features = json.loads(gdf.iloc[rows].to_json(drop_id=True, default=_json_default))["features"]
+        for position, feature in zip(rows, features):
+            feature["change"] = "added" if keys[position] in added else "changed"
+        delta["features"] = features
+    return delta
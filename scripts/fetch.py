@@ -0,0 +1,301 @@
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from instrumentation import DOWNLOAD_HOOKS, add_bytes, track_downloads
+
+# shared http/ftp fetching for the dataset scripts: pooled keep-alive sessions,
+# explicit connect/read timeouts, retries with jittered exponential backoff
+# (honouring Retry-After), per-host concurrency and rate limits, and per-host
+# request, byte and latency counters (stats())
+# callers may pass their own requests session (run_all's shared one, or the
+# benchmark stand-ins'); the retries and limits apply to whichever is used
+# requests and ftplib are imported on first use, so importing this is cheap
+
+CONNECT_TIMEOUT = float(os.environ.get("FETCH_CONNECT_TIMEOUT", "10"))  # seconds
+READ_TIMEOUT = float(os.environ.get("FETCH_READ_TIMEOUT", "60"))  # seconds between bytes, not for the whole body
+RETRIES = int(os.environ.get("FETCH_RETRIES", "3"))
+BACKOFF = float(os.environ.get("FETCH_BACKOFF", "0.5"))  # first retry waits up to this, doubling each attempt
+BACKOFF_MAX = float(os.environ.get("FETCH_BACKOFF_MAX", "30"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Per-host limits: concurrent requests and request starts per second (0 is unlimited),
+# with overrides as FETCH_HOST_LIMITS="host=concurrency[:rate],..."
+HOST_CONCURRENCY = int(os.environ.get("FETCH_HOST_CONCURRENCY", "8"))
+HOST_RATE = float(os.environ.get("FETCH_HOST_RATE", "0"))
+HOST_LIMITS = {
+    host.strip(): tuple(float(value) for value in limits.split(":"))
+    for host, _, limits in (
+        item.partition("=") for item in os.environ.get("FETCH_HOST_LIMITS", "").split(",") if "=" in item
+    )
+}
+
+_lock = threading.Lock()
+_limiters = {}
+_stats = {}
+_session = None
+
+
+class HostLimiter:
+    """Limits the requests to one host in flight at once and how often they may start."""
+
+    def __init__(self, concurrency=HOST_CONCURRENCY, rate=HOST_RATE):
+        self.slots = threading.BoundedSemaphore(int(concurrency)) if concurrency > 0 else None
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_start = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Wait for a free slot, then for the host's next start time."""
+        if self.slots:
+            self.slots.acquire()
+        if self.interval:
+            with self.lock:
+                now = time.monotonic()
+                start = max(now, self.next_start)
+                self.next_start = start + self.interval
+            if start > now:
+                time.sleep(start - now)
+
+    def release(self):
+        if self.slots:
+            self.slots.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def host_limiter(host):
+    """The shared limiter for a host, created from HOST_LIMITS or the defaults on first use."""
+    with _lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limits = HOST_LIMITS.get(host, ())
+            concurrency = limits[0] if len(limits) > 0 else HOST_CONCURRENCY
+            rate = limits[1] if len(limits) > 1 else HOST_RATE
+            limiter = _limiters[host] = HostLimiter(concurrency, rate)
+        return limiter
+
+
+def record(host, **counts):
+    """Add to a host's counters."""
+    with _lock:
+        host_stats = _stats.setdefault(host, {
+            "requests": 0, "retries": 0, "errors": 0, "bytes": 0, "latency_s": 0.0, "max_latency_s": 0.0
+        })
+        for name, value in counts.items():
+            if name == "latency_s":
+                host_stats["max_latency_s"] = max(host_stats["max_latency_s"], value)
+            host_stats[name] += value
+
+
+def stats():
+    """Counters per host: requests, retries, errors, bytes, and total and worst time to first response."""
+    with _lock:
+        return {host: {**counts, "latency_s": round(counts["latency_s"], 3), "max_latency_s": round(counts["max_latency_s"], 3)}
+                for host, counts in _stats.items()}
+
+
+def backoff_delay(attempt, backoff=BACKOFF, backoff_max=BACKOFF_MAX):
+    """Seconds to wait before retry number attempt (0 based): full jitter over an exponential cap."""
+    return random.uniform(0, min(backoff_max, backoff * 2 ** attempt))
+
+
+def retry_after(response, backoff_max=BACKOFF_MAX):
+    """Seconds asked for by a Retry-After header in seconds, or None."""
+    try:
+        return min(max(float(response.headers.get("Retry-After", "")), 0), backoff_max)
+    except ValueError:
+        return None
+
+
+def create_session(pool_size=HOST_CONCURRENCY, pool_connections=1, headers=None):
+    """Create a keep-alive session with a connection pool; retries are made by get and stream."""
+    # requests is imported here so the scripts start without loading the http stack
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=max(pool_size, 1), max_retries=0)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return track_downloads(session)
+
+
+def default_session():
+    """The session used when a caller passes none, shared by every thread."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def retryable_errors():
+    """requests exceptions worth retrying: refused or dropped connections and timeouts."""
+    import requests
+
+    return requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError
+
+
+def _send(url, session, stream, timeout, retries, **kwargs):
+    """
+    Make a GET with retries, holding the host's limiter for each attempt.
+    Returns the response and its limiter, which the caller releases.
+    """
+    session = session or default_session()
+    host = urlsplit(url).hostname
+    limiter = host_limiter(host)
+    timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    for attempt in range(retries + 1):
+        limiter.acquire()
+        start = time.perf_counter()
+        try:
+            response = session.get(url, stream=stream, timeout=timeout, hooks=DOWNLOAD_HOOKS, **kwargs)
+        except retryable_errors() as e:
+            limiter.release()
+            record(host, requests=1, errors=1, latency_s=time.perf_counter() - start)
+            if attempt == retries:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"Fetching {host} failed ({type(e).__name__}); retrying in {delay:.1f}s")
+        except BaseException:
+            limiter.release()
+            raise
+        else:
+            record(host, requests=1, latency_s=time.perf_counter() - start)
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                return response, limiter
+            response.close()
+            limiter.release()
+            record(host, errors=1)
+            delay = retry_after(response)
+            delay = backoff_delay(attempt) if delay is None else delay
+            print(f"Fetching {host} returned {response.status_code}; retrying in {delay:.1f}s")
+        record(host, retries=1)
+        time.sleep(delay)
+
+
+def get(url, session=None, timeout=None, retries=RETRIES, **kwargs):
+    """
+    GET url into memory, retrying connection errors, timeouts and retryable statuses.
+    The last response is returned whatever its status, for the caller to check.
+    """
+    response, limiter = _send(url, session, False, timeout, retries, **kwargs)
+    limiter.release()
+    record(urlsplit(url).hostname, bytes=len(response.content))
+    return response
+
+
+@contextmanager
+def stream(url, session=None, timeout=None, retries=RETRIES, **kwargs):
+    """
+    GET url as a streamed response, retrying until the response starts. The host's
+    concurrency slot is held until the block exits; the body is not retried.
+    """
+    response, limiter = _send(url, session, True, timeout, retries, **kwargs)
+    try:
+        with response:
+            try:
+                yield response
+            finally:
+                record(urlsplit(url).hostname, bytes=response.raw.tell())
+    finally:
+        limiter.release()
+
+
+def download(url, path, session=None, timeout=None, retries=RETRIES, digest=None, chunk_size=65536, **kwargs):
+    """
+    Stream url to path through a temporary file, starting again if the body fails
+    part way. Only a 200 response is written. Returns the last response (closed),
+    for the caller to check its status and headers, and the hex digest of the body
+    when a hashlib algorithm is named by digest.
+    """
+    import hashlib
+
+    temp_path = f"{path}.part"
+    for attempt in range(retries + 1):
+        hasher = hashlib.new(digest) if digest else None
+        started = False
+        try:
+            with stream(url, session, timeout, retries, **kwargs) as response:
+                if response.status_code != 200:
+                    return response, None
+                started = True
+                with open(temp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+                        if hasher:
+                            hasher.update(chunk)
+                os.replace(temp_path, path)
+                return response, hasher.hexdigest() if hasher else None
+        except retryable_errors() as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            if not started or attempt == retries:  # stream has already retried the request itself
+                raise
+            record(urlsplit(url).hostname, errors=1, retries=1)
+            delay = backoff_delay(attempt)
+            print(f"Download from {urlsplit(url).hostname} failed part way ({type(e).__name__}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+@contextmanager
+def ftp_connection(host, port=21, directory=None, timeout=None, retries=RETRIES):
+    """
+    Connect and log in anonymously to an FTP server, changing to directory, retrying
+    refused or dropped connections and temporary (4xx) replies. The host's
+    concurrency slot is held for the whole connection.
+    """
+    from ftplib import FTP, all_errors, error_temp
+
+    connect_timeout, read_timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    with host_limiter(host):
+        for attempt in range(retries + 1):
+            ftp = FTP()
+            start = time.perf_counter()
+            try:
+                ftp.connect(host, port, timeout=connect_timeout)
+                ftp.sock.settimeout(read_timeout)
+                ftp.timeout = read_timeout  # data connections use this
+                ftp.login()
+                if directory:
+                    ftp.cwd(directory)
+            except (OSError, EOFError, error_temp) as e:
+                ftp.close()
+                record(host, requests=1, errors=1, latency_s=time.perf_counter() - start)
+                if attempt == retries:
+                    raise
+                record(host, retries=1)
+                delay = backoff_delay(attempt)
+                print(f"Connecting to {host} failed ({type(e).__name__}: {e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            record(host, requests=1, latency_s=time.perf_counter() - start)
+            try:
+                yield ftp
+            finally:
+                try:
+                    ftp.quit()
+                except all_errors:
+                    ftp.close()
+            return
+
+
+def ftp_retrieve(ftp, file_name, callback, blocksize=65536):
+    """RETR file_name in binary mode, passing each block to callback and counting its bytes."""
+    def receive(block):
+        add_bytes(len(block))
+        record(ftp.host, bytes=len(block))
+        callback(block)
+
+    ftp.retrbinary(f"RETR {file_name}", receive, blocksize)
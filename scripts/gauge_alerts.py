@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+import argparse
+import filecmp
+import json
+import os
+import time
+
+import numpy as np
+
+from gauge_index import SOURCES, VALUE_DECIMALS
+from geojson_writer import write_feature_collection
+
+# threshold and rate of rise alerting over the stream gauge readings
+# each run of the bom and wnsw scripts evaluates its gauges against the state its
+# previous run left in alerts_state.npz and writes alerts.geojson with only the
+# gauges whose level or rising flag changed in each source's latest run
+# the state holds, per gauge, the level, rising flag and last reading as sorted
+# arrays keyed by site id, with each source's latest alerts as JSON; it is
+# committed with the outputs, so it is loaded without pickle
+# levels come from per gauge thresholds in ALERT_RULES_FILE and, for WaterNSW, the
+# site colour band; a gauge is rising when its height climbs faster than its
+# rise_m_per_hour between two readings at most ALERT_RISE_MAX_HOURS apart
+# evaluation is vectorised over the arrays, so 10k gauges take milliseconds
+#
+# the rules file maps "source:site_id" (or a bare site id, for any source) to
+#   {"minor": 2.0, "moderate": 3.5, "major": 5.0, "rise_m_per_hour": 0.3}
+# with any of the keys left out
+#
+#   python scripts/gauge_alerts.py [--path datasets] [--source wnsw]
+
+OUTPUT_DIR = os.environ.get("OUTPUT_DIR", "datasets")
+RULES_FILE = os.environ.get("ALERT_RULES_FILE")  # default: alert_rules.json beside the outputs
+RISE_M_PER_HOUR = float(os.environ.get("ALERT_RISE_M_PER_HOUR", "0.5"))  # for gauges without their own rule
+RISE_MAX_HOURS = float(os.environ.get("ALERT_RISE_MAX_HOURS", "6"))  # longer gaps say nothing about the rise
+
+LEVELS = ["normal", "minor", "moderate", "major"]
+# WaterNSW colour bands counted as levels, as ALERT_COLOUR_LEVELS="colour=level,..."; other colours are normal
+COLOUR_LEVELS = {
+    colour.strip(): LEVELS.index(level.strip())
+    for colour, _, level in (
+        item.partition("=") for item in os.environ.get("ALERT_COLOUR_LEVELS", "orange=minor,red=moderate").split(",") if "=" in item
+    )
+}
+BAND_COLUMNS = {"wnsw": "colour"}
+
+STATE_VERSION = 1
+NO_TIME = -1  # observed_at of a gauge never seen with a reading
+
+
+def state_path(output_dir):
+    return os.path.join(output_dir, "alerts_state.npz")
+
+
+def alerts_path(output_dir):
+    return os.path.join(output_dir, "alerts.geojson")
+
+
+def load_state(output_dir):
+    """The saved state of every source, {source: {"gauges": arrays, "alerts": features}}; empty if missing or stale."""
+    path = state_path(output_dir)
+    if not os.path.exists(path):
+        return {}
+    sources = {}
+    try:
+        with np.load(path, allow_pickle=False) as saved:
+            if int(saved["version"]) != STATE_VERSION:
+                return {}
+            # Arrays are saved as "{source}.{name}", the alerts as "{source}.alerts"
+            for key in saved.files:
+                source, _, name = key.partition(".")
+                if not name:
+                    continue
+                entry = sources.setdefault(source, {"gauges": {}, "alerts": []})
+                if name == "alerts":
+                    entry["alerts"] = json.loads(str(saved[key]))
+                else:
+                    entry["gauges"][name] = saved[key]
+    except Exception as e:
+        print(f"Ignoring unreadable alert state: {e}")
+        return {}
+    return sources
+
+
+def save_state(output_dir, sources):
+    """Save every source's state arrays and alerts to one .npz file."""
+    arrays = {"version": STATE_VERSION}
+    for source, entry in sources.items():
+        arrays.update({f"{source}.{name}": array for name, array in entry["gauges"].items()})
+        arrays[f"{source}.alerts"] = json.dumps(entry["alerts"])
+    path = state_path(output_dir)
+    with open(f"{path}.tmp", "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(f"{path}.tmp", path)
+
+
+def load_rules(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def rule_arrays(rules, source, site_ids):
+    """
+    Per gauge thresholds (n x 3, NaN where unset) and rise limits for sorted site_ids.
+    Rules for "source:site_id" take precedence over rules for the bare site id.
+    """
+    thresholds = np.full((len(site_ids), len(LEVELS) - 1), np.nan)
+    rise = np.full(len(site_ids), RISE_M_PER_HOUR)
+    generic = [(key, rule) for key, rule in rules.items() if ":" not in key]
+    specific = [(key.partition(":")[2], rule) for key, rule in rules.items() if key.partition(":")[0] == source]
+    for site_id, rule in generic + specific:
+        position = np.searchsorted(site_ids, site_id)
+        if position == len(site_ids) or site_ids[position] != site_id:
+            continue
+        for column, level in enumerate(LEVELS[1:]):
+            if rule.get(level) is not None:
+                thresholds[position, column] = rule[level]
+        if rule.get("rise_m_per_hour") is not None:
+            rise[position] = rule["rise_m_per_hour"]
+    return thresholds, rise
+
+
+def evaluate(previous, site_ids, values, observed_at, bands, thresholds, rise):
+    """
+    Evaluate sorted, unique site_ids against the previous state arrays (None on a first run).
+    Returns the new state arrays, the rate of rise per gauge (NaN when unknown), the
+    previous levels and rising flags, and the positions of the gauges whose level or
+    rising flag changed.
+    """
+    n = len(site_ids)
+    prev_value = np.full(n, np.nan)
+    prev_time = np.full(n, NO_TIME, dtype=np.int64)
+    prev_level = np.zeros(n, dtype=np.int8)
+    prev_rising = np.zeros(n, dtype=bool)
+    if previous is not None and len(previous["site_id"]):
+        positions = np.minimum(np.searchsorted(previous["site_id"], site_ids), len(previous["site_id"]) - 1)
+        found = previous["site_id"][positions] == site_ids
+        positions = positions[found]
+        prev_value[found] = previous["value"][positions]
+        prev_time[found] = previous["observed_at"][positions]
+        prev_level[found] = previous["level"][positions]
+        prev_rising[found] = previous["rising"][positions]
+
+    has_reading = ~np.isnan(values) & (observed_at != NO_TIME)
+    new_reading = has_reading & (observed_at > prev_time)
+    hours = (observed_at - prev_time) / 3600
+    comparable = new_reading & (prev_time != NO_TIME) & ~np.isnan(prev_value) & (hours <= RISE_MAX_HOURS)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rate = np.where(comparable, (values - prev_value) / hours, np.nan)
+        rising = np.where(new_reading, rate >= rise, prev_rising)
+        # NaN thresholds and values compare False, so unset levels are never reached
+        level = (values[:, None] >= thresholds).sum(axis=1).astype(np.int8)
+    level = np.maximum(level, bands)
+    level = np.where(has_reading | (bands > 0), level, prev_level)
+
+    state = {
+        "site_id": site_ids,
+        "value": np.where(new_reading, values, prev_value),
+        "observed_at": np.where(new_reading, observed_at, prev_time),
+        "level": level,
+        "rising": rising
+    }
+    if previous is None:
+        changed = np.empty(0, dtype=np.int64)  # the first run only sets the baseline
+    else:
+        changed = np.flatnonzero((level != prev_level) | (rising != prev_rising))
+    return state, rate, prev_level, prev_rising, changed
+
+
+def same_state(state, previous):
+    """True when a run left every gauge's state as it was, i.e. it brought no new readings."""
+    return previous is not None and all(
+        np.array_equal(state[name], previous[name], equal_nan=name == "value") for name in state
+    )
+
+
+def gauge_arrays(source, gdf):
+    """Sorted, unique site ids with their names, coordinates, readings and colour band levels from a source's frame."""
+    import pandas as pd
+
+    columns = SOURCES[source]
+    gdf = gdf[gdf.geometry.notna() & ~gdf.geometry.is_empty]
+    site_ids, first = np.unique(gdf[columns["site_id"]].astype(str).to_numpy(dtype=str), return_index=True)
+    gdf = gdf.iloc[first]
+    observed = pd.to_datetime(gdf[columns["observed_at"]], utc=True, errors="coerce")
+    seconds = (observed - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)
+    band_column = BAND_COLUMNS.get(source)
+    bands = (
+        gdf[band_column].map(COLOUR_LEVELS).fillna(0).to_numpy(dtype=np.int8)
+        if band_column in gdf else np.zeros(len(gdf), dtype=np.int8)
+    )
+    return {
+        "site_id": site_ids,
+        "name": gdf[columns["name"]].astype(object).where(gdf[columns["name"]].notna(), None).tolist(),
+        "lon": gdf.geometry.x.to_numpy(),
+        "lat": gdf.geometry.y.to_numpy(),
+        "value": pd.to_numeric(gdf[columns["value"]], errors="coerce").astype("float64").round(VALUE_DECIMALS).to_numpy(na_value=np.nan),
+        "observed_at": seconds.fillna(NO_TIME).to_numpy(dtype=np.int64),
+        "band": bands
+    }
+
+
+def alert_features(source, gauges, state, rate, prev_level, prev_rising, changed):
+    """GeoJSON features for the gauges at positions changed, in site id order."""
+    features = []
+    for i in changed.tolist():
+        value = float(gauges["value"][i])
+        observed_at = int(gauges["observed_at"][i])
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [float(gauges["lon"][i]), float(gauges["lat"][i])]},
+            "properties": {
+                "source": source,
+                "site_id": str(gauges["site_id"][i]),
+                "name": gauges["name"][i],
+                "value": None if np.isnan(value) else value,
+                "observed_at": None if observed_at == NO_TIME else time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(observed_at)),
+                "level": LEVELS[state["level"][i]],
+                "previous_level": LEVELS[prev_level[i]],
+                "rising": bool(state["rising"][i]),
+                "was_rising": bool(prev_rising[i]),
+                "rise_m_per_hour": None if np.isnan(rate[i]) else round(float(rate[i]), 3)
+            }
+        })
+    return features
+
+
+def write_alerts(output_dir, sources):
+    """Write every source's latest alerts to alerts.geojson, leaving an identical file untouched."""
+    path = alerts_path(output_dir)
+    new_path = f"{path}.new"
+    count = write_feature_collection(
+        new_path, (feature for source in sorted(sources) for feature in sources[source]["alerts"])
+    )
+    if os.path.exists(path) and filecmp.cmp(new_path, path, shallow=False):
+        os.remove(new_path)
+        return count, False
+    os.replace(new_path, path)
+    return count, True
+
+
+def update_alerts(source, gdf, output_dir=OUTPUT_DIR, rules_file=RULES_FILE):
+    """
+    Evaluate a source's frame (as written by its script) against the state of its
+    previous run, save the new state and rewrite alerts.geojson in output_dir.
+    Returns the number of gauges that changed state.
+    """
+    start = time.perf_counter()
+    sources = load_state(output_dir)
+    previous = sources.get(source, {}).get("gauges")
+    gauges = gauge_arrays(source, gdf)
+    thresholds, rise = rule_arrays(load_rules(rules_file or os.path.join(output_dir, "alert_rules.json")), source, gauges["site_id"])
+    state, rate, prev_level, prev_rising, changed = evaluate(
+        previous, gauges["site_id"], gauges["value"], gauges["observed_at"], gauges["band"], thresholds, rise
+    )
+    if same_state(state, previous) and os.path.exists(alerts_path(output_dir)):
+        # A rerun over the same readings keeps the alerts of the run that brought them, and every file as it is
+        written = False
+    else:
+        sources[source] = {"gauges": state, "alerts": alert_features(source, gauges, state, rate, prev_level, prev_rising, changed)}
+        save_state(output_dir, sources)
+        _, written = write_alerts(output_dir, sources)
+
+    baseline = " (first run; baseline recorded)" if previous is None else ""
+    status = "written to" if written else "unchanged in"
+    print(f"Alerts: {len(changed)} of {len(state['site_id'])} {source} gauges changed state{baseline}; "
+          f"{status} {alerts_path(output_dir)} in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return len(changed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List the gauges currently above normal or rising")
+    parser.add_argument("--path", default=OUTPUT_DIR, help="directory holding alerts_state.npz")
+    parser.add_argument("--source", choices=list(SOURCES))
+    args = parser.parse_args()
+
+    sources = load_state(args.path)
+    shown = 0
+    for source in sorted(sources):
+        if args.source and source != args.source:
+            continue
+        state = sources[source]["gauges"]
+        for i in np.flatnonzero((state["level"] > 0) | state["rising"]).tolist():
+            observed_at = int(state["observed_at"][i])
+            when = "" if observed_at == NO_TIME else time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(observed_at))
+            rising = "rising" if state["rising"][i] else ""
+            print(f"{source:<5} {state['site_id'][i]:<12} {LEVELS[state['level'][i]]:<9} {rising:<7} "
+                  f"{state['value'][i]:8.3f} m at {when}")
+            shown += 1
+    print(f"{shown} gauges above normal or rising")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+
+# spatial index over the stream gauge GeoPackages (BOM stream_heights, WaterNSW site_data)
+# answering bounding box, radius and k-nearest queries with haversine distances
+# gauges are bucketed into a lat/lon grid stored as sorted cell keys, so a query
+# only measures the gauges in the few cells around it
+# the scripts save each source's index beside its GeoPackage when they write it,
+# as plain arrays in an .npz file (loaded without pickle, since it is committed);
+# a missing or stale index is rebuilt from the GeoPackage on load
+#
+#   python scripts/gauge_index.py near 150.31 -33.71 --radius-km 20
+#   python scripts/gauge_index.py near 150.31 -33.71 --k 5
+#   python scripts/gauge_index.py bbox 150.0 -34.0 150.6 -33.4
+
+OUTPUT_DIR = os.environ.get("OUTPUT_DIR", "datasets")
+CELL_DEG = float(os.environ.get("GAUGE_INDEX_CELL_DEG", "0.1"))  # grid cell size; ~11 km of latitude
+EARTH_RADIUS_KM = 6371.0088
+INDEX_VERSION = 1
+
+# Columns of each source's GeoPackage layer carried into query results
+SOURCES = {
+    "bom": {
+        "layer": "stream_heights", "site_id": "SENSORID", "name": "NAME",
+        "value": "RealValue", "observed_at": "ObservationTimestamp",
+        "path": os.environ.get("BOM_GPKG", os.path.join(OUTPUT_DIR, "au_stream_gauges.gpkg"))
+    },
+    "wnsw": {
+        "layer": "site_data", "site_id": "site_station", "name": "stname",
+        "value": "height", "observed_at": "height_datetime",
+        "path": os.environ.get("WNSW_GPKG", os.path.join(OUTPUT_DIR, "wnsw_stream_height_data.gpkg"))
+    },
+}
+RECORD_FIELDS = ["source", "site_id", "name", "lon", "lat", "value", "observed_at"]
+VALUE_DECIMALS = 3  # both sources report heights to the millimetre
+
+
+def index_path(gpkg_path):
+    """Where the index of a GeoPackage is saved: beside it, with a .gauge_index.npz extension."""
+    return os.path.splitext(gpkg_path)[0] + ".gauge_index.npz"
+
+
+def hash_file(file_path):
+    hasher = hashlib.md5()
+    with open(file_path, "rb") as file:
+        while chunk := file.read(65536):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def haversine_km(lon, lat, lons, lats):
+    """Distance in km from (lon, lat) in radians to arrays of points in radians."""
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GaugeIndex:
+    """Grid index of gauge points; records are tuples in RECORD_FIELDS order."""
+
+    def __init__(self, records, cell_deg=CELL_DEG):
+        self.cell_deg = cell_deg
+        self.columns = math.ceil(360 / cell_deg)
+        lon = np.array([record[3] for record in records], dtype=np.float64)
+        lat = np.array([record[4] for record in records], dtype=np.float64)
+        keys = self._row(lat) * self.columns + self._column(lon)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.lon = np.radians(lon[order])
+        self.lat = np.radians(lat[order])
+        self.records = [records[i] for i in order]
+
+    def __len__(self):
+        return len(self.records)
+
+    def _row(self, lat):
+        return np.floor((np.clip(lat, -90, 90) + 90) / self.cell_deg).astype(np.int64)
+
+    def _column(self, lon):
+        return np.floor((np.asarray(lon) + 180) % 360 / self.cell_deg).astype(np.int64) % self.columns
+
+    @classmethod
+    def from_frame(cls, gdf, source):
+        """Build an index of one source's GeoDataFrame, skipping gauges without a location."""
+        import pandas as pd
+
+        columns = SOURCES[source]
+        gdf = gdf[gdf.geometry.notna() & ~gdf.geometry.is_empty]
+        # Rounded, so float32 columns do not widen to values like 1.2300000190734863
+        values = pd.to_numeric(gdf[columns["value"]], errors="coerce").astype("float64").round(VALUE_DECIMALS)
+        # Older files hold the timestamps as text
+        observed = pd.to_datetime(gdf[columns["observed_at"]], utc=True, errors="coerce").dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+        observed = observed.astype(object).where(observed.notna(), None)
+        records = [
+            (source, site_id, name, lon, lat, None if math.isnan(value) else value, observed_at)
+            for site_id, name, lon, lat, value, observed_at in zip(
+                gdf[columns["site_id"]].astype(str), gdf[columns["name"]].astype(object).where(gdf[columns["name"]].notna(), None),
+                gdf.geometry.x.tolist(), gdf.geometry.y.tolist(), values.tolist(), observed.tolist()
+            )
+        ]
+        return cls(records)
+
+    @classmethod
+    def concat(cls, indexes):
+        return cls([record for index in indexes for record in index.records], indexes[0].cell_deg if indexes else CELL_DEG)
+
+    def _candidates(self, min_lon, min_lat, max_lon, max_lat):
+        """Positions of the gauges in the grid cells overlapping a bbox (degrees, may cross 180)."""
+        rows = np.arange(self._row(min_lat), self._row(max_lat) + 1)
+        if max_lon - min_lon >= 360:
+            spans = [(0, self.columns - 1)]
+        else:
+            first, last = int(self._column(min_lon)), int(self._column(max_lon))
+            spans = [(first, last)] if first <= last else [(first, self.columns - 1), (0, last)]
+        ranges = []
+        for first, last in spans:
+            starts = np.searchsorted(self.keys, rows * self.columns + first, side="left")
+            ends = np.searchsorted(self.keys, rows * self.columns + last, side="right")
+            ranges += [np.arange(start, end) for start, end in zip(starts, ends) if end > start]
+        return np.concatenate(ranges) if ranges else np.empty(0, dtype=np.int64)
+
+    def _within(self, lon, lat, radius_km):
+        """Positions and distances of the gauges within radius_km, nearest first."""
+        dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        if abs(lat) + dlat >= 90 or dlat >= 90:
+            min_lon, max_lon = -180, 180  # the circle reaches a pole
+        else:
+            dlon = math.degrees(math.asin(min(math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(lat)), 1)))
+            min_lon, max_lon = lon - dlon, lon + dlon
+        candidates = self._candidates(min_lon, lat - dlat, max_lon, lat + dlat)
+        distances = haversine_km(math.radians(lon), math.radians(lat), self.lon[candidates], self.lat[candidates])
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")
+        return candidates[order], distances[order]
+
+    def _results(self, positions, distances=None):
+        results = [dict(zip(RECORD_FIELDS, self.records[position])) for position in positions.tolist()]
+        if distances is not None:
+            for result, distance in zip(results, distances.tolist()):
+                result["distance_km"] = round(distance, 3)
+        return results
+
+    def bbox(self, min_lon, min_lat, max_lon, max_lat):
+        """Gauges inside a bounding box in degrees; min_lon > max_lon crosses the antimeridian."""
+        if min_lon > max_lon:
+            max_lon += 360
+        candidates = self._candidates(min_lon, min_lat, max_lon, max_lat)
+        lat = np.degrees(self.lat[candidates])
+        lon = (np.degrees(self.lon[candidates]) - min_lon) % 360 + min_lon
+        inside = (lat >= min_lat) & (lat <= max_lat) & (lon <= max_lon)
+        return self._results(candidates[inside])
+
+    def within(self, lon, lat, radius_km):
+        """Gauges within radius_km of (lon, lat), nearest first, with distance_km."""
+        return self._results(*self._within(lon, lat, radius_km))
+
+    def nearest(self, lon, lat, k=1, max_km=None):
+        """
+        The k gauges nearest (lon, lat), nearest first, with distance_km.
+        Grows a box of cells until it holds k gauges; the k-th of those bounds the search radius.
+        """
+        limit = min(max_km, math.pi * EARTH_RADIUS_KM) if max_km else math.pi * EARTH_RADIUS_KM
+        if not self.records or k < 1:
+            return []
+        span = self.cell_deg
+        while True:
+            stretch = span / max(math.cos(math.radians(min(abs(lat) + span, 89.9))), 1e-6)
+            candidates = self._candidates(lon - stretch, lat - span, lon + stretch, lat + span)
+            if len(candidates) >= k or span >= 180:
+                break
+            span *= 2
+        distances = haversine_km(math.radians(lon), math.radians(lat), self.lon[candidates], self.lat[candidates])
+        radius = min(float(np.partition(distances, min(k, len(distances)) - 1)[min(k, len(distances)) - 1]), limit)
+        positions, distances = self._within(lon, lat, radius)
+        return self._results(positions[:k], distances[:k])
+
+
+def record_arrays(records):
+    """Records as one array per field; missing names and timestamps become "" (with a has_name mask) and values NaN."""
+    source, site_id, name, lon, lat, value, observed_at = zip(*records) if records else [()] * len(RECORD_FIELDS)
+    return {
+        "source": np.array(source, dtype=str),
+        "site_id": np.array(site_id, dtype=str),
+        "name": np.array(["" if item is None else item for item in name], dtype=str),
+        "has_name": np.array([item is not None for item in name], dtype=bool),
+        "lon": np.array(lon, dtype=np.float64),
+        "lat": np.array(lat, dtype=np.float64),
+        "value": np.array([np.nan if item is None else item for item in value], dtype=np.float64),
+        "observed_at": np.array(["" if item is None else item for item in observed_at], dtype=str)
+    }
+
+
+def array_records(arrays):
+    """The records saved by record_arrays."""
+    names = [name if has_name else None for name, has_name in zip(arrays["name"].tolist(), arrays["has_name"].tolist())]
+    values = [None if math.isnan(value) else value for value in arrays["value"].tolist()]
+    observed = [observed_at or None for observed_at in arrays["observed_at"].tolist()]
+    return list(zip(
+        arrays["source"].tolist(), arrays["site_id"].tolist(), names,
+        arrays["lon"].tolist(), arrays["lat"].tolist(), values, observed
+    ))
+
+
+def save_index(gdf, gpkg_path, source):
+    """Build and save the index of a source's frame beside the GeoPackage it was written to."""
+    index = GaugeIndex.from_frame(gdf, source)
+    with open(index_path(gpkg_path), "wb") as f:
+        np.savez(
+            f, version=INDEX_VERSION, gpkg_md5=hash_file(gpkg_path), cell_deg=index.cell_deg,
+            **record_arrays(index.records)
+        )
+    print(f"Gauge index saved to {index_path(gpkg_path)} ({len(index)} gauges)")
+    return index
+
+
+def load_source(source, gpkg_path=None):
+    """Load a source's saved index, rebuilding it from its GeoPackage if missing or stale."""
+    gpkg_path = gpkg_path or SOURCES[source]["path"]
+    path = index_path(gpkg_path)
+    if os.path.exists(path):
+        try:
+            with np.load(path, allow_pickle=False) as saved:
+                if int(saved["version"]) == INDEX_VERSION and str(saved["gpkg_md5"]) == hash_file(gpkg_path):
+                    return GaugeIndex(array_records(saved), float(saved["cell_deg"]))
+        except Exception as e:
+            print(f"Ignoring unreadable gauge index: {e}")
+
+    import geopandas as gpd
+
+    gdf = gpd.read_file(gpkg_path, layer=SOURCES[source]["layer"])
+    try:
+        return save_index(gdf, gpkg_path, source)
+    except OSError:  # a read-only copy can still be queried
+        return GaugeIndex.from_frame(gdf, source)
+
+
+def load_gauges(paths=None):
+    """One index over every source ({source: GeoPackage path}, default: those in SOURCES that exist)."""
+    paths = paths or {source: columns["path"] for source, columns in SOURCES.items() if os.path.exists(columns["path"])}
+    if not paths:
+        raise FileNotFoundError("no gauge GeoPackages found; set BOM_GPKG/WNSW_GPKG or pass --source")
+    return GaugeIndex.concat([load_source(source, path) for source, path in paths.items()])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the stream gauges near a point or inside a bounding box")
+    parser.add_argument("--source", action="append", default=[], metavar="NAME=GPKG",
+                        help=f"gauge GeoPackage to query ({', '.join(SOURCES)}); repeatable")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    queries = parser.add_subparsers(dest="query", required=True)
+    near = queries.add_parser("near", help="gauges within a radius of, or nearest to, a point")
+    near.add_argument("lon", type=float)
+    near.add_argument("lat", type=float)
+    near.add_argument("--radius-km", type=float)
+    near.add_argument("--k", type=int, default=5, help="number of nearest gauges when no radius is given")
+    box = queries.add_parser("bbox", help="gauges inside a bounding box")
+    for name in ("min_lon", "min_lat", "max_lon", "max_lat"):
+        box.add_argument(name, type=float)
+    args = parser.parse_args()
+
+    paths = {}
+    for item in args.source:
+        source, _, path = item.partition("=")
+        if source not in SOURCES or not path:
+            parser.error(f"--source must be NAME=GPKG with NAME one of {', '.join(SOURCES)}")
+        paths[source] = path
+    index = load_gauges(paths)
+
+    if args.query == "bbox":
+        results = index.bbox(args.min_lon, args.min_lat, args.max_lon, args.max_lat)
+    elif args.radius_km is not None:
+        results = index.within(args.lon, args.lat, args.radius_km)
+    else:
+        results = index.nearest(args.lon, args.lat, args.k)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        distance = f"{result['distance_km']:8.2f} km  " if "distance_km" in result else ""
+        value = "" if result["value"] is None else f"{result['value']:.3f} m at {result['observed_at']}"
+        print(f"{distance}{result['source']:<5} {result['site_id']:<12} {result['name'] or '':<40} {value}")
+    print(f"{len(results)} gauges")
+
+
+if __name__ == "__main__":
+    main()
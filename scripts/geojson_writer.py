@@ -0,0 +1,73 @@
+import json
+import os
+import sys
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library encoder is used instead
+    orjson = None
+
+# shared streaming geojson writer for the json based scripts (rfs, gnb, ropewiki)
+# features are written one at a time from any iterable, compactly encoded,
+# with coordinates rounded to a fixed precision
+# numpy is never imported here: arrays can only come from a caller that already
+# imported it, so it is looked up in sys.modules when needed
+
+COORDINATE_PRECISION = int(os.environ.get("GEOJSON_PRECISION", "6"))
+
+
+def round_coordinates(coords, precision=COORDINATE_PRECISION):
+    """Round nested coordinate lists (or numpy arrays) to the given number of decimals."""
+    np = sys.modules.get("numpy")
+    if np is not None and isinstance(coords, np.ndarray):
+        return np.round(coords, precision)
+    if coords and isinstance(coords[0], (int, float)):
+        return [round(value, precision) for value in coords]
+    return [round_coordinates(part, precision) for part in coords]
+
+
+def round_feature(feature, precision=COORDINATE_PRECISION):
+    """Return the feature with its geometry coordinates rounded."""
+    geometry = feature.get("geometry")
+    if not geometry or geometry.get("coordinates") is None or precision is None:
+        return feature
+    return {**feature, "geometry": {**geometry, "coordinates": round_coordinates(geometry["coordinates"], precision)}}
+
+
+def _default(obj):
+    np = sys.modules.get("numpy")
+    if np is not None and isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if np is not None and isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def encode_feature(feature):
+    """Encode one feature as compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(feature, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(feature, separators=(",", ":"), ensure_ascii=False, default=_default).encode("utf-8")
+
+
+def write_feature_collection(path, features, precision=COORDINATE_PRECISION):
+    """
+    Stream features into a GeoJSON FeatureCollection at path.
+    The file is written to a temporary name and moved into place once complete.
+    Returns the number of features written.
+    """
+    count = 0
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b'{"type":"FeatureCollection","features":[')
+        for feature in features:
+            feature = round_feature(feature, precision)
+            if count:
+                f.write(b",\n")
+            else:
+                f.write(b"\n")
+            f.write(encode_feature(feature))
+            count += 1
+        f.write(b"\n]}\n")
+    os.replace(tmp_path, path)
+    return count
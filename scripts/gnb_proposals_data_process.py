@@ -1,6 +1,14 @@
-import requests
+from concurrent.futures import ThreadPoolExecutor
 import os
 import json
+import sqlite3
+import time
+
+import fetch
+from feature_diff import has_changes, write_features_if_changed
+from instrumentation import instrumented, propagate, stage
+from vector_tiles import export_geojson
+from columnar_snapshot import snapshot_geojson
 
 # Constants
 NAMING_URL = "https://dcok8xuap4.execute-api.ap-southeast-2.amazonaws.com/prod/public/placenames/advertised-proposals"
@@ -11,30 +19,149 @@ output_dir = os.environ.get("OUTPUT_DIR", "datasets")
 os.makedirs(output_dir, exist_ok=True)
 OUTPUT_FILE = os.path.join(output_dir, "naming_proposals.geojson")
 
-def fetch_json(url):
+# Geoname fetch configuration
+GEONAME_WORKERS = int(os.environ.get("GEONAME_WORKERS", "8"))  # retries and per-host limits are set in fetch
+FETCH_TIMEOUT = (5, 30)  # connect, read (seconds)
+
+# Geoname cache configuration
+CACHE_FILE = os.path.join(output_dir, "geoname_cache.sqlite")
+CACHE_TTL = int(os.environ.get("GEONAME_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+CACHE_MAX_ENTRIES = int(os.environ.get("GEONAME_CACHE_MAX_ENTRIES", "5000"))
+
+@instrumented("gnb")
+def fetch_json(url, session=None):
     """Fetch JSON data from a URL."""
-    response = requests.get(url)
+    response = fetch.get(url, session, timeout=FETCH_TIMEOUT)
     response.raise_for_status()
     return response.json()
 
-def process_naming_records():
-    """Fetch naming records and process them into a GeoJSON file."""
-    print("Fetching naming proposals...")
-    data = fetch_json(NAMING_URL)
-    naming_records = data.get("naming", {}).get("current", [])
+class GeonameCache:
+    """
+    SQLite cache of geoname details keyed by geoname_identifier.
+    Entries younger than the TTL are served without a request; older entries
+    are revalidated with ETag/Last-Modified when the server provided them.
+    Cache hits do not write, so a warm run leaves the file unchanged.
+    """
 
-    features = []
-    for record in naming_records:
-        geoname_id = record.get("geoname_identifier")
-        if not geoname_id:
-            continue
+    def __init__(self, path=CACHE_FILE, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "evicted": 0}
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS geonames ("
+            "geoname_identifier TEXT PRIMARY KEY, data TEXT NOT NULL, etag TEXT, "
+            "last_modified TEXT, fetched_at REAL NOT NULL)"
+        )
+
+    def get(self, geoname_id):
+        """Return (data, etag, last_modified, is_fresh) or None if not cached."""
+        row = self.conn.execute(
+            "SELECT data, etag, last_modified, fetched_at FROM geonames WHERE geoname_identifier = ?",
+            (str(geoname_id),)
+        ).fetchone()
+        if row is None:
+            return None
+        data, etag, last_modified, fetched_at = row
+        return json.loads(data), etag, last_modified, time.time() - fetched_at < self.ttl
+
+    def put(self, geoname_id, data, etag=None, last_modified=None):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO geonames VALUES (?, ?, ?, ?, ?)",
+            (str(geoname_id), json.dumps(data), etag, last_modified, time.time())
+        )
+
+    def refresh(self, geoname_id):
+        """Restart the TTL of an entry the server confirmed is unchanged."""
+        self.conn.execute(
+            "UPDATE geonames SET fetched_at = ? WHERE geoname_identifier = ?",
+            (time.time(), str(geoname_id))
+        )
+
+    def close(self):
+        """
+        Evict the least recently fetched entries beyond max_entries and save.
+        Entries still in use are refreshed every TTL, so stale ones age out first.
+        """
+        cursor = self.conn.execute(
+            "DELETE FROM geonames WHERE geoname_identifier IN ("
+            "SELECT geoname_identifier FROM geonames ORDER BY fetched_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self.stats["evicted"] += cursor.rowcount
+        self.conn.commit()
+        self.conn.close()
+
+def fetch_geoname(geoname_id, session, etag=None, last_modified=None):
+    """
+    Fetch geoname details, sending conditional headers when available.
+    Returns (data, etag, last_modified); data is None if the server answered 304.
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    response = fetch.get(GEONAME_URL_TEMPLATE.format(geoname_id), session, timeout=FETCH_TIMEOUT, headers=headers)
+    if response.status_code == 304:
+        return None, etag, last_modified
+    response.raise_for_status()
+    return response.json(), response.headers.get("ETag"), response.headers.get("Last-Modified")
 
-        # Fetch geoname details with graceful error handling
-        geoname_url = GEONAME_URL_TEMPLATE.format(geoname_id)
+@instrumented("gnb")
+def fetch_geonames(geoname_ids, session, cache, workers=GEONAME_WORKERS):
+    """
+    Fetch geoname details for each id, serving fresh entries from the cache and
+    fetching the rest concurrently.
+    Returns a list aligned with geoname_ids; failed fetches are returned as the exception.
+    """
+    results = [None] * len(geoname_ids)
+    pending = []  # (index, geoname_id, cached entry or None)
+    for index, geoname_id in enumerate(geoname_ids):
+        cached = cache.get(geoname_id)
+        if cached and cached[3]:
+            results[index] = cached[0]
+            cache.stats["hits"] += 1
+        else:
+            pending.append((index, geoname_id, cached))
+
+    def fetch_one(item):
+        _, geoname_id, cached = item
         try:
-            geoname_data = fetch_json(geoname_url)
+            if cached:
+                return fetch_geoname(geoname_id, session, cached[1], cached[2])
+            return fetch_geoname(geoname_id, session)
         except Exception as e:
-            print(f"Skipping record {geoname_id} due to error fetching geoname data: {e}")
+            return e
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        fetched = list(executor.map(propagate(fetch_one), pending))
+
+    # Cache writes happen on this thread as sqlite connections are not shared across threads
+    for (index, geoname_id, cached), result in zip(pending, fetched):
+        if isinstance(result, Exception):
+            results[index] = result
+            continue
+        data, etag, last_modified = result
+        if data is None:
+            results[index] = cached[0]
+            cache.refresh(geoname_id)
+            cache.stats["revalidated"] += 1
+        else:
+            results[index] = data
+            cache.put(geoname_id, data, etag, last_modified)
+            cache.stats["misses"] += 1
+    return results
+
+@instrumented("gnb")
+def iter_naming_features(naming_records, geonames):
+    """Yield a GeoJSON feature for each naming record with its geoname details."""
+    for record, geoname_data in zip(naming_records, geonames):
+        geoname_id = record.get("geoname_identifier")
+
+        # Skip records whose geoname details could not be fetched
+        if isinstance(geoname_data, Exception):
+            print(f"Skipping record {geoname_id} due to error fetching geoname data: {geoname_data}")
             continue
 
         # Extract required fields
@@ -58,22 +185,40 @@ def process_naming_records():
                     "designation": record.get("designation")
                 }
             }
-
-            features.append(feature)
         except Exception as e:
             print(f"Error processing record {geoname_id}: {e}")
+            continue
+
+        yield feature
+
+def process_naming_records(workers=GEONAME_WORKERS, session=None):
+    """Fetch naming records and process them into a GeoJSON file, optionally over a shared session."""
+    own_session = session is None
+    session = session or fetch.create_session(pool_size=workers)
+    cache = GeonameCache()
+    print("Fetching naming proposals...")
+    data = fetch_json(NAMING_URL, session)
+    naming_records = data.get("naming", {}).get("current", [])
+    naming_records = [record for record in naming_records if record.get("geoname_identifier")]
 
-    # Create GeoJSON
-    geojson = {
-        "type": "FeatureCollection",
-        "features": features
-    }
+    # Fetch geoname details concurrently; results keep the order of naming_records
+    print(f"Fetching {len(naming_records)} geonames with {workers} workers...")
+    geonames = fetch_geonames([record["geoname_identifier"] for record in naming_records], session, cache, workers)
+    if own_session:
+        session.close()
+    cache.close()
 
-    # Save to file
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(geojson, f, indent=4)
+    with stage("gnb", "write") as write:
+        delta = write_features_if_changed(OUTPUT_FILE, iter_naming_features(naming_records, geonames), "geoname_identifier")
+        write.count(delta["count"])
+    export_geojson(OUTPUT_FILE, has_changes(delta))
+    snapshot_geojson(OUTPUT_FILE, has_changes(delta))
 
-    print(f"GeoJSON file created: {OUTPUT_FILE}")
+    print(f"GeoJSON file processed: {OUTPUT_FILE} ({delta['count']} proposals)")
+    print(
+        "Geoname cache: {hits} hits, {revalidated} revalidated, "
+        "{misses} misses, {evicted} evicted".format(**cache.stats)
+    )
 
 if __name__ == "__main__":
     process_naming_records()
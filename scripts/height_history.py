@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+import argparse
+import glob
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+# Append-only history of stream height readings from the BOM and WaterNSW scripts.
+# Readings are stored in SQLite partitions under HISTORY_DIR, one file per UTC day
+# (YYYY-MM-DD.sqlite). Days older than HISTORY_KEEP_DAYS are merged into one file
+# per month (YYYY-MM.sqlite) by the compact command, so finished partitions stop
+# changing. Within a partition rows are clustered on (site_id, observed_at), so
+# reading the last few hours of a gauge is an index range scan.
+# The stream workflow runs the compact command after every BOM run.
+#
+#   python scripts/height_history.py query <site_id> [--hours 24] [--source bom]
+#   python scripts/height_history.py compact [--keep-days 7]
+
+OUTPUT_DIR = os.environ.get("OUTPUT_DIR", "datasets")
+HISTORY_DIR = os.environ.get("HISTORY_DIR", os.path.join(OUTPUT_DIR, "height_history"))
+KEEP_DAYS = int(os.environ.get("HISTORY_KEEP_DAYS", "7"))  # days kept as daily partitions
+
+EPOCH = pd.Timestamp(0, tz="UTC")
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS readings ("
+    "site_id TEXT NOT NULL, observed_at INTEGER NOT NULL, source TEXT NOT NULL, "
+    "value REAL, quality INTEGER, "
+    "PRIMARY KEY (site_id, observed_at, source)) WITHOUT ROWID"
+)
+
+
+class HeightHistory:
+    """
+    Partitioned store of (site_id, observed_at, source, value, quality) readings.
+    Appends are idempotent: a reading already stored for the same site, timestamp
+    and source is ignored, so re-running a script over the same data adds nothing.
+    """
+
+    def __init__(self, path=HISTORY_DIR, keep_days=KEEP_DAYS):
+        self.path = path
+        self.keep_days = keep_days
+        os.makedirs(path, exist_ok=True)
+
+    def day_path(self, day):
+        return os.path.join(self.path, f"{day:%Y-%m-%d}.sqlite")
+
+    def month_path(self, day):
+        return os.path.join(self.path, f"{day:%Y-%m}.sqlite")
+
+    def cutoff(self, now=None):
+        """First day still kept as a daily partition."""
+        now = now or datetime.now(timezone.utc)
+        return (now - timedelta(days=self.keep_days)).date()
+
+    def _connect(self, path):
+        conn = sqlite3.connect(path)
+        conn.execute(SCHEMA)
+        return conn
+
+    def append(self, source, readings, now=None):
+        """
+        Append readings, a DataFrame with site_id, observed_at (UTC datetimes),
+        value and optional quality columns. Rows without a timestamp are dropped.
+        Days before the compaction cutoff go straight to their month partition.
+        Returns the number of new rows stored.
+        """
+        readings = readings.dropna(subset=["site_id", "observed_at"])
+        if readings.empty:
+            return 0
+        observed_at = pd.to_datetime(readings["observed_at"], utc=True)
+        rows = pd.DataFrame({
+            "site_id": readings["site_id"].astype(str).to_numpy(),
+            "observed_at": ((observed_at - EPOCH) // pd.Timedelta(seconds=1)).to_numpy(),
+            "source": source,
+            "value": readings["value"].astype("float64").to_numpy(),
+            "quality": readings["quality"].to_numpy() if "quality" in readings else None
+        })
+        rows = rows.astype(object).where(rows.notna(), None)
+        days = observed_at.dt.date.to_numpy()
+        cutoff = self.cutoff(now)
+
+        inserted = 0
+        for day in sorted(set(days)):
+            if day >= cutoff:
+                inserted += self._insert(self.day_path(day), rows[days == day], self.month_path(day))
+            else:
+                inserted += self._insert(self.month_path(day), rows[days == day])
+        return inserted
+
+    def _insert(self, path, rows, month_path=None):
+        """Insert rows into the partition at path, skipping any already in month_path."""
+        is_new = not os.path.exists(path)
+        conn = self._connect(path)
+        sql = "INSERT OR IGNORE INTO main.readings SELECT * FROM incoming"
+        if month_path and os.path.exists(month_path):
+            # Days merged early by a compaction with a shorter keep_days live in the month
+            conn.execute("ATTACH DATABASE ? AS month", (month_path,))
+            sql += (
+                " WHERE NOT EXISTS (SELECT 1 FROM month.readings m WHERE m.site_id = incoming.site_id"
+                " AND m.observed_at = incoming.observed_at AND m.source = incoming.source)"
+            )
+        with conn:
+            conn.execute("CREATE TEMP TABLE incoming (site_id, observed_at, source, value, quality)")
+            conn.executemany("INSERT INTO incoming VALUES (?, ?, ?, ?, ?)", rows.itertuples(index=False, name=None))
+            inserted = conn.execute(sql).rowcount
+        conn.close()
+        if is_new and not inserted:
+            os.remove(path)  # every row was already in the month partition
+        return inserted
+
+    def partitions(self, start, end):
+        """Existing partition files that may hold readings between start and end (dates)."""
+        paths = []
+        day = start
+        while day <= end:
+            for path in (self.month_path(day), self.day_path(day)):
+                if path not in paths and os.path.exists(path):
+                    paths.append(path)
+            day += timedelta(days=1)
+        return paths
+
+    def query(self, site_id, hours=24, end=None, source=None):
+        """
+        Return the readings for site_id in the hours up to end (default now), oldest first,
+        as a DataFrame with observed_at, source, value and quality columns.
+        """
+        end = pd.Timestamp(end or datetime.now(timezone.utc))
+        end = end.tz_localize("UTC") if end.tzinfo is None else end.tz_convert("UTC")
+        start = end - pd.Timedelta(hours=hours)
+        sql = (
+            "SELECT observed_at, source, value, quality FROM readings "
+            "WHERE site_id = ? AND observed_at BETWEEN ? AND ?"
+        )
+        params = [str(site_id), int(start.timestamp()), int(end.timestamp())]
+        if source:
+            sql += " AND source = ?"
+            params.append(source)
+
+        rows = []
+        for path in self.partitions(start.date(), end.date()):
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            rows.extend(conn.execute(sql, params).fetchall())
+            conn.close()
+        df = pd.DataFrame(rows, columns=["observed_at", "source", "value", "quality"])
+        df = df.drop_duplicates(["observed_at", "source"]).sort_values(["observed_at", "source"], ignore_index=True)
+        df["observed_at"] = pd.to_datetime(df["observed_at"], unit="s", utc=True)
+        return df
+
+    def compact(self, now=None):
+        """
+        Merge daily partitions older than keep_days into their month partition and
+        remove them. Returns the number of daily partitions merged.
+        """
+        cutoff = self.cutoff(now)
+        merged = 0
+        for path in sorted(glob.glob(os.path.join(self.path, "????-??-??.sqlite"))):
+            day = datetime.strptime(os.path.basename(path)[:10], "%Y-%m-%d").date()
+            if day >= cutoff:
+                continue
+            conn = self._connect(self.month_path(day))
+            conn.execute("ATTACH DATABASE ? AS day", (path,))
+            with conn:
+                conn.execute("INSERT OR IGNORE INTO readings SELECT * FROM day.readings")
+            conn.execute("DETACH DATABASE day")
+            conn.close()
+            os.remove(path)
+            merged += 1
+        return merged
+
+
+def record_readings(source, readings, path=HISTORY_DIR):
+    """Append readings to the history store at path and report how many were new."""
+    start = time.perf_counter()
+    inserted = HeightHistory(path).append(source, readings)
+    print(f"History: {inserted} new {source} readings of {len(readings)} in {time.perf_counter() - start:.2f}s")
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query or compact the stream height history store")
+    parser.add_argument("--path", default=HISTORY_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    query = commands.add_parser("query", help="print the recent readings of a gauge")
+    query.add_argument("site_id")
+    query.add_argument("--hours", type=float, default=24)
+    query.add_argument("--source", choices=["bom", "wnsw"])
+    compact = commands.add_parser("compact", help="merge old daily partitions into monthly ones")
+    compact.add_argument("--keep-days", type=int, default=KEEP_DAYS)
+    args = parser.parse_args()
+
+    if args.command == "query":
+        start = time.perf_counter()
+        df = HeightHistory(args.path).query(args.site_id, args.hours, source=args.source)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(df.to_string(index=False) if len(df) else "No readings found.")
+        print(f"{len(df)} readings in {elapsed_ms:.1f} ms")
+    else:
+        merged = HeightHistory(args.path, keep_days=args.keep_days).compact()
+        print(f"Compacted {merged} daily partitions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import wraps
+from inspect import isgeneratorfunction
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Per-stage timing and memory instrumentation shared by the dataset scripts.
+# Each stage records wall and CPU time, peak RSS, bytes downloaded and a row or
+# feature count. Records are printed, appended to METRICS_FILE as JSON lines and,
+# when METRICS_PROMETHEUS_FILE is set, written in Prometheus text format at exit.
+#
+# CPU time, RSS and tracemalloc peaks are process wide, so they are only
+# attributable to one stage when jobs run one at a time.
+
+METRICS_FILE = os.environ.get("METRICS_FILE")  # JSON lines, one record per stage
+PROMETHEUS_FILE = os.environ.get("METRICS_PROMETHEUS_FILE")  # for the node exporter textfile collector
+TRACEMALLOC = os.environ.get("METRICS_TRACEMALLOC", "").lower() in ("1", "true", "yes")  # slows allocation-heavy stages
+
+_stages = ContextVar("stages", default=())  # stages enclosing the running code, innermost last
+_lock = threading.Lock()
+_latest = {}  # (dataset, stage) -> record of its last run, for the Prometheus file
+
+
+def peak_rss_bytes():
+    """High-water mark of the process resident set size, or None where unavailable."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Linux reports KiB
+
+
+def count_rows(result):
+    """Row or feature count of a stage result: list length, frame rows, column length, or None."""
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    if isinstance(result, dict):  # a dict of equal length columns
+        column = next(iter(result.values()), None)
+        return len(column) if isinstance(column, list) else None
+    shape = getattr(result, "shape", None)
+    return shape[0] if shape else None
+
+
+class Stage:
+    """One timed run of a stage; use stage() or instrumented() rather than creating these directly."""
+
+    def __init__(self, dataset, name):
+        self.dataset = dataset
+        self.name = name
+        self.rows = None
+        self.bytes_downloaded = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.child_s = 0.0  # wall time spent in nested stages
+        self.error = None
+        self._responses = {}  # id -> raw response, summed once the stage ends
+        self._rss_start = peak_rss_bytes()
+        self._traced_start = None
+        self._traced_peak = 0
+
+    def count(self, rows):
+        """Set the number of rows or features the stage produced."""
+        self.rows = rows
+
+    def add_bytes(self, size):
+        with _lock:
+            self.bytes_downloaded += size
+
+    @contextmanager
+    def step(self):
+        """Time one step of the stage with it set as the innermost enclosing stage."""
+        enclosing = _stages.get()
+        token = _stages.set(enclosing + (self,))
+        if TRACEMALLOC:
+            self._start_tracing()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield self
+        except BaseException as e:
+            if not isinstance(e, GeneratorExit):
+                self.error = type(e).__name__
+            raise
+        finally:
+            elapsed = time.perf_counter() - wall
+            self.wall_s += elapsed
+            self.cpu_s += time.process_time() - cpu
+            _stages.reset(token)
+            if enclosing:
+                with _lock:
+                    enclosing[-1].child_s += elapsed
+            if TRACEMALLOC:
+                self._stop_tracing(enclosing)
+
+    def _start_tracing(self):
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._traced_start is None:
+            self._traced_start = current
+        # Resetting the peak loses the enclosing stages' peak, so hand it to them first
+        for stage in _stages.get()[:-1]:
+            stage._traced_peak = max(stage._traced_peak, peak)
+        tracemalloc.reset_peak()
+
+    def _stop_tracing(self, enclosing):
+        import tracemalloc
+
+        peak = tracemalloc.get_traced_memory()[1]
+        self._traced_peak = max(self._traced_peak, peak)
+        for stage in enclosing:
+            stage._traced_peak = max(stage._traced_peak, peak)
+
+    def finish(self):
+        """Record the stage: print it, append it to METRICS_FILE and keep it for the Prometheus file."""
+        for raw in self._responses.values():
+            tell = getattr(raw, "tell", None)  # bytes read off the wire, before decompression
+            if tell:
+                self.bytes_downloaded += tell()
+        rss = peak_rss_bytes()
+        record = {
+            "time": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "dataset": self.dataset,
+            "stage": self.name,
+            "wall_s": round(self.wall_s, 4),
+            "self_s": round(max(self.wall_s - self.child_s, 0), 4),
+            "cpu_s": round(self.cpu_s, 4),
+            "peak_rss_bytes": rss,
+            "rss_growth_bytes": rss - self._rss_start if rss is not None else None,
+            "bytes_downloaded": self.bytes_downloaded,
+            "rows": self.rows
+        }
+        if self._traced_start is not None:
+            record["tracemalloc_peak_bytes"] = max(self._traced_peak - self._traced_start, 0)
+        if self.error:
+            record["error"] = self.error
+        self._responses = {}
+
+        details = [f"{record['wall_s']:.2f}s wall", f"{record['cpu_s']:.2f}s cpu"]
+        if self.rows is not None:
+            details.append(f"{self.rows} rows")
+        if self.bytes_downloaded:
+            details.append(f"{self.bytes_downloaded / 1e6:.1f} MB downloaded")
+        if rss is not None:
+            details.append(f"peak RSS {rss / 1e6:.0f} MB")
+        print(f"Stage {self.dataset}.{self.name}: {', '.join(details)}{' (failed)' if self.error else ''}")
+
+        with _lock:
+            _latest[(self.dataset, self.name)] = record
+            if METRICS_FILE:
+                with open(METRICS_FILE, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+        return record
+
+
+@contextmanager
+def stage(dataset, name):
+    """Time a block as one stage; call .count() on the yielded stage to record its rows."""
+    current = Stage(dataset, name)
+    try:
+        with current.step():
+            yield current
+    finally:
+        current.finish()
+
+
+def instrumented(dataset, name=None):
+    """
+    Decorate a function as a stage named after it, counting the rows it returns.
+    Generator functions are timed across their own steps only, counting the items they yield.
+    """
+    def decorate(func):
+        stage_name = name or func.__name__
+
+        if isgeneratorfunction(func):
+            @wraps(func)
+            def generator(*args, **kwargs):
+                current = Stage(dataset, stage_name)
+                iterator = func(*args, **kwargs)
+                items = 0
+                thrown = None  # forwarded so context manager generators see errors in their block
+                try:
+                    while True:
+                        with current.step():
+                            try:
+                                item = next(iterator) if thrown is None else iterator.throw(thrown)
+                            except StopIteration:
+                                break
+                        items += 1
+                        try:
+                            yield item
+                            thrown = None
+                        except GeneratorExit:
+                            raise
+                        except BaseException as e:
+                            thrown = e
+                finally:
+                    with current.step():
+                        iterator.close()
+                    current.count(items)
+                    current.finish()
+            return generator
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(dataset, stage_name) as current:
+                result = func(*args, **kwargs)
+                current.count(count_rows(result))
+            return result
+        return wrapper
+    return decorate
+
+
+def add_bytes(size):
+    """Count bytes downloaded other than through a tracked requests session, e.g. over FTP."""
+    enclosing = _stages.get()
+    if enclosing:
+        enclosing[-1].add_bytes(size)
+
+
+def propagate(func):
+    """Wrap func so calls from worker threads count towards the caller's stages."""
+    enclosing = _stages.get()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _stages.set(enclosing)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _stages.reset(token)
+    return wrapper
+
+
+def track_response(response, *args, **kwargs):
+    """requests response hook attributing the response's bytes to the innermost enclosing stage."""
+    enclosing = _stages.get()
+    if enclosing:
+        with _lock:
+            enclosing[-1]._responses[id(response.raw)] = response.raw
+    return response
+
+
+DOWNLOAD_HOOKS = {"response": [track_response]}  # for requests made without a session
+
+
+def track_downloads(session):
+    """Count the bytes of every response on session towards the stage that requested it."""
+    if track_response not in session.hooks["response"]:
+        session.hooks["response"].append(track_response)
+    return session
+
+
+def records(dataset=None):
+    """The latest record of each stage run so far, optionally for one dataset."""
+    with _lock:
+        return [record for (name, _), record in _latest.items() if dataset is None or name == dataset]
+
+
+PROMETHEUS_METRICS = [
+    ("wall_s", "dataset_stage_duration_seconds", "Wall time of the last run of the stage."),
+    ("cpu_s", "dataset_stage_cpu_seconds", "Process CPU time during the last run of the stage."),
+    ("peak_rss_bytes", "dataset_stage_peak_rss_bytes", "Process peak resident set size at the end of the stage."),
+    ("tracemalloc_peak_bytes", "dataset_stage_tracemalloc_peak_bytes", "Peak traced allocations during the stage."),
+    ("bytes_downloaded", "dataset_stage_downloaded_bytes", "Bytes downloaded during the stage."),
+    ("rows", "dataset_stage_rows", "Rows or features produced by the stage."),
+]
+
+
+def write_prometheus(path=PROMETHEUS_FILE):
+    """Write the latest record of each stage in Prometheus text format, replacing the file atomically."""
+    latest = records()
+    if not path or not latest:
+        return
+    lines = []
+    for key, metric, help_text in PROMETHEUS_METRICS:
+        samples = [record for record in latest if record.get(key) is not None]
+        if not samples:
+            continue
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        lines += [
+            f'{metric}{{dataset="{record["dataset"]}",stage="{record["stage"]}"}} {record[key]}'
+            for record in samples
+        ]
+    lines += ["# HELP dataset_stage_failed Whether the last run of the stage raised.", "# TYPE dataset_stage_failed gauge"]
+    lines += [
+        f'dataset_stage_failed{{dataset="{record["dataset"]}",stage="{record["stage"]}"}} {int("error" in record)}'
+        for record in latest
+    ]
+    # The textfile collector may read at any time, so never expose a partly written file
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(temp_path, path)
+
+
+if PROMETHEUS_FILE:
+    atexit.register(write_prometheus)
@@ -1,8 +1,16 @@
 #!/usr/bin/env python3
-import requests
-import json
 import os
 
+import fetch
+from feature_diff import has_changes, write_features_if_changed
+from instrumentation import instrumented, stage
+from vector_tiles import export_geojson
+from columnar_snapshot import snapshot_geojson
+
+# numpy is optional (the workflow only installs requests) and is imported by
+# load_numpy() when parsing starts, so it stays out of the script's startup
+np = None
+
 # create geojson file of hr burns from rfs api
 # pubic web version https://www.rfs.nsw.gov.au/fire-information/hazard-reductions
 # api is json response but not geojson so this script converts it to geojson
@@ -11,12 +19,35 @@ output_dir = os.environ.get("OUTPUT_DIR", "datasets")
 os.makedirs(output_dir, exist_ok=True)
 output_path = os.path.join(output_dir, "hr_burns.geojson")
 
+HR_MAP_URL = "https://www.rfs.nsw.gov.au/funnelback/hr-map-data"
+FETCH_TIMEOUT = (10, 120)  # connect, read (seconds)
+
+# Douglas-Peucker tolerance in degrees applied to each ring before writing; 0 disables
+simplify_tolerance = float(os.environ.get("RFS_SIMPLIFY_TOLERANCE", "0"))
+
+def load_numpy():
+    """Import numpy for the parsing fast paths; returns False if it is not installed."""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:  # fall back to pure Python parsing
+            return False
+        np = numpy
+    return True
+
 def parse_polygon(polygon_str):
     """
     Convert a polygon string of the format:
       "lat;lon|lat;lon|lat;lon|…"
     into a list of [lon, lat] coordinates.
     """
+    if np is not None:
+        return parse_polygon_array(polygon_str).tolist()
+    return parse_polygon_python(polygon_str)
+
+def parse_polygon_python(polygon_str):
+    """Pure Python version of parse_polygon, parsing one point at a time."""
     coords = []
     for point in polygon_str.split("|"):
         if point.strip():
@@ -27,38 +58,123 @@ def parse_polygon(polygon_str):
                 continue  # skip if the point can't be parsed
     return coords
 
-def main():
-    # Define the API endpoint and query parameters; you can update these as needed.
-    url = "https://www.rfs.nsw.gov.au/funnelback/hr-map-data"
-    params = {
-        # "form": "custom",
-        # "profile": "_default_preview",
-        # "num_ranks": "10000",
-        # "collection": "nsw-rfs-hazard-xml-new",
-        # "maxdist": "298.33570444097364",
-        # "origin": "-33.80274510369129,150.51471689357462"
-    }
-    
-    # Query the API
-    print("Querying the API...")
-    response = requests.get(url, params=params)
-    if response.status_code != 200:
-        print(f"Error: API request failed with status {response.status_code}")
-        return
-    
-    data = response.json()
-    
-    features = []
-    for result in data.get("results", []):
+def parse_polygon_array(polygon_str):
+    """
+    Vectorised version of parse_polygon returning an Nx2 float array of lon, lat.
+    Well formed strings are parsed in a single pass; otherwise points without
+    exactly one ';' and a single value either side of it are masked out first.
+    """
+    raw = np.frombuffer(polygon_str.strip().strip("|").encode(), dtype=np.uint8)
+    if raw.size == 0:
+        return np.empty((0, 2))
+
+    # Well formed: separators alternate ';' '|', no two separators are adjacent
+    # and no value has whitespace inside it ("1 2;3" is one bad point, not three numbers)
+    separators = np.flatnonzero((raw == ord("|")) | (raw == ord(";")))
+    well_formed = (
+        separators.size % 2 == 1
+        and split_values(raw).size == 0
+        and separators[0] > 0 and separators[-1] < raw.size - 1
+        and np.all(np.diff(separators) > 1)
+        and np.all(raw[separators[0::2]] == ord(";"))
+        and np.all(raw[separators[1::2]] == ord("|"))
+    )
+    text = raw.copy() if well_formed else mask_invalid_points(raw)
+    text[(text == ord("|")) | (text == ord(";"))] = ord(" ")
+    try:
+        values = np.fromstring(text.tobytes(), sep=" ")
+    except ValueError:
+        values = None
+    if values is None or values.size % 2 or (well_formed and values.size != separators.size + 1):
+        # non-numeric text in a point; let the per-point parser skip it
+        return np.array(parse_polygon_python(polygon_str), dtype=np.float64).reshape(-1, 2)
+    return values.reshape(-1, 2)[:, ::-1]
+
+def split_values(raw):
+    """Positions in raw bytes of value characters separated by whitespace from the previous value character."""
+    if not (raw <= ord(" ")).any():
+        return np.empty(0, dtype=np.intp)
+    printed = np.flatnonzero(raw > ord(" "))
+    content = (raw[printed] != ord("|")) & (raw[printed] != ord(";"))
+    return printed[1:][content[1:] & content[:-1] & (np.diff(printed) > 1)]
+
+def mask_invalid_points(raw):
+    """Blank out (with spaces) every point in raw bytes that is not a single 'lat;lon' pair."""
+    pipe = raw == ord("|")
+    semi = raw == ord(";")
+    content = ~pipe & ~semi & (raw > ord(" "))
+
+    # Label every byte with its point index and whether it follows the point's ';'
+    point = np.cumsum(pipe)
+    semis_seen = np.cumsum(semi)
+    after_semi = semis_seen > np.maximum.accumulate(np.where(pipe, semis_seen, 0))
+    points = point[-1] + 1
+    semi_count = np.bincount(point[semi], minlength=points)
+    lat_chars = np.bincount(point[content & ~after_semi], minlength=points)
+    lon_chars = np.bincount(point[content & after_semi], minlength=points)
+    valid = (semi_count == 1) & (lat_chars > 0) & (lon_chars > 0)
+    valid[point[split_values(raw)]] = False
+    return np.where(valid[point] | pipe, raw, ord(" ")).astype(np.uint8)
+
+def simplify_line(coords, tolerance):
+    """Douglas-Peucker simplification of an Nx2 array, keeping both end points."""
+    keep = np.zeros(len(coords), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(coords) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = coords[start + 1:end] - coords[start]
+        direction = coords[end] - coords[start]
+        length = np.hypot(*direction)
+        if length == 0:
+            distances = np.hypot(segment[:, 0], segment[:, 1])
+        else:
+            distances = np.abs(direction[0] * segment[:, 1] - direction[1] * segment[:, 0]) / length
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return coords[keep]
+
+def build_ring(polygon_str, tolerance=0):
+    """
+    Parse a polygon string into a closed linear ring, optionally simplified.
+    Returns an Nx2 array when numpy is available, otherwise a list.
+    """
+    if np is None:
+        coords = parse_polygon_python(polygon_str)
+        # Ensure the linear ring is closed (first point equals the last)
+        if coords and coords[0] != coords[-1]:
+            coords.append(coords[0])
+        return coords
+
+    coords = parse_polygon_array(polygon_str)
+    if len(coords) == 0:
+        return coords
+    # Ensure the linear ring is closed (first point equals the last)
+    if (coords[0] != coords[-1]).any():
+        coords = np.vstack([coords, coords[:1]])
+    if tolerance > 0 and len(coords) > 4:
+        simplified = simplify_line(coords, tolerance)
+        if len(simplified) >= 4:  # a valid ring needs at least 4 positions
+            coords = simplified
+    return coords
+
+@instrumented("rfs")
+def iter_burn_features(results):
+    """Yield a GeoJSON feature for each hazard reduction result."""
+    load_numpy()
+    for result in results:
         multi_polygon_coords = []
         # Process each polygon in the result.
         for poly in result.get("polygons", []):
             polygon_str = poly.get("polygon")
             if polygon_str:
-                coords = parse_polygon(polygon_str)
-                # Ensure the linear ring is closed (first point equals the last)
-                if coords and coords[0] != coords[-1]:
-                    coords.append(coords[0])
+                coords = build_ring(polygon_str, simplify_tolerance)
                 # For GeoJSON MultiPolygon, each polygon must be an array of linear rings.
                 multi_polygon_coords.append([coords])
         
@@ -81,23 +197,44 @@ def main():
             "endDate": result.get("endDate")
         }
         
-        feature = {
+        yield {
             "type": "Feature",
             "geometry": geometry,
             "properties": properties
         }
-        features.append(feature)
-    
-    # Assemble the FeatureCollection for GeoJSON
-    geojson = {
-        "type": "FeatureCollection",
-        "features": features
+
+def main(session=None):
+    # Define the API query parameters; you can update these as needed.
+    params = {
+        # "form": "custom",
+        # "profile": "_default_preview",
+        # "num_ranks": "10000",
+        # "collection": "nsw-rfs-hazard-xml-new",
+        # "maxdist": "298.33570444097364",
+        # "origin": "-33.80274510369129,150.51471689357462"
     }
     
-    # Write the GeoJSON to a file
-    with open(output_path, "w") as f:
-        json.dump(geojson, f, indent=2)
-    print(f"GeoJSON file '{output_path}' created successfully.")
+    # Query the API
+    print("Querying the API...")
+    with stage("rfs", "fetch"):
+        response = fetch.get(HR_MAP_URL, session, timeout=FETCH_TIMEOUT, params=params)
+    if response.status_code != 200:
+        print(f"Error: API request failed with status {response.status_code}")
+        return
+    
+    with stage("rfs", "parse") as parse:
+        data = response.json()
+        parse.count(len(data.get("results", [])))
+    if not load_numpy() and simplify_tolerance > 0:
+        print("numpy is not installed; polygons will not be simplified.")
+    
+    # Stream the features straight into the GeoJSON file
+    with stage("rfs", "write") as write:
+        delta = write_features_if_changed(output_path, iter_burn_features(data.get("results", [])), "guarReference")
+        write.count(delta["count"])
+    export_geojson(output_path, has_changes(delta))
+    snapshot_geojson(output_path, has_changes(delta))
+    print(f"GeoJSON file '{output_path}' processed with {delta['count']} burns.")
 
 if __name__ == "__main__":
     main()
@@ -1,35 +1,101 @@
 #!/usr/bin/env python3
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 import json
 import os
 
+import fetch
+from feature_diff import has_changes, write_features_if_changed
+from instrumentation import instrumented, propagate, stage
+from vector_tiles import export_geojson
+from columnar_snapshot import snapshot_geojson
+
 # Output configuration
 output_dir = os.environ.get("OUTPUT_DIR", "datasets")
 os.makedirs(output_dir, exist_ok=True)
 output_path = os.path.join(output_dir, "canyons.geojson")
 
 ROPEWIKI_URL = "https://ropewiki.com/api.php"
-QUERY = "[[Category:Canyons]][[Has coordinates::+]][[Located in region.Located in regions::X||Australia]]|?Has_coordinates|?Has_summary|?Has_info_regions|?Has_info_major_region|?Has_info_rappels|?Has_longest_rappel|?Has_pageid|limit=1000|order=ascending|sort=Has name"
+QUERY_CONDITIONS = "[[Category:Canyons]][[Has coordinates::+]][[Located in region.Located in regions::X||Australia]]"
+QUERY_PRINTOUTS = "|?Has_coordinates|?Has_summary|?Has_info_regions|?Has_info_major_region|?Has_info_rappels|?Has_longest_rappel|?Has_pageid"
+QUERY_ORDER = "|order=ascending|sort=Has name"
+
+# Paging configuration
+PAGE_LIMIT = int(os.environ.get("ROPEWIKI_PAGE_LIMIT", "500"))
+FETCH_WORKERS = int(os.environ.get("ROPEWIKI_WORKERS", "4"))
+FETCH_TIMEOUT = (5, 60)  # connect, read (seconds)
+
+# Incremental mode only asks for pages modified since the last run and merges them by pageid
+INCREMENTAL = os.environ.get("ROPEWIKI_INCREMENTAL", "").lower() in ("1", "true", "yes")
+state_path = os.path.join(output_dir, "canyons_state.json")
+
 
+def build_query(offset=0, limit=PAGE_LIMIT, modified_since=None):
+    """Build the ask query for one page of results."""
+    conditions = QUERY_CONDITIONS
+    if modified_since:
+        conditions += f"[[Modification date::>{modified_since}]]"
+    return f"{conditions}{QUERY_PRINTOUTS}|limit={limit}|offset={offset}{QUERY_ORDER}"
 
-def fetch_canyons():
-    """Fetch canyon data from Ropewiki API."""
+
+def fetch_page(session, offset, modified_since=None):
+    """Fetch one page of ask results."""
     params = {
         "action": "ask",
         "format": "json",
-        "query": QUERY
+        "query": build_query(offset, modified_since=modified_since)
     }
-    response = requests.get(ROPEWIKI_URL, params=params)
+    response = fetch.get(ROPEWIKI_URL, session, timeout=FETCH_TIMEOUT, params=params)
     response.raise_for_status()
     return response.json()
 
 
+@instrumented("ropewiki")
+def fetch_canyons(modified_since=None, workers=FETCH_WORKERS, session=None):
+    """
+    Fetch canyon data from Ropewiki API, yielding one response page at a time in order.
+    Follows query-continue-offset past the per-query result limit, fetching
+    batches of following pages concurrently over one pooled session.
+    """
+    own_session = session is None
+    session = session or fetch.create_session(pool_size=workers)
+    try:
+        page = fetch_page(session, 0, modified_since)
+        yield page
+        next_offset = page.get("query-continue-offset")
+
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            while next_offset:
+                offsets = [next_offset + i * PAGE_LIMIT for i in range(max(workers, 1))]
+                pages = executor.map(propagate(lambda offset: fetch_page(session, offset, modified_since)), offsets)
+                next_offset = None
+                for page in pages:
+                    results = page.get("query", {}).get("results")
+                    if results:
+                        yield page
+                    # The last page of the batch tells us where to continue; stop at the first short page
+                    next_offset = page.get("query-continue-offset")
+                    if not next_offset:
+                        break
+    finally:
+        if own_session:
+            session.close()
+
+
+def iter_canyon_results(data):
+    """Yield (name, result) pairs from one ask response or an iterable of response pages."""
+    pages = [data] if isinstance(data, dict) else data
+    for page in pages:
+        results = page.get("query", {}).get("results", {})
+        # An empty result set is returned as a list rather than a dict
+        if isinstance(results, dict):
+            yield from results.items()
+
+
+@instrumented("ropewiki")
 def process_canyons(data):
-    """Convert Ropewiki response to GeoJSON features."""
-    features = []
-    results = data.get("query", {}).get("results", {})
-
-    for canyon_name, canyon_data in results.items():
+    """Convert Ropewiki response pages to GeoJSON features, yielding one at a time."""
+    for canyon_name, canyon_data in iter_canyon_results(data):
         try:
             coords = canyon_data.get("printouts", {}).get("Has coordinates", [])
             if not coords:
@@ -69,30 +135,61 @@ def process_canyons(data):
                     "pageid": printouts.get("Has pageid", [None])[0] if printouts.get("Has pageid") else None
                 }
             }
-            features.append(feature)
         except Exception as e:
             print(f"Error processing canyon {canyon_name}: {e}")
             continue
 
-    return features
-
-
-def main():
-    print("Fetching canyons from Ropewiki...")
-    data = fetch_canyons()
-
-    features = process_canyons(data)
-    print(f"Processed {len(features)} canyons")
-
-    geojson = {
-        "type": "FeatureCollection",
-        "features": features
-    }
-
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(geojson, f, indent=2)
-
-    print(f"GeoJSON file created: {output_path}")
+        yield feature
+
+
+def load_state():
+    if os.path.exists(state_path):
+        with open(state_path, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state):
+    with open(state_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+
+
+def merge_features(existing_path, updated_features):
+    """Merge updated features into an existing GeoJSON file by pageid, ordered by name."""
+    with open(existing_path, encoding="utf-8") as f:
+        features = {
+            feature["properties"].get("pageid") or feature["properties"].get("name"): feature
+            for feature in json.load(f).get("features", [])
+        }
+    updated = 0
+    for feature in updated_features:
+        features[feature["properties"].get("pageid") or feature["properties"].get("name")] = feature
+        updated += 1
+    print(f"Merged {updated} updated canyons into {len(features)} existing")
+    return sorted(features.values(), key=lambda feature: feature["properties"].get("name") or "")
+
+
+def main(session=None):
+    run_started = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+    state = load_state()
+    modified_since = state.get("last_run") if INCREMENTAL and os.path.exists(output_path) else None
+
+    if modified_since:
+        print(f"Fetching canyons modified since {modified_since} from Ropewiki...")
+        features = merge_features(output_path, process_canyons(fetch_canyons(modified_since, session=session)))
+    else:
+        print("Fetching canyons from Ropewiki...")
+        features = process_canyons(fetch_canyons(session=session))
+
+    with stage("ropewiki", "write") as write:
+        delta = write_features_if_changed(output_path, features, "pageid")
+        write.count(delta["count"])
+    export_geojson(output_path, has_changes(delta))
+    snapshot_geojson(output_path, has_changes(delta))
+    print(f"Processed {delta['count']} canyons")
+    # Unchanged runs keep the older timestamp, so the state file is not rewritten
+    if has_changes(delta) or not state:
+        save_state({"last_run": run_started})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+import argparse
+import importlib
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import fetch
+from instrumentation import records
+
+# runs the dataset jobs in one process, concurrently, over one shared http session
+# each job gets the same environment its own workflow sets (OUTPUT_DIR etc. under
+# DATA_DIR), so the scripts still run standalone exactly as before
+#
+#   python scripts/run_all.py [--only gnb,rfs] [--skip bom] [--report run_report.json]
+
+DATA_DIR = os.environ.get("DATA_DIR", "data")
+REPORT_FILE = os.environ.get("RUN_REPORT", "run_report.json")
+SESSION_POOL_SIZE = int(os.environ.get("SESSION_POOL_SIZE", "16"))
+
+# module, entry point, directories relative to DATA_DIR, and default environment
+JOBS = {
+    "gnb": {
+        "module": "gnb_proposals_data_process", "entry": "process_naming_records",
+        "dirs": {"OUTPUT_DIR": "dynamic/gnb"}
+    },
+    "rfs": {
+        "module": "rfs_hr_burns_data_process", "entry": "main",
+        "dirs": {"OUTPUT_DIR": "dynamic/rfs"}
+    },
+    "ropewiki": {
+        "module": "ropewiki_canyons_data_process", "entry": "main",
+        "dirs": {"OUTPUT_DIR": "dynamic/ropewiki"}
+    },
+    "crown_roads": {
+        "module": "crown_road_sales_process", "entry": "main",
+        "dirs": {"OUTPUT_DIR": "dynamic/crown_roads"}
+    },
+    "bom": {
+        "module": "bom_stream_data_process", "entry": "main",
+        "dirs": {"OUTPUT_DIR": "dynamic/bom", "INPUT_DIR": "static/bom"},
+        "env": {"FTP_HOST": "ftp.bom.gov.au", "FTP_DIRECTORY": "/anon/gen/fwo/"}
+    },
+    "wnsw": {
+        "module": "wnsw_stream_data_process", "entry": "main",
+        "dirs": {"OUTPUT_DIR": "dynamic/wnsw"}
+    },
+}
+
+
+class JobOutput:
+    """Stdout wrapper prefixing each line with the name of the job thread that printed it."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def set_job(self, name):
+        self.local.prefix = f"[{name}] " if name else ""
+        self.local.pending = ""
+
+    def write(self, text):
+        pending = getattr(self.local, "pending", "") + text
+        *lines, self.local.pending = pending.split("\n")
+        if lines:
+            prefix = getattr(self.local, "prefix", "")
+            with self.lock:
+                self.stream.write("".join(f"{prefix}{line}\n" for line in lines))
+        return len(text)
+
+    def flush(self):
+        if getattr(self.local, "pending", ""):
+            self.write("\n")
+        self.stream.flush()
+
+
+def load_job(name, data_dir):
+    """
+    Import a job's module with its environment applied, returning its entry point.
+    Modules read their configuration at import time, so jobs are loaded one at a time.
+    """
+    job = JOBS[name]
+    saved = dict(os.environ)
+    try:
+        for key, value in job.get("env", {}).items():
+            os.environ.setdefault(key, value)
+        for key, path in job["dirs"].items():
+            os.environ[key] = os.path.join(data_dir, path)
+        module = importlib.import_module(job["module"])
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+    return getattr(module, job["entry"])
+
+
+def run_job(name, entry, session, output):
+    """Run one job, returning its status, timing and any error instead of raising."""
+    output.set_job(name)
+    start = time.perf_counter()
+    result = {"status": "ok"}
+    try:
+        if "session" in inspect.signature(entry).parameters:
+            entry(session=session)
+        else:
+            entry()
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            result = {"status": "failed", "stage": "run", "error": f"exited with status {e.code}"}
+    except Exception as e:  # one failed dataset must not stop the others
+        traceback.print_exc(file=sys.stdout)
+        result = {"status": "failed", "stage": "run", "error": f"{type(e).__name__}: {e}"}
+    result["run_s"] = round(time.perf_counter() - start, 3)
+    result["stages"] = records(name)
+    sys.stdout.flush()
+    output.set_job(None)
+    return result
+
+
+def select_jobs(only=None, skip=None):
+    names = [name for name in JOBS if not only or name in only]
+    return [name for name in names if name not in (skip or ())]
+
+
+def run_all(names, data_dir=DATA_DIR, workers=None):
+    """Load and run the named jobs, returning the run report."""
+    started_at = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    report = {name: {} for name in names}
+
+    entries = {}
+    for name in names:
+        load_start = time.perf_counter()
+        try:
+            entries[name] = load_job(name, data_dir)
+        except Exception as e:
+            traceback.print_exc()
+            report[name] = {"status": "failed", "stage": "import", "error": f"{type(e).__name__}: {e}"}
+        report[name]["import_s"] = round(time.perf_counter() - load_start, 3)
+
+    output = JobOutput(sys.stdout)
+    sys.stdout = output
+    try:
+        session = fetch.create_session(pool_size=SESSION_POOL_SIZE, pool_connections=len(JOBS))
+        with session, ThreadPoolExecutor(max_workers=workers or len(entries) or 1) as executor:
+            futures = {name: executor.submit(run_job, name, entry, session, output) for name, entry in entries.items()}
+            for name, future in futures.items():
+                report[name].update(future.result())
+    finally:
+        sys.stdout = output.stream
+
+    return {
+        "started_at": started_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "duration_s": round(time.perf_counter() - start, 3),
+        "jobs": report,
+        "fetch": fetch.stats()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the dataset processing jobs concurrently")
+    parser.add_argument("--only", help=f"comma separated jobs to run ({', '.join(JOBS)})")
+    parser.add_argument("--skip", help="comma separated jobs to leave out")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="root of the dynamic/ and static/ directories")
+    parser.add_argument("--report", default=REPORT_FILE, help="where to write the JSON run report")
+    parser.add_argument("--workers", type=int, help="maximum jobs running at once (default: all)")
+    args = parser.parse_args()
+
+    only = args.only.split(",") if args.only else None
+    skip = args.skip.split(",") if args.skip else None
+    unknown = sorted((set(only or []) | set(skip or [])) - set(JOBS))
+    if unknown:
+        parser.error(f"unknown jobs: {', '.join(unknown)}")
+
+    report = run_all(select_jobs(only, skip), args.data_dir, args.workers)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in report["jobs"].items():
+        timing = f"import {result.get('import_s', 0):.2f}s, run {result.get('run_s', 0):.2f}s"
+        print(f"{name:<12} {result['status']:<7} {timing}{'  ' + result['error'] if 'error' in result else ''}")
+    print(f"Finished in {report['duration_s']:.2f}s; report written to {args.report}")
+    failed = [name for name, result in report["jobs"].items() if result["status"] != "ok"]
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import numbers
+import os
+import sqlite3
+import struct
+
+# exports GeoJSON features as Mapbox vector tiles in an MBTiles archive, so the web
+# map loads the tiles in view rather than whole GeoJSON files
+# tiles are encoded in pure Python, in parallel across tiles, and each tile's
+# content hash is kept in the archive so only tiles whose features changed are
+# rebuilt; an unchanged export leaves the archive untouched
+#
+#   python scripts/vector_tiles.py --output datasets/topo_overlays.mbtiles datasets/getlostmaps_ruins.geojson ...
+
+EXPORT_TILES = os.environ.get("VECTOR_TILES", "").lower() in ("1", "true", "yes")  # export from the dataset scripts
+MIN_ZOOM = int(os.environ.get("TILE_MIN_ZOOM", "4"))
+MAX_ZOOM = int(os.environ.get("TILE_MAX_ZOOM", "12"))  # the map overzooms past this
+THIN_CELL = int(os.environ.get("TILE_THIN_CELL", "16"))  # pixels; below MAX_ZOOM keep one point per cell, 0 keeps all
+TILE_WORKERS = int(os.environ.get("TILE_WORKERS", str(os.cpu_count() or 1)))
+TILE_EXTENT = 4096
+TILE_BUFFER = 64  # pixels of neighbouring tiles included, so symbols and lines are not cut at tile edges
+MAX_LATITUDE = 85.0511287798
+PARALLEL_MIN_TILES = 64  # fewer tiles than this are encoded in process
+TASK_TILES = 256  # tiles per worker task
+
+MOVE_TO, LINE_TO, CLOSE_PATH = 1, 2, 7
+POINT, LINESTRING, POLYGON = 1, 2, 3
+GEOMETRY_TYPES = {
+    "Point": POINT, "MultiPoint": POINT,
+    "LineString": LINESTRING, "MultiLineString": LINESTRING,
+    "Polygon": POLYGON, "MultiPolygon": POLYGON
+}
+
+
+def tiles_path(output_path):
+    """Archive path for an output file: the same name with an .mbtiles extension."""
+    return os.path.splitext(output_path)[0] + ".mbtiles"
+
+
+def project(lon, lat):
+    """Project lon/lat to web mercator world coordinates in [0, 1], y down."""
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    sin_lat = math.sin(math.radians(lat))
+    return (lon + 180) / 360, 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+
+
+def prepare_feature(feature):
+    """
+    Project a GeoJSON feature for tiling as (type, parts, bbox, properties, fingerprint).
+    Point parts are lists of points, line parts lists of lines and polygon parts lists
+    of rings per polygon, all in world coordinates. Returns None for unsupported geometry.
+    """
+    geometry = feature.get("geometry")
+    if not geometry or geometry.get("type") not in GEOMETRY_TYPES:
+        return None
+    geometry_type = geometry["type"]
+    coordinates = geometry["coordinates"]
+    if geometry_type == "Point":
+        parts = [[project(*coordinates[:2])]]
+    elif geometry_type in ("MultiPoint", "LineString"):
+        parts = [[project(*point[:2]) for point in coordinates]]
+    elif geometry_type in ("MultiLineString", "Polygon"):
+        parts = [[project(*point[:2]) for point in line] for line in coordinates]
+    else:
+        parts = [[[project(*point[:2]) for point in ring] for ring in polygon] for polygon in coordinates]
+    if geometry_type == "Polygon":
+        parts = [parts]
+    if geometry_type in ("Polygon", "MultiPolygon"):
+        points = [point for polygon in parts for ring in polygon for point in ring]
+    else:
+        points = [point for part in parts for point in part]
+    if not points:
+        return None
+    xs = [point[0] for point in points]
+    ys = [point[1] for point in points]
+    properties = {key: value for key, value in (feature.get("properties") or {}).items() if value is not None}
+    fingerprint = hashlib.sha1(
+        json.dumps([geometry_type, coordinates, properties], sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return GEOMETRY_TYPES[geometry_type], parts, (min(xs), min(ys), max(xs), max(ys)), properties, fingerprint
+
+
+def tile_range(bbox, zoom):
+    """Tiles (x, y) at zoom whose buffered area overlaps a world bbox."""
+    n = 1 << zoom
+    buffer = TILE_BUFFER / TILE_EXTENT
+    min_x = max(int(math.floor(bbox[0] * n - buffer)), 0)
+    min_y = max(int(math.floor(bbox[1] * n - buffer)), 0)
+    max_x = min(int(math.floor(bbox[2] * n + buffer)), n - 1)
+    max_y = min(int(math.floor(bbox[3] * n + buffer)), n - 1)
+    return ((x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1))
+
+
+def assign_tiles(layers, min_zoom, max_zoom):
+    """Map each tile (z, x, y) to {layer: [feature index, ...]} for the features it overlaps."""
+    tiles = {}
+    for name, features in layers.items():
+        for index, feature in enumerate(features):
+            for zoom in range(min_zoom, max_zoom + 1):
+                for x, y in tile_range(feature[2], zoom):
+                    tiles.setdefault((zoom, x, y), {}).setdefault(name, []).append(index)
+    return tiles
+
+
+# Clipping and encoding work in tile pixels, where the tile spans 0..TILE_EXTENT
+
+def to_pixels(points, zoom, x, y):
+    n = 1 << zoom
+    return [((px * n - x) * TILE_EXTENT, (py * n - y) * TILE_EXTENT) for px, py in points]
+
+
+def clip_segment(a, b, low, high):
+    """Clip segment a-b to the square low..high (Liang-Barsky), or None if it lies outside."""
+    t0, t1 = 0.0, 1.0
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    for p, q in ((-dx, a[0] - low), (dx, high - a[0]), (-dy, a[1] - low), (dy, high - a[1])):
+        if p == 0:
+            if q < 0:
+                return None
+            continue
+        r = q / p
+        if p < 0:
+            if r > t1:
+                return None
+            t0 = max(t0, r)
+        else:
+            if r < t0:
+                return None
+            t1 = min(t1, r)
+    start = a if t0 == 0 else (a[0] + t0 * dx, a[1] + t0 * dy)
+    end = b if t1 == 1 else (a[0] + t1 * dx, a[1] + t1 * dy)
+    return start, end
+
+
+def clip_line(points, low, high):
+    """Clip a line to the square low..high, returning the parts inside it."""
+    parts, current = [], []
+    for a, b in zip(points, points[1:]):
+        segment = clip_segment(a, b, low, high)
+        if segment is None:
+            if current:
+                parts.append(current)
+                current = []
+            continue
+        start, end = segment
+        if current and current[-1] != start:
+            parts.append(current)
+            current = []
+        if not current:
+            current = [start]
+        current.append(end)
+        if end != b:  # the line leaves the square here
+            parts.append(current)
+            current = []
+    if current:
+        parts.append(current)
+    return parts
+
+
+def clip_ring(ring, low, high):
+    """Clip a polygon ring to the square low..high (Sutherland-Hodgman)."""
+    points = ring[:-1] if len(ring) > 1 and ring[0] == ring[-1] else ring
+    for axis, bound, keep_above in ((0, low, True), (0, high, False), (1, low, True), (1, high, False)):
+        if not points:
+            break
+        clipped = []
+        previous = points[-1]
+        previous_inside = previous[axis] >= bound if keep_above else previous[axis] <= bound
+        for point in points:
+            inside = point[axis] >= bound if keep_above else point[axis] <= bound
+            if inside != previous_inside:
+                t = (bound - previous[axis]) / (point[axis] - previous[axis])
+                crossing = [previous[0] + t * (point[0] - previous[0]), previous[1] + t * (point[1] - previous[1])]
+                crossing[axis] = bound
+                clipped.append(tuple(crossing))
+            if inside:
+                clipped.append(point)
+            previous, previous_inside = point, inside
+        points = clipped
+    return points
+
+
+def quantise(points):
+    """Round to whole pixels, dropping consecutive duplicates."""
+    result = []
+    for x, y in points:
+        point = (int(round(x)), int(round(y)))
+        if not result or result[-1] != point:
+            result.append(point)
+    return result
+
+
+def ring_area(ring):
+    """Signed area of a ring in tile pixels; positive for exterior rings in MVT winding."""
+    return sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1])) / 2
+
+
+def zigzag(value):
+    return (value << 1) ^ (value >> 31)
+
+
+def command(command_id, count):
+    return (command_id & 0x7) | (count << 3)
+
+
+def encode_geometry(geometry_type, parts):
+    """Encode quantised parts as MVT geometry commands; polygon parts are flat lists of rings."""
+    commands = []
+    cursor_x = cursor_y = 0
+    if geometry_type == POINT:
+        commands.append(command(MOVE_TO, len(parts)))
+        for x, y in parts:
+            commands += [zigzag(x - cursor_x), zigzag(y - cursor_y)]
+            cursor_x, cursor_y = x, y
+        return commands
+    for part in parts:
+        x, y = part[0]
+        commands += [command(MOVE_TO, 1), zigzag(x - cursor_x), zigzag(y - cursor_y)]
+        cursor_x, cursor_y = x, y
+        commands.append(command(LINE_TO, len(part) - 1))
+        for x, y in part[1:]:
+            commands += [zigzag(x - cursor_x), zigzag(y - cursor_y)]
+            cursor_x, cursor_y = x, y
+        if geometry_type == POLYGON:
+            commands.append(command(CLOSE_PATH, 1))
+    return commands
+
+
+def tile_geometry(feature, zoom, x, y):
+    """Clip and quantise a prepared feature to one tile; returns encodable parts or None."""
+    geometry_type, parts = feature[0], feature[1]
+    low, high = -TILE_BUFFER, TILE_EXTENT + TILE_BUFFER
+    if geometry_type == POINT:
+        points = [
+            (int(round(px)), int(round(py)))
+            for part in parts for px, py in to_pixels(part, zoom, x, y)
+            if low <= px <= high and low <= py <= high
+        ]
+        return points or None
+    if geometry_type == LINESTRING:
+        lines = [
+            line for part in parts for clipped in clip_line(to_pixels(part, zoom, x, y), low, high)
+            for line in [quantise(clipped)] if len(line) >= 2
+        ]
+        return lines or None
+    rings = []
+    for polygon in parts:
+        for index, ring in enumerate(polygon):
+            ring = quantise(clip_ring(to_pixels(ring, zoom, x, y), low, high))
+            if len(ring) > 1 and ring[0] == ring[-1]:
+                ring.pop()
+            area = ring_area(ring) if len(ring) >= 3 else 0
+            if area == 0:
+                if index == 0:
+                    break  # holes of a polygon with no exterior are dropped with it
+                continue
+            exterior = index == 0
+            if (area > 0) != exterior:
+                ring.reverse()
+            rings.append(ring)
+    return rings or None
+
+
+# Protocol buffer encoding of the vector tile schema (vector_tile.proto, version 2)
+
+def varint(value):
+    encoded = bytearray()
+    while value > 0x7F:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def field(number, wire_type, payload):
+    key = varint((number << 3) | wire_type)
+    if wire_type == 2:
+        return key + varint(len(payload)) + payload
+    return key + payload
+
+
+def packed(number, values):
+    return field(number, 2, b"".join(varint(value) for value in values))
+
+
+def encode_value(value):
+    """Encode a property value as an MVT Value message; returns (message, type name)."""
+    if isinstance(value, bool):
+        return field(7, 0, varint(int(value))), "Boolean"
+    if isinstance(value, numbers.Integral) and -(1 << 63) <= value < (1 << 64):
+        value = int(value)
+        if value >= 0:
+            return field(5, 0, varint(value)), "Number"
+        return field(6, 0, varint((value << 1) ^ (value >> 63))), "Number"
+    if isinstance(value, numbers.Real):
+        if math.isnan(value):
+            return None, None
+        return field(3, 1, struct.pack("<d", float(value))), "Number"
+    if isinstance(value, (list, dict)):
+        value = json.dumps(value, separators=(",", ":"), default=str)
+    return field(1, 2, str(value).encode("utf-8")), "String"
+
+
+def encode_layer(name, features, zoom, x, y, thin):
+    """Encode the features of one layer in one tile; returns the Layer message or None if empty."""
+    keys, values, encoded_features = {}, {}, []
+    occupied = set()
+    for feature in features:
+        geometry = tile_geometry(feature, zoom, x, y)
+        if geometry is None:
+            continue
+        if thin and feature[0] == POINT:
+            cell = (geometry[0][0] // thin, geometry[0][1] // thin)
+            if cell in occupied:
+                continue
+            occupied.add(cell)
+        tags = []
+        for key, value in feature[3].items():
+            value_key = (type(value).__name__, str(value))
+            if value_key not in values:
+                message = encode_value(value)[0]
+                if message is None:
+                    continue
+                values[value_key] = (len(values), message)
+            tags += [keys.setdefault(key, len(keys)), values[value_key][0]]
+        encoded_features.append(
+            packed(2, tags) + field(3, 0, varint(feature[0])) + packed(4, encode_geometry(feature[0], geometry))
+        )
+    if not encoded_features:
+        return None
+    return (
+        field(15, 0, varint(2))
+        + field(1, 2, name.encode("utf-8"))
+        + b"".join(field(2, 2, feature) for feature in encoded_features)
+        + b"".join(field(3, 2, key.encode("utf-8")) for key in keys)
+        + b"".join(field(4, 2, message) for _, message in values.values())
+        + field(5, 0, varint(TILE_EXTENT))
+    )
+
+
+_worker_layers = None  # prepared features per layer, set once per worker process
+
+
+def init_worker(layers):
+    global _worker_layers
+    _worker_layers = layers
+
+
+def encode_tiles(tasks, max_zoom=MAX_ZOOM, thin_cell=THIN_CELL):
+    """Encode tiles given as ((z, x, y), {layer: [feature index, ...]}); returns gzipped tile data or None."""
+    encoded = []
+    for (zoom, x, y), members in tasks:
+        thin = thin_cell if zoom < max_zoom else 0
+        layers = [
+            encode_layer(name, [_worker_layers[name][index] for index in indexes], zoom, x, y, thin)
+            for name, indexes in members.items()
+        ]
+        data = b"".join(field(3, 2, layer) for layer in layers if layer)
+        encoded.append(gzip.compress(data, mtime=0) if data else None)
+    return encoded
+
+
+# MBTiles archive, with the content hash of every tile so unchanged tiles are skipped
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS tiles (
+    zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB,
+    PRIMARY KEY (zoom_level, tile_column, tile_row)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tile_hashes (
+    zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, hash TEXT NOT NULL,
+    PRIMARY KEY (zoom_level, tile_column, tile_row)
+) WITHOUT ROWID;
+"""
+
+
+def tile_hash(members, layers, settings):
+    hasher = hashlib.sha1(settings.encode())
+    for name, indexes in members.items():
+        hasher.update(name.encode())
+        for index in indexes:
+            hasher.update(layers[name][index][4].encode())
+    return hasher.hexdigest()
+
+
+def build_metadata(name, layers, min_zoom, max_zoom):
+    """MBTiles metadata rows, including the vector_layers field types the map uses for styling."""
+    bboxes = [feature[2] for features in layers.values() for feature in features]
+    vector_layers = []
+    for layer_name, features in layers.items():
+        fields = {}
+        for feature in features:
+            for key, value in feature[3].items():
+                fields.setdefault(key, encode_value(value)[1] or "Number")
+        vector_layers.append({"id": layer_name, "fields": fields, "minzoom": min_zoom, "maxzoom": max_zoom})
+    metadata = {
+        "name": name,
+        "format": "pbf",
+        "type": "overlay",
+        "minzoom": str(min_zoom),
+        "maxzoom": str(max_zoom),
+        "json": json.dumps({"vector_layers": vector_layers}, sort_keys=True)
+    }
+    if bboxes:
+        west, north = unproject(min(b[0] for b in bboxes), min(b[1] for b in bboxes))
+        east, south = unproject(max(b[2] for b in bboxes), max(b[3] for b in bboxes))
+        metadata["bounds"] = f"{west:.6f},{south:.6f},{east:.6f},{north:.6f}"
+        metadata["center"] = f"{(west + east) / 2:.6f},{(south + north) / 2:.6f},{min_zoom}"
+    return metadata
+
+
+def unproject(x, y):
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return x * 360 - 180, lat
+
+
+def export_tiles(path, layers, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, workers=TILE_WORKERS, thin_cell=THIN_CELL):
+    """
+    Export layers ({name: iterable of GeoJSON features}) to the MBTiles archive at path,
+    rebuilding only tiles whose features changed. Returns counts of tiles, rebuilt and removed.
+    """
+    prepared = {}
+    for name, features in layers.items():
+        prepared[name] = [item for item in (prepare_feature(feature) for feature in features) if item]
+    tiles = assign_tiles(prepared, min_zoom, max_zoom)
+    settings = json.dumps([TILE_EXTENT, TILE_BUFFER, max_zoom, thin_cell])
+    hashes = {key: tile_hash(members, prepared, settings) for key, members in tiles.items()}
+    metadata = build_metadata(os.path.splitext(os.path.basename(path))[0], prepared, min_zoom, max_zoom)
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(SCHEMA)
+        stored = {
+            (zoom, x, (1 << zoom) - 1 - row): value
+            for zoom, x, row, value in conn.execute("SELECT zoom_level, tile_column, tile_row, hash FROM tile_hashes")
+        }
+        stored_metadata = dict(conn.execute("SELECT name, value FROM metadata"))
+        changed = [key for key, value in hashes.items() if stored.get(key) != value]
+        removed = [key for key in stored if key not in hashes]
+        stats = {"tiles": len(hashes), "rebuilt": len(changed), "removed": len(removed)}
+        if not changed and not removed and stored_metadata == metadata:
+            return stats
+
+        tasks = [(key, tiles[key]) for key in sorted(changed)]
+        chunks = [tasks[start:start + TASK_TILES] for start in range(0, len(tasks), TASK_TILES)]
+        if workers > 1 and len(tasks) >= PARALLEL_MIN_TILES:
+            # imported here as it loads multiprocessing, which most runs never need
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(prepared,)) as executor:
+                encoded = [data for chunk in executor.map(encode_tiles, chunks, [max_zoom] * len(chunks), [thin_cell] * len(chunks)) for data in chunk]
+        else:
+            init_worker(prepared)
+            encoded = [data for chunk in chunks for data in encode_tiles(chunk, max_zoom, thin_cell)]
+
+        # MBTiles rows count from the south (TMS), XYZ tiles from the north
+        with conn:
+            for zoom, x, y in removed:
+                conn.execute("DELETE FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?", (zoom, x, (1 << zoom) - 1 - y))
+                conn.execute("DELETE FROM tile_hashes WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?", (zoom, x, (1 << zoom) - 1 - y))
+            for ((zoom, x, y), _), data in zip(tasks, encoded):
+                row = (1 << zoom) - 1 - y
+                if data is None:  # every feature was clipped or thinned away
+                    conn.execute("DELETE FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?", (zoom, x, row))
+                else:
+                    conn.execute("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)", (zoom, x, row, data))
+                conn.execute("INSERT OR REPLACE INTO tile_hashes VALUES (?, ?, ?, ?)", (zoom, x, row, hashes[(zoom, x, y)]))
+            if stored_metadata != metadata:
+                conn.execute("DELETE FROM metadata")
+                conn.executemany("INSERT INTO metadata VALUES (?, ?)", metadata.items())
+        return stats
+    finally:
+        conn.close()
+
+
+def read_features(geojson_path):
+    """Features of a GeoJSON file."""
+    with open(geojson_path, encoding="utf-8") as f:
+        return json.load(f).get("features", [])
+
+
+def export_layer(output_path, features, layer=None):
+    """Export features as one layer, named after output_path, to the archive next to it."""
+    path = tiles_path(output_path)
+    stats = export_tiles(path, {layer or os.path.splitext(os.path.basename(output_path))[0]: features})
+    print(f"Vector tiles: {stats['rebuilt']} of {stats['tiles']} rebuilt, {stats['removed']} removed in {path}")
+    return stats
+
+
+def export_geojson(geojson_path, changed=True):
+    """With VECTOR_TILES set, export a GeoJSON output when it changed or has no archive yet."""
+    if EXPORT_TILES and (changed or not os.path.exists(tiles_path(geojson_path))):
+        return export_layer(geojson_path, read_features(geojson_path))
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export GeoJSON files as vector tiles in an MBTiles archive")
+    parser.add_argument("inputs", nargs="+", help="GeoJSON files, one layer each, named after the file")
+    parser.add_argument("--output", required=True, help="MBTiles archive to create or update")
+    parser.add_argument("--min-zoom", type=int, default=MIN_ZOOM)
+    parser.add_argument("--max-zoom", type=int, default=MAX_ZOOM)
+    parser.add_argument("--thin-cell", type=int, default=THIN_CELL, help="point thinning cell in pixels, 0 keeps all")
+    parser.add_argument("--workers", type=int, default=TILE_WORKERS)
+    args = parser.parse_args()
+
+    if args.min_zoom > args.max_zoom:
+        parser.error("--min-zoom must not exceed --max-zoom")
+    layers = {os.path.splitext(os.path.basename(path))[0]: read_features(path) for path in args.inputs}
+    stats = export_tiles(args.output, layers, args.min_zoom, args.max_zoom, args.workers, args.thin_cell)
+    print(f"{args.output}: {stats['rebuilt']} of {stats['tiles']} tiles rebuilt, {stats['removed']} removed")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,109 +1,163 @@
-import subprocess
 import xml.etree.ElementTree as ET
+import requests
+from contextlib import contextmanager
 import geopandas as gpd
-from shapely.geometry import Point
-from datetime import datetime
+import pandas as pd
 from pathlib import Path
+import os
 import sys
 
-def download_xml(url):
-    """Download XML data using curl with enhanced headers"""
+import fetch
+from feature_diff import diff_frame, has_changes, save_delta, summarise
+from height_history import record_readings
+from instrumentation import instrumented, stage
+from vector_tiles import EXPORT_TILES, export_layer, tiles_path
+from gauge_index import index_path, save_index
+from columnar_snapshot import EXPORT_SNAPSHOTS, snapshot_frame, snapshot_path
+from gauge_alerts import update_alerts
+
+# Browser-like headers; the server rejects bare clients
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Sec-Fetch-User': '?1',
+}
+REQUEST_TIMEOUT = (10, 60)  # connect, read (seconds)
+
+SITES_URL = "https://realtimedata.waternsw.com.au/wgen/sites.rs.anon.xml"
+
+# Output configuration
+OUTPUT_DIR = os.environ.get("OUTPUT_DIR", "datasets")
+OUTPUT_FILE = str(Path(OUTPUT_DIR) / "wnsw_stream_height_data.gpkg")
+
+# <site> attributes collected into columns
+SITE_ATTRIBUTES = {
+    "site_station": "station",
+    "grpvals": "grpvals",
+    "grpvalsdesc": "grpvalsdesc",
+    "latdec": "latdec",
+    "lngdec": "lngdec",
+    "shortname": "shortname",
+    "stname": "stname",
+    "height": "var_100x00_100",
+    "height_datetime": "var_100x00_100_dt",
+    "colour": "colour"
+}
+NUMERIC_COLUMNS = ["latdec", "lngdec", "height"]
+
+@contextmanager
+def download_xml(url, session=None):
+    """Open the XML data as a stream, decompressing as it is read"""
+    own_session = session is None
+    session = session or fetch.create_session(pool_size=1, headers=REQUEST_HEADERS)
     try:
-        # Construct curl command with expanded headers
-        cmd = [
-            'curl',
-            '--fail',
-            '--silent',
-            '--show-error',
-            '--location',
-            '--retry', '3',
-            '--retry-delay', '2',
-            '-H', 'User-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0 Safari/537.36',
-            '-H', 'Accept: text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            '-H', 'Accept-Language: en-US,en;q=0.9',
-            '-H', 'Accept-Encoding: gzip, deflate, br',
-            '-H', 'Connection: keep-alive',
-            '-H', 'Upgrade-Insecure-Requests: 1',
-            '-H', 'Sec-Fetch-Dest: document',
-            '-H', 'Sec-Fetch-Mode: navigate',
-            '-H', 'Sec-Fetch-Site: none',
-            '-H', 'Sec-Fetch-User: ?1',
-            '--compressed',  # Handle gzip encoding
-            url
-        ]
-        
-        # Run curl command and capture output
-        result = subprocess.run(
-            cmd,
-            check=True,
-            capture_output=True
-        )
-        
-        return result.stdout
-        
-    except subprocess.CalledProcessError as e:
-        print(f"Curl command failed. Status code: {e.returncode}")
-        print(f"Stderr: {e.stderr.decode()}")
-        print(f"Stdout: {e.stdout.decode()}")
-        # Print the exact curl command for debugging
-        print("Curl command:", ' '.join(cmd))
-        raise
-    except Exception as e:
+        with fetch.stream(url, session, timeout=REQUEST_TIMEOUT, headers=REQUEST_HEADERS) as response:
+            if not response.ok:
+                print(f"Download failed. Status code: {response.status_code}")
+                print(f"Response: {response.text[:500]}")
+            response.raise_for_status()
+            response.raw.decode_content = True
+            yield response.raw
+    except requests.RequestException as e:
         print(f"Download failed with error: {str(e)}")
         raise
+    finally:
+        if own_session:
+            session.close()
+
+@instrumented("wnsw")
+def parse_sites(stream):
+    """
+    Parse <site> elements from an XML stream into column lists, clearing each
+    element once read so memory does not grow with the document.
+    """
+    columns = {column: [] for column in SITE_ATTRIBUTES}
+    root = None
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if root is None:
+            root = elem
+        if event == "end" and elem.tag == "site":
+            get = elem.attrib.get
+            for column, attribute in SITE_ATTRIBUTES.items():
+                columns[column].append(get(attribute))
+            elem.clear()
+            root.clear()  # drop references to finished sites
+    return columns
 
-def format_datetime(raw_datetime):
-    if raw_datetime:
-        try:
-            return datetime.strptime(raw_datetime, "%Y%m%d%H%M%S").isoformat() + "Z"
-        except ValueError:
-            return None
-    return None
+@instrumented("wnsw")
+def build_site_frame(columns):
+    """Build the site GeoDataFrame from parsed columns"""
+    df = pd.DataFrame(columns)
+    for column in NUMERIC_COLUMNS:
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+    df["height_datetime"] = parse_datetime(df["height_datetime"])
+    has_location = df["latdec"].notna() & df["lngdec"].notna() & (df["latdec"] != 0) & (df["lngdec"] != 0)
+    geometry = gpd.points_from_xy(df["lngdec"], df["latdec"])
+    geometry[~has_location.to_numpy()] = None
+    return gpd.GeoDataFrame(df, geometry=geometry, crs="EPSG:4326")
 
-def main():
-    # Output file path in the datasets folder
-    output_file = "datasets/wnsw_stream_height_data.gpkg"
+def parse_datetime(raw_datetimes):
+    """Parse raw YYYYMMDDHHMMSS values into UTC datetimes; blank or invalid values become NaT"""
+    return pd.to_datetime(raw_datetimes, format="%Y%m%d%H%M%S", utc=True, errors="coerce")
+
+def format_datetime(datetimes):
+    """Format UTC datetimes as ISO 8601 strings for GeoJSON consumers"""
+    return datetimes.dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def height_readings(gdf):
+    """Select the history columns (site_id, observed_at, value) from the site data"""
+    return pd.DataFrame({
+        "site_id": gdf["site_station"],
+        "observed_at": gdf["height_datetime"],
+        "value": gdf["height"]
+    }).dropna(subset=["value"])
+
+@instrumented("wnsw")
+def write_sites(gdf, output_file):
+    """Save the sites to the GeoPackage, skipping the write when no site changed"""
+    delta = diff_frame(gdf, "site_station", output_file)
+    tiles_current = not EXPORT_TILES or Path(tiles_path(output_file)).exists()
+    snapshot_current = not EXPORT_SNAPSHOTS or Path(snapshot_path(output_file)).exists()
+    if (not has_changes(delta) and Path(output_file).exists() and Path(index_path(output_file)).exists()
+            and tiles_current and snapshot_current):
+        print(f"No site data changed; {output_file} left untouched.")
+        return
+    gdf.to_file(output_file, layer="site_data", driver="GPKG", SPATIAL_INDEX="YES")
+    save_delta(delta, output_file, "site_station")
+    save_index(gdf, output_file, "wnsw")
+    if EXPORT_TILES:
+        tile_frame = gdf.assign(height_datetime=format_datetime(gdf["height_datetime"]))
+        export_layer(output_file, tile_frame.iterfeatures(na="drop", drop_id=True))
+    snapshot_frame(output_file, gdf)
+    print(f"GeoPackage saved to {output_file} ({summarise(delta)})")
+
+def main(session=None):
+    output_file = OUTPUT_FILE
     
     # Ensure output directory exists
     Path(output_file).parent.mkdir(parents=True, exist_ok=True)
     
-    # URL of the XML data
-    url = "https://realtimedata.waternsw.com.au/wgen/sites.rs.anon.xml"
-    
     try:
-        # Fetch the XML data using curl
-        xml_data = download_xml(url)
-        
-        # Parse the XML data
-        root = ET.fromstring(xml_data)
-        
-        # Prepare data storage
-        data = []
-        
-        # Process each <site> element
-        for site in root.findall(".//site"):
-            site_data = {
-                "site_station": site.get("station"),
-                "grpvals": site.get("grpvals"),
-                "grpvalsdesc": site.get("grpvalsdesc"),
-                "latdec": float(site.get("latdec")) if site.get("latdec") else None,
-                "lngdec": float(site.get("lngdec")) if site.get("lngdec") else None,
-                "shortname": site.get("shortname"),
-                "stname": site.get("stname"),
-                "height": float(site.get("var_100x00_100")) if site.get("var_100x00_100") else None,
-                "height_datetime": format_datetime(site.get("var_100x00_100_dt")),
-                "colour": site.get("colour")
-            }
-            data.append(site_data)
-        
+        # Stream the XML data straight into the parser
+        with stage("wnsw", "download_xml"), download_xml(SITES_URL, session) as stream:
+            columns = parse_sites(stream)
+
         # Create GeoDataFrame
-        geometry = [Point(d["lngdec"], d["latdec"]) if d["lngdec"] and d["latdec"] else None for d in data]
-        gdf = gpd.GeoDataFrame(data, geometry=geometry, crs="EPSG:4326")
+        gdf = build_site_frame(columns)
+        with stage("wnsw", "record_readings") as history:
+            history.count(record_readings("wnsw", height_readings(gdf), str(Path(output_file).parent / "height_history")))
         
         # Save to GeoPackage
-        gdf.to_file(output_file, layer="site_data", driver="GPKG")
-        
-        print(f"GeoPackage saved to {output_file}")
+        write_sites(gdf, output_file)
+        with stage("wnsw", "alerts") as alerts:
+            alerts.count(update_alerts("wnsw", gdf, str(Path(output_file).parent)))
         
     except ET.ParseError as e:
         print(f"Failed to parse XML data: {e}")
@@ -0,0 +1,130 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# the job reads its output directory and retry backoff when imported
+os.environ["OUTPUT_DIR"] = tempfile.mkdtemp(prefix="gnb_test_")
+os.environ["FETCH_BACKOFF"] = "0.01"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import gnb_proposals_data_process as gnb  # noqa: E402
+
+# runs the GNB naming proposals job against a local stub HTTP server serving the
+# proposals list and one geoname per record; the stub can answer a path's first
+# request with a 503 and counts the requests it has in flight at once
+# each test uses its own geoname ids, so none is served from the geoname cache
+
+
+class StubServer:
+    """Serves {path: JSON} documents; paths in fail_first get a 503 on their first request."""
+
+    def __init__(self, documents, fail_first=(), latency=0.0):
+        self.documents = documents
+        self.fail_first = set(fail_first)
+        self.latency = latency
+        self.requests = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with stub.lock:
+                    stub.requests[self.path] = stub.requests.get(self.path, 0) + 1
+                    first = stub.requests[self.path] == 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    time.sleep(stub.latency)
+                    if first and self.path in stub.fail_first:
+                        self.send_error(503)
+                    elif self.path not in stub.documents:
+                        self.send_error(404)
+                    else:
+                        body = json.dumps(stub.documents[self.path]).encode()
+                        self.send_response(200)
+                        self.send_header("Content-Type", "application/json")
+                        self.send_header("Content-Length", str(len(body)))
+                        self.end_headers()
+                        self.wfile.write(body)
+                finally:
+                    with stub.lock:
+                        stub.in_flight -= 1
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+
+def documents_for(geoname_ids, missing=()):
+    """The proposals list, in the order of geoname_ids, and a geoname for each id not in missing."""
+    records = [
+        {"advertisement_identifier": f"AD-{geoname_id}", "geoname_identifier": geoname_id,
+         "date_start": "2025-06-01", "date_end": "2025-07-01", "designation": "Creek"}
+        for geoname_id in geoname_ids
+    ]
+    documents = {"/naming": {"naming": {"current": records}}}
+    for index, geoname_id in enumerate(geoname_ids):
+        if geoname_id not in missing:
+            documents[f"/geonames/{geoname_id}"] = {
+                "geographical_name": f"Name {geoname_id}", "longitude": 150 + index / 100, "latitude": -33 - index / 100
+            }
+    return documents
+
+
+@pytest.fixture
+def run_job(monkeypatch):
+    """Serve the documents from a stub, run the job against it and return the stub and the written features."""
+    servers = []
+
+    def run(documents, workers=8, **stub_options):
+        stub = StubServer(documents, **stub_options)
+        servers.append(stub)
+        monkeypatch.setattr(gnb, "NAMING_URL", f"{stub.url}/naming")
+        monkeypatch.setattr(gnb, "GEONAME_URL_TEMPLATE", f"{stub.url}/geonames/{{}}")
+        gnb.process_naming_records(workers=workers)
+        with open(gnb.OUTPUT_FILE, encoding="utf-8") as f:
+            return stub, json.load(f)["features"]
+
+    yield run
+    for stub in servers:
+        stub.server.shutdown()
+
+
+def feature_ids(features):
+    return [feature["properties"]["geoname_identifier"] for feature in features]
+
+
+def test_features_keep_record_order(run_job):
+    geoname_ids = [f"ORDER{number:02d}" for number in (17, 3, 42, 8, 29, 11, 35, 2, 23, 14, 40, 5)]
+    _, features = run_job(documents_for(geoname_ids), latency=0.01)
+    assert feature_ids(features) == geoname_ids
+    assert [feature["properties"]["geographical_name"] for feature in features] == [f"Name {i}" for i in geoname_ids]
+
+
+def test_record_with_failed_geoname_is_skipped(run_job):
+    geoname_ids = [f"SKIP{number:02d}" for number in range(8)]
+    _, features = run_job(documents_for(geoname_ids, missing={"SKIP03"}))
+    assert feature_ids(features) == [geoname_id for geoname_id in geoname_ids if geoname_id != "SKIP03"]
+
+
+def test_concurrent_fetches_retry_503s(run_job):
+    geoname_ids = [f"RETRY{number:02d}" for number in range(16)]
+    failing = {f"/geonames/{geoname_id}" for geoname_id in geoname_ids[::3]}
+    stub, features = run_job(documents_for(geoname_ids), workers=8, fail_first=failing, latency=0.05)
+    assert feature_ids(features) == geoname_ids
+    assert all(stub.requests[path] == 2 for path in failing)
+    assert stub.max_in_flight > 1
@@ -0,0 +1,57 @@
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import rfs_hr_burns_data_process as rfs  # noqa: E402
+
+# the vectorised polygon parser must give the same points as the per-point
+# parser it replaced, including on malformed strings where the per-point parser
+# skips every point that is not a single numeric 'lat;lon' pair
+
+rfs.load_numpy()
+
+MALFORMED = [
+    "1 2;3||1;2 3",
+    "1 2;3|4;5",
+    "1 2;x|4;5",
+    "1;2 3|4;5|6;7",
+    "1; |2;3",
+    "1; |2 ;3|4;5",
+    "1 2; |3;4",
+    " 1 ; 2 | 3 ;4 ",
+    "1;2;3|4;5",
+    "1;2|;|3;4|",
+    "||1;2|||3;4||",
+    "a;b|1;2",
+    "1_0;2|3;4",
+    "1-2;3|4;5",
+    "-33.5;151.2|-33.6;151.3|-33.5;151.2",
+    "",
+    "|",
+    ";",
+]
+
+
+def parse_both(polygon_str):
+    return rfs.parse_polygon_array(polygon_str).tolist(), rfs.parse_polygon_python(polygon_str)
+
+
+@pytest.mark.parametrize("polygon_str", MALFORMED)
+def test_parsers_agree_on_malformed_strings(polygon_str):
+    array_points, python_points = parse_both(polygon_str)
+    assert array_points == python_points
+
+
+def test_parsers_agree_on_random_strings():
+    rng = random.Random(7)
+    alphabet = "0123456789" * 3 + ".-;|  x"
+    for _ in range(5000):
+        polygon_str = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        array_points, python_points = parse_both(polygon_str)
+        assert np.array_equal(np.array(array_points).reshape(-1, 2), np.array(python_points).reshape(-1, 2),
+                              equal_nan=True), polygon_str